@@ -0,0 +1,199 @@
+import gzip
+import json
+import logging
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+from .perf import monitor
+
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (5, 30)
+DEFAULT_RETRIES = 2
+BACKOFF = 0.5
+POOL_SIZE = 10
+# status codes that are worth another try
+RETRY_STATUS = (429, 500, 502, 503, 504)
+# status codes that tell that a request was not processed, a POST can be sent again
+RETRY_STATUS_UNSAFE = (429, 503)
+# methods that can be sent twice without side effects
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+# request bodies below this size are not worth compressing
+COMPRESS_MIN_SIZE = 1024
+
+
+class EndpointMetrics:
+    """Latency statistics of a single endpoint."""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.retries = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    @property
+    def mean(self):
+        """Average latency of all requests in seconds."""
+        return self.total / self.count if self.count else 0.0
+
+    def __str__(self):
+        return (
+            f"{self.count} requests, {self.errors} errors, {self.retries} retries, "
+            f"mean {self.mean * 1000:.0f}ms, max {self.max * 1000:.0f}ms"
+        )
+
+
+class ApiClient:
+    """HTTP client shared by all network calls of the plugin.
+
+    A single requests.Session keeps connections alive, so repeated calls to
+    the same host skip the TCP and TLS handshakes. Every request gets a
+    timeout, transient failures are retried with exponential backoff and
+    jitter, and the latency of every endpoint is recorded. requests is only
+    imported with the first request, it is slow to import.
+    """
+
+    def __init__(self, pool_size=POOL_SIZE):
+        self.logger = logging.getLogger(__name__)
+        self.pool_size = pool_size
+        self._session = None
+        # gzip request bodies, only for endpoints that are known to accept them
+        self.compress_requests = False
+        self.lock = threading.Lock()
+        self.metrics = {}
+
+    @property
+    def session(self):
+        """The requests.Session, created on first use."""
+        with self.lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._session = session
+            return self._session
+
+    @staticmethod
+    def endpoint(url):
+        """Group URLs by host and path for the metrics."""
+        parts = urlsplit(url)
+        return f"{parts.netloc}{parts.path}"
+
+    def record(self, url, duration, error=False, retry=False):
+        """Add a request to the metrics of its endpoint."""
+        endpoint = self.endpoint(url)
+        monitor.count("http")
+        monitor.record(f"http {endpoint}", duration)
+        with self.lock:
+            metrics = self.metrics.setdefault(endpoint, EndpointMetrics())
+            metrics.count += 1
+            metrics.errors += bool(error)
+            metrics.retries += bool(retry)
+            metrics.total += duration
+            metrics.max = max(metrics.max, duration)
+            metrics.last = duration
+
+    def summary(self):
+        """The latency statistics of all endpoints as lines of text."""
+        with self.lock:
+            return [
+                f"{endpoint}: {metrics}" for endpoint, metrics in sorted(self.metrics.items())
+            ]
+
+    def log_metrics(self):
+        """Log the latency statistics of all endpoints."""
+        for line in self.summary():
+            self.logger.info(line)
+
+    def request(
+        self,
+        method,
+        url,
+        json_body=None,
+        data=None,
+        headers=None,
+        timeout=DEFAULT_TIMEOUT,
+        retries=DEFAULT_RETRIES,
+        compress=None,
+        **kwargs,
+    ):
+        """Send a request, retry connection errors, timeouts and 429/5xx responses.
+
+        A POST may have been accepted by the server even if its response
+        never arrived, so it is only retried if it did not reach the server or
+        the server answered 429 or 503. The response of the last attempt is
+        returned even if its status is not OK, exceptions of the last attempt
+        are raised.
+        """
+        import requests
+
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        retry_status = RETRY_STATUS if idempotent else RETRY_STATUS_UNSAFE
+
+        headers = dict(headers or {})
+        if json_body is not None:
+            data = json.dumps(json_body, indent=None, ensure_ascii=False).encode("utf-8")
+            headers.setdefault("Content-Type", "application/json")
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if compress is None:
+            compress = self.compress_requests
+        if compress and isinstance(data, bytes) and len(data) >= COMPRESS_MIN_SIZE:
+            data = gzip.compress(data)
+            headers["Content-Encoding"] = "gzip"
+        for attempt in range(retries + 1):
+            last = attempt == retries
+            start = time.perf_counter()
+            try:
+                response = self.session.request(
+                    method, url, data=data, headers=headers, timeout=timeout, **kwargs
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                retry = not last and (idempotent or self.not_sent(e))
+                self.record(url, time.perf_counter() - start, error=True, retry=retry)
+                if not retry:
+                    raise
+                reason = str(e)
+            else:
+                failed = response.status_code in retry_status
+                self.record(
+                    url, time.perf_counter() - start, error=failed, retry=failed and not last
+                )
+                if not failed or last:
+                    return response
+                response.close()
+                reason = f"status {response.status_code}"
+            delay = BACKOFF * 2**attempt * random.uniform(0.5, 1.5)
+            self.logger.debug(
+                f"{method} {url} failed ({reason}), retry {attempt + 1} in {delay:.1f}s"
+            )
+            time.sleep(delay)
+
+    @staticmethod
+    def not_sent(error):
+        """Check if a failed request never reached the server."""
+        import requests
+        from urllib3.exceptions import NewConnectionError
+
+        if isinstance(error, requests.ConnectTimeout):
+            return True
+        reason = getattr(error.args[0], "reason", None) if error.args else None
+        return isinstance(reason, NewConnectionError)
+
+    def get(self, url, **kwargs):
+        """Send a GET request."""
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        """Send a POST request."""
+        return self.request("POST", url, **kwargs)
+
+
+client = ApiClient()
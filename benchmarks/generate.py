@@ -0,0 +1,210 @@
+"""Generators for synthetic boards, parts libraries and schematics."""
+
+import contextlib
+import os
+import random
+import sqlite3
+import uuid
+
+import pcbnew
+
+# (reference prefix, library, packages, values, share of the board)
+PART_KINDS = (
+    ("R", "Resistor_SMD", ("R_0402_1005Metric", "R_0603_1608Metric", "R_0805_2012Metric"),
+     ("10k", "4k7", "100R", "1k", "22R", "47k", "0R"), 0.35),
+    ("C", "Capacitor_SMD", ("C_0402_1005Metric", "C_0603_1608Metric", "C_1206_3216Metric"),
+     ("100nF", "1uF", "10uF", "22pF", "4.7uF"), 0.35),
+    ("U", "Package_SO", ("SOIC-8_3.9x4.9mm_P1.27mm", "TSSOP-20_4.4x6.5mm_P0.65mm"),
+     ("LM358", "NE555", "74HC595", "STM32F030F4P6"), 0.1),
+    ("Q", "Package_TO_SOT_SMD", ("SOT-23", "SOT-23-5", "SOT-223-3_TabPin2"),
+     ("BSS138", "AO3401A", "MMBT3904"), 0.08),
+    ("D", "Diode_SMD", ("D_SOD-123", "D_SMA"), ("1N4148W", "SS34", "BZT52C3V3"), 0.07),
+    ("J", "Connector_PinHeader_2.54mm", ("PinHeader_1x02_P2.54mm_Vertical", "PinHeader_2x05_P2.54mm_Vertical"),
+     ("Conn_01x02", "Conn_02x05"), 0.05),
+)
+
+# rotation corrections in the style of the shared cpl_rotations_db.csv
+CORRECTIONS = [
+    ("^SOT-223", 180),
+    ("^SOT-23", 180),
+    ("^SOT-353", 180),
+    ("^QFN-", 270),
+    ("^LQFP-", 270),
+    ("^TQFP-", 270),
+    ("^SOP-(?!18_)", 270),
+    ("^TSSOP-", 270),
+    ("^DFN-", 270),
+    ("^SOIC-", 270),
+    ("^SOP-18_", 0),
+    ("^VSSOP-10_", 270),
+    ("^CP_EIA-3216-18_", 180),
+    ("^CP_Elec_8x10.5", 180),
+    ("^CP_Elec_6.3x7.7", 180),
+    ("^CP_Elec_8x6.7", 180),
+    ("^CP_Elec_8x10", 180),
+    ("^(.*?_|)D_SOD-123", 180),
+    ("^(.*?_|)D_SMA", 180),
+    ("^Bosch_LGA-", 90),
+    ("^PowerPAK_SO-8_Single", 270),
+    ("^HTSSOP-", 270),
+    ("^SOT-89", 180),
+    ("^USB_C_Receptacle_XKB_U262-16XN-4BVC11", 0),
+    ("^ESP32-W", 270),
+    ("^LED_WS2812B_PLCC4", 180),
+    ("^PinHeader_2x05_P2.54mm_Vertical", 270),
+]
+
+MANUFACTURERS = ("UNI-ROYAL", "YAGEO", "Samsung", "Murata", "TI", "ST", "onsemi", "Nexperia")
+CATEGORIES = {
+    "Resistors": ("Chip Resistor - Surface Mount", "Resistor Networks & Arrays"),
+    "Capacitors": ("Multilayer Ceramic Capacitors MLCC - SMD/SMT", "Aluminum Electrolytic Capacitors"),
+    "Amplifiers": ("Operational Amplifier",),
+    "Transistors": ("MOSFETs", "Bipolar Transistors - BJT"),
+    "Diodes": ("Switching Diode", "Schottky Barrier Diodes (SBD)", "Zener Diodes"),
+    "Connectors": ("Pin Headers",),
+}
+PACKAGES = ("0402", "0603", "0805", "1206", "SOT-23", "SOT-223", "SOIC-8", "TSSOP-20", "SOD-123", "SMA")
+
+
+def make_board(count, seed=0, filename="benchmark.kicad_pcb", bottom=0.2, lcsc=0.3):
+    """Build a pcbnew stand-in board with count footprints.
+
+    A share of the footprints is placed on the bottom layer and a share
+    carries an LCSC property, some are excluded from BOM or POS like on real
+    boards, and one in a hundred is a REF** footprint without a valid reference.
+    """
+    rng = random.Random(seed)
+    weights = [kind[4] for kind in PART_KINDS]
+    counters = {}
+    footprints = []
+    for idx in range(count):
+        prefix, library, packages, values, _ = rng.choices(PART_KINDS, weights)[0]
+        counters[prefix] = counters.get(prefix, 0) + 1
+        reference = f"{prefix}{counters[prefix]}" if idx % 100 != 99 else "REF**"
+        attributes = pcbnew.FP_SMD if prefix != "J" else pcbnew.FP_THROUGH_HOLE
+        if rng.random() < 0.02:
+            attributes |= pcbnew.FP_EXCLUDE_FROM_BOM
+        if rng.random() < 0.02:
+            attributes |= pcbnew.FP_EXCLUDE_FROM_POS_FILES
+        properties = {}
+        if rng.random() < lcsc:
+            properties["LCSC"] = f"C{rng.randint(1, 2000000)}"
+        footprints.append(
+            pcbnew.FOOTPRINT(
+                reference,
+                rng.choice(values),
+                pcbnew.LIB_ID(library, rng.choice(packages)),
+                pcbnew.VECTOR2I(rng.randint(0, 300000000), rng.randint(0, 200000000)),
+                orientation=rng.choice((0.0, 90.0, 180.0, 270.0)),
+                layer=pcbnew.B_Cu if rng.random() < bottom else pcbnew.F_Cu,
+                attributes=attributes,
+                properties=properties,
+            )
+        )
+    return pcbnew.BOARD(filename, footprints)
+
+
+def write_parts_db(path, count, seed=0):
+    """Write a parts library with count parts in the schema of jlcparts_db_convert.py."""
+    rng = random.Random(seed)
+    categories = [(c, s) for c, subs in CATEGORIES.items() for s in subs]
+    values = [v for kind in PART_KINDS for v in kind[3]]
+
+    def rows():
+        for idx in range(count):
+            category, subcategory = rng.choice(categories)
+            package = rng.choice(PACKAGES)
+            value = rng.choice(values)
+            price = rng.uniform(0.001, 2)
+            yield (
+                f"C{idx + 1}",
+                category,
+                subcategory,
+                f"{value.upper()}-{package}-{idx:06d}",
+                package,
+                rng.randint(2, 64),
+                rng.choice(MANUFACTURERS),
+                "Basic" if rng.random() < 0.05 else "Extended",
+                f"{value} {package} {subcategory}",
+                f"https://example.com/datasheet/{idx}.pdf",
+                f"1-99:{price:.4f},100-:{price * 0.8:.4f}",
+                str(rng.choice((0, 0, 10, 500, 12000, 250000))),
+            )
+
+    if os.path.exists(path):
+        os.remove(path)
+    with contextlib.closing(sqlite3.connect(path)) as con:
+        with con as cur:
+            cur.execute(
+                "CREATE TABLE parts ('LCSC Part', 'First Category', 'Second Category', "
+                "'MFR.Part', 'Package', 'Solder Joint', 'Manufacturer', 'Library Type', "
+                "'Description', 'Datasheet', 'Price', 'Stock')"
+            )
+            cur.executemany(
+                "INSERT INTO parts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows()
+            )
+            cur.execute(
+                "CREATE TABLE meta ('filename', 'size', 'partcount', 'date', 'last_update')"
+            )
+            cur.execute(
+                "INSERT INTO meta VALUES (?, ?, ?, ?, ?)",
+                ("benchmark", 0, count, "2000-01-01", "2000-01-01T00:00:00"),
+            )
+
+
+def symbol(footprint, x, y, lcsc=None, v6=False):
+    """Render a placed symbol of a footprint as KiCad schematic S-expression."""
+    ref = footprint.GetReference()
+    value = footprint.GetValue()
+    fpid = footprint.GetFPID()
+    properties = [
+        ("Reference", ref, x + 2, y - 1),
+        ("Value", value, x + 2, y + 1),
+        ("Footprint", f"{fpid.GetLibNickname()}:{fpid.GetLibItemName()}", x, y),
+        ("Datasheet", "~", x, y),
+    ]
+    if lcsc:
+        properties.append(("LCSC", lcsc, x, y))
+    lines = [
+        f'  (symbol (lib_id "Device:{ref.rstrip("0123456789")}") (at {x} {y} 0) (unit 1)',
+        "    (in_bom yes) (on_board yes)",
+        f"    (uuid {uuid.uuid5(uuid.NAMESPACE_OID, ref)})",
+    ]
+    for idx, (name, text, px, py) in enumerate(properties):
+        id_ = f" (id {idx})" if v6 else ""
+        lines.append(f'    (property "{name}" "{text}"{id_} (at {px} {py} 0)')
+        lines.append("      (effects (font (size 1.27 1.27)))")
+        lines.append("    )")
+    lines.append("  )")
+    return "\n".join(lines)
+
+
+def write_schematics(directory, board, per_sheet=500, seed=0, v6=False):
+    """Write the valid footprints of a board as schematic sheets, return their paths.
+
+    About half of the symbols already carry an LCSC property, so an export
+    updates some properties in place and appends others.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    version = 20211123 if v6 else 20230121
+    footprints = [fp for fp in board.GetFootprints() if fp.GetReference() != "REF**"]
+    paths = []
+    for sheet, start in enumerate(range(0, len(footprints), per_sheet)):
+        path = os.path.join(directory, f"sheet{sheet}.kicad_sch")
+        parts = [
+            f"(kicad_sch (version {version}) (generator eeschema)",
+            "  (lib_symbols",
+            '    (symbol "Device:R" (in_bom yes) (on_board yes)',
+            '      (property "Reference" "R" (at 0 0 0) (effects (font (size 1.27 1.27))))',
+            "    )",
+            "  )",
+        ]
+        for idx, fp in enumerate(footprints[start : start + per_sheet]):
+            lcsc = f"C{rng.randint(1, 2000000)}" if rng.random() < 0.5 else None
+            parts.append(symbol(fp, 25 + idx % 40 * 5, 25 + idx // 40 * 5, lcsc, v6))
+        parts.append(")")
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.write("\n".join(parts) + "\n")
+        paths.append(path)
+    return paths
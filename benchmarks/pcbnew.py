@@ -0,0 +1,228 @@
+"""Lightweight pcbnew stand-in for the benchmarks.
+
+Only the parts of the KiCad API that the plugin touches outside of plotting
+are implemented, backed by plain Python objects. Boards are built by
+generate.make_board() and activated with SetBoard().
+"""
+
+# KiCad 7 layer ids
+F_Cu = 0
+In1_Cu = 1
+In2_Cu = 2
+In3_Cu = 3
+In4_Cu = 4
+B_Cu = 31
+B_Adhes = 32
+F_Adhes = 33
+B_Paste = 34
+F_Paste = 35
+B_SilkS = 36
+F_SilkS = 37
+B_Mask = 38
+F_Mask = 39
+Dwgs_User = 40
+Cmts_User = 41
+Edge_Cuts = 44
+
+PLOT_FORMAT_GERBER = 1
+DRILL_MARKS_NO_DRILL_SHAPE = 0
+
+# footprint attribute bits, see helpers.py
+FP_THROUGH_HOLE = 1 << 0
+FP_SMD = 1 << 1
+FP_EXCLUDE_FROM_POS_FILES = 1 << 2
+FP_EXCLUDE_FROM_BOM = 1 << 3
+
+
+class VECTOR2I:
+    def __init__(self, x=0, y=0):
+        self.x = x
+        self.y = y
+
+    def __add__(self, other):
+        return VECTOR2I(self.x + other.x, self.y + other.y)
+
+    def __sub__(self, other):
+        return VECTOR2I(self.x - other.x, self.y - other.y)
+
+    def __repr__(self):
+        return f"VECTOR2I({self.x}, {self.y})"
+
+
+class EDA_ANGLE:
+    def __init__(self, degrees=0.0):
+        self.degrees = degrees
+
+    def AsDegrees(self):
+        return self.degrees
+
+
+class BOX2I:
+    def __init__(self, position, size):
+        self.position = position
+        self.size = size
+
+    def GetCenter(self):
+        return VECTOR2I(
+            self.position.x + self.size.x // 2, self.position.y + self.size.y // 2
+        )
+
+
+class LIB_ID:
+    def __init__(self, library, name):
+        self.library = library
+        self.name = name
+
+    def GetLibNickname(self):
+        return self.library
+
+    def GetLibItemName(self):
+        return self.name
+
+
+class FOOTPRINT:
+    def __init__(
+        self,
+        reference,
+        value,
+        fpid,
+        position,
+        orientation=0.0,
+        layer=F_Cu,
+        attributes=FP_SMD,
+        properties=None,
+        size=None,
+    ):
+        self.reference = reference
+        self.value = value
+        self.fpid = fpid
+        self.position = position
+        self.orientation = EDA_ANGLE(orientation)
+        self.layer = layer
+        self.attributes = attributes
+        self.properties = properties or {}
+        self.size = size or VECTOR2I(1000000, 500000)
+
+    def GetReference(self):
+        return self.reference
+
+    def GetValue(self):
+        return self.value
+
+    def GetFPID(self):
+        return self.fpid
+
+    def GetProperties(self):
+        return self.properties
+
+    def GetAttributes(self):
+        return self.attributes
+
+    def SetAttributes(self, attributes):
+        self.attributes = attributes
+
+    def GetLayer(self):
+        return self.layer
+
+    def GetOrientation(self):
+        return self.orientation
+
+    def GetPosition(self):
+        return self.position
+
+    def GetBoundingBox(self, include_text=True, include_invisible=True):
+        return BOX2I(self.position, self.size)
+
+
+class BOARD_DESIGN_SETTINGS:
+    def __init__(self, aux_origin=None):
+        self.aux_origin = aux_origin or VECTOR2I(0, 0)
+
+    def GetAuxOrigin(self):
+        return self.aux_origin
+
+
+class BOARD:
+    def __init__(self, filename, footprints, copper_layers=2):
+        self.filename = filename
+        self.footprints = footprints
+        self.copper_layers = copper_layers
+        self.design_settings = BOARD_DESIGN_SETTINGS()
+
+    def GetFileName(self):
+        return self.filename
+
+    def GetFootprints(self):
+        return self.footprints
+
+    def GetDesignSettings(self):
+        return self.design_settings
+
+    def GetCopperLayerCount(self):
+        return self.copper_layers
+
+    def GetDrawings(self):
+        return []
+
+    def GetTracks(self):
+        return []
+
+    def Zones(self):
+        return []
+
+
+# Plotting, drilling and zone filling need the real KiCad. The scenarios only
+# import these classes, their members are missing and raise AttributeError.
+
+
+class PLOT_CONTROLLER:
+    def __init__(self, board):
+        self.board = board
+
+
+class PCB_PLOT_PARAMS:
+    pass
+
+
+class EXCELLON_WRITER:
+    def __init__(self, board):
+        self.board = board
+
+
+class ZONE_FILLER:
+    def __init__(self, board):
+        self.board = board
+
+
+class ActionPlugin:
+    def register(self):
+        pass
+
+
+_board = None
+
+
+def SetBoard(board):
+    """Make a board the one returned by GetBoard(), exists only in the stand-in."""
+    global _board
+    _board = board
+
+
+def GetBoard():
+    return _board
+
+
+def GetBuildVersion():
+    return "7.0.0 (benchmark stand-in)"
+
+
+def Refresh():
+    pass
+
+
+def ToMM(value):
+    return value / 1000000
+
+
+def FromMM(value):
+    return int(value * 1000000)
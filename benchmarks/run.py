@@ -0,0 +1,362 @@
+"""Timed scenarios of the plugin hot paths on synthetic boards.
+
+    python benchmarks/run.py --scales 100 1000 --output results.json
+    python benchmarks/run.py --baseline results.json
+
+The plugin is imported as the package "nextpcb" without running its
+__init__, the pcbnew and wx stand-ins of this directory take the place of
+the real modules. Every scenario gets an untimed setup per scale and is then
+run --repeat times, an optional prepare step restores its starting state
+before every run. Results are printed and can be written as JSON, with
+--baseline a previous JSON file is compared and regressions set the exit code.
+"""
+
+import argparse
+import importlib
+import importlib.util
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import types
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+# the stand-ins shadow pcbnew and wx
+sys.path.insert(0, BENCH_DIR)
+
+import generate  # noqa: E402
+import pcbnew  # noqa: E402
+
+DEFAULT_SCALES = (100, 1000, 10000, 50000)
+# library rows per footprint, 50k footprints give a library of JLCPCB size
+LIBRARY_FACTOR = 10
+SHEET_SIZE = 500
+
+SCENARIOS = []
+
+
+def scenario(name, max_scale=None):
+    """Register a scenario, it is skipped above max_scale footprints."""
+
+    def register(setup):
+        SCENARIOS.append((name, max_scale, setup))
+        return setup
+
+    return register
+
+
+def import_plugin():
+    """Import the plugin modules as the package nextpcb."""
+    spec = importlib.util.spec_from_file_location(
+        "nextpcb", os.path.join(ROOT, "__init__.py"), submodule_search_locations=[ROOT]
+    )
+    sys.modules["nextpcb"] = importlib.util.module_from_spec(spec)
+    return types.SimpleNamespace(
+        **{
+            name: importlib.import_module(f"nextpcb.{name}")
+            for name in (
+                "corrections",
+                "fabrication",
+                "library",
+                "mainwindow",
+                "schematicexport",
+                "store",
+            )
+        }
+    )
+
+
+plugin = import_plugin()
+
+
+class Workspace:
+    """Synthetic board, project folder and plugin objects of a single scale."""
+
+    def __init__(self, root, scale, seed):
+        self.root = root
+        self.scale = scale
+        self.seed = seed
+        self.board = generate.make_board(
+            scale, seed, filename=os.path.join(root, "benchmark.kicad_pcb")
+        )
+        pcbnew.SetBoard(self.board)
+        self.parent = types.SimpleNamespace(
+            settings={},
+            store=None,
+            library=None,
+            corrections=plugin.corrections.CorrectionMatcher(
+                lambda: [(regex, str(c)) for regex, c in generate.CORRECTIONS]
+            ),
+        )
+
+    @property
+    def store(self):
+        """The store of the project, created from the board on first use."""
+        if self.parent.store is None:
+            self.parent.store = plugin.store.Store(self.parent, self.root)
+        return self.parent.store
+
+    @property
+    def library(self):
+        """The parts library with LIBRARY_FACTOR parts per footprint, created on first use."""
+        if self.parent.library is None:
+            plugin.library.PLUGIN_PATH = self.root
+            datadir = os.path.join(self.root, "jlcpcb")
+            os.makedirs(datadir, exist_ok=True)
+            generate.write_parts_db(
+                os.path.join(datadir, "parts.db"), self.scale * LIBRARY_FACTOR, self.seed
+            )
+            self.parent.library = plugin.library.Library(self.parent)
+        return self.parent.library
+
+    def sheets(self):
+        """Write fresh schematic sheets of the board, forget the last export."""
+        directory = os.path.join(self.root, "schematic")
+        shutil.rmtree(directory, ignore_errors=True)
+        cache = os.path.join(self.store.datadir, "schematic_cache.json")
+        if os.path.exists(cache):
+            os.remove(cache)
+        return generate.write_schematics(directory, self.board, SHEET_SIZE, self.seed)
+
+
+@scenario("store.update_from_board (new project)", max_scale=10000)
+def store_new(ws):
+    dbfile = os.path.join(ws.root, "nextpcb", "project.db")
+
+    def prepare():
+        if os.path.exists(dbfile):
+            os.remove(dbfile)
+
+    def run():
+        plugin.store.Store(ws.parent, ws.root)
+
+    return prepare, run
+
+
+@scenario("store.update_from_board (unchanged board)", max_scale=10000)
+def store_sync(ws):
+    store = ws.store
+    return None, store.update_from_board
+
+
+def footprint_list(ws, group_strategy):
+    """Run populate_footprint_list against a list that only records its rows."""
+    rows = []
+    view = types.SimpleNamespace(
+        store=ws.store,
+        corrections=ws.parent.corrections,
+        group_strategy=group_strategy,
+        selected_page_index=0,
+        footprint_list=types.SimpleNamespace(
+            DeleteAllItems=rows.clear, AppendItem=rows.append
+        ),
+    )
+    view.get_display_parts = lambda: plugin.mainwindow.NextPCBTools.get_display_parts(view)
+    populate = lambda: plugin.mainwindow.NextPCBTools.populate_footprint_list(view)
+    # the first run syncs the sides of all parts into the store
+    populate()
+    return None, populate
+
+
+@scenario("populate_footprint_list", max_scale=10000)
+def populate_list(ws):
+    return footprint_list(ws, 0)
+
+
+@scenario("populate_footprint_list (grouped)", max_scale=10000)
+def populate_grouped(ws):
+    return footprint_list(ws, 1)
+
+
+@scenario("fabrication.generate_cpl")
+def generate_cpl(ws):
+    ws.store
+    fabrication = plugin.fabrication.Fabrication(ws.parent)
+    return None, fabrication.generate_cpl
+
+
+@scenario("fabrication.generate_bom")
+def generate_bom(ws):
+    ws.store
+    fabrication = plugin.fabrication.Fabrication(ws.parent)
+    return None, fabrication.generate_bom
+
+
+@scenario("schematic export (changed sheets)")
+def schematic_changed(ws):
+    export = plugin.schematicexport.SchematicExport(ws.parent)
+    paths = []
+
+    def prepare():
+        paths[:] = ws.sheets()
+
+    return prepare, lambda: export.load_schematic(paths)
+
+
+@scenario("schematic export (unchanged sheets)")
+def schematic_unchanged(ws):
+    export = plugin.schematicexport.SchematicExport(ws.parent)
+    paths = ws.sheets()
+    export.load_schematic(paths)
+    return None, lambda: export.load_schematic(paths)
+
+
+@scenario("library.search")
+def library_search(ws):
+    library = ws.library
+    parameters = {
+        "keyword": "10k 0603",
+        "manufacturer": "",
+        "package": "",
+        "category": "Resistors",
+        "subcategory": "",
+        "part_no": "",
+        "solder_joints": "",
+        "basic": True,
+        "extended": True,
+        "stock": True,
+    }
+    return None, lambda: library.search(parameters)
+
+
+@scenario("library.categories")
+def library_categories(ws):
+    library = ws.library
+    # the library initialization precomputed the tables in the parts database
+
+    def run():
+        library.category_map = {}
+        library.summary = None
+        library.categories
+
+    return None, run
+
+
+@scenario("library.match_mappings")
+def match_mappings(ws):
+    library = ws.library
+    footprints = ws.board.GetFootprints()
+    library.upsert_mappings(
+        (str(fp.GetFPID().GetLibItemName()), fp.GetValue(), f"C{idx}")
+        for idx, fp in enumerate(footprints)
+        if idx % 2
+    )
+    pairs = [(str(fp.GetFPID().GetLibItemName()), fp.GetValue()) for fp in footprints]
+
+    def run():
+        library.mapping_cache = None
+        library.match_mappings(pairs)
+
+    return None, run
+
+
+def run_scenarios(scales, repeat, seed, selected):
+    """Run all selected scenarios at all scales, return the result records."""
+    results = []
+    for scale in scales:
+        for name, max_scale, setup in SCENARIOS:
+            if selected and not any(s in name for s in selected):
+                continue
+            record = {"scenario": name, "scale": scale}
+            if max_scale is not None and scale > max_scale:
+                record["skipped"] = f"above {max_scale} footprints"
+                print(f"{name:45} {scale:>7}  skipped")
+                results.append(record)
+                continue
+            # a fresh workspace per scenario keeps them independent
+            root = tempfile.mkdtemp(prefix="nextpcb-bench-")
+            try:
+                ws = Workspace(root, scale, seed)
+                prepare, run = setup(ws)
+                times = []
+                for _ in range(repeat):
+                    if prepare:
+                        prepare()
+                    start = time.perf_counter()
+                    run()
+                    times.append(time.perf_counter() - start)
+            finally:
+                shutil.rmtree(root, ignore_errors=True)
+            record.update(
+                runs=times,
+                min=min(times),
+                median=statistics.median(times),
+                mean=statistics.mean(times),
+            )
+            print(
+                f"{name:45} {scale:>7}  median {record['median'] * 1000:10.1f}ms"
+                f"  min {record['min'] * 1000:10.1f}ms"
+            )
+            results.append(record)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print the change of every median against a baseline, return the regressions."""
+    previous = {
+        (r["scenario"], r["scale"]): r for r in baseline["results"] if "median" in r
+    }
+    regressions = []
+    for record in results:
+        before = previous.get((record["scenario"], record["scale"]))
+        if not before or "median" not in record:
+            continue
+        ratio = record["median"] / before["median"] if before["median"] else float("inf")
+        flag = ""
+        if ratio > threshold:
+            flag = "  REGRESSION"
+            regressions.append(record)
+        print(f"{record['scenario']:45} {record['scale']:>7}  {ratio:6.2f}x{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--only", nargs="+", default=[], help="run scenarios whose name contains any of these"
+    )
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against the results in this JSON file")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.25,
+        help="median ratio against the baseline that counts as a regression",
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    with open(os.path.join(ROOT, "VERSION")) as f:
+        version = f.read().strip()
+    report = {
+        "version": version,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "results": run_scenarios(args.scales, args.repeat, args.seed, args.only),
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(report["results"], baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
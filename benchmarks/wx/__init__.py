@@ -0,0 +1,59 @@
+"""Minimal wx stand-in for the benchmarks, just enough to import the plugin modules.
+
+Every unknown attribute resolves to an inert placeholder, so module level
+constants, base classes and default arguments work. Nothing is displayed.
+"""
+
+
+class _PlaceholderType(type):
+    def __getattr__(cls, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return Placeholder
+
+    def __or__(cls, other):
+        return cls
+
+    __ror__ = __or__
+
+
+class Placeholder(metaclass=_PlaceholderType):
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return Placeholder()
+
+    def __call__(self, *args, **kwargs):
+        return Placeholder()
+
+    def __or__(self, other):
+        return self
+
+    __ror__ = __or__
+
+    def __iter__(self):
+        return iter(())
+
+    def __bool__(self):
+        return False
+
+
+def version():
+    return "4.2.0 gtk3 (phoenix) wxWidgets 3.2.1"
+
+
+def PostEvent(dest, event):
+    pass
+
+
+def CallAfter(callable, *args, **kwargs):
+    callable(*args, **kwargs)
+
+
+def __getattr__(name):
+    if name.startswith("__"):
+        raise AttributeError(name)
+    return Placeholder
@@ -0,0 +1,7 @@
+from . import Placeholder
+
+
+def __getattr__(name):
+    if name.startswith("__"):
+        raise AttributeError(name)
+    return Placeholder
@@ -0,0 +1,13 @@
+import itertools
+
+_binders = itertools.count(1)
+
+
+def NewEvent():
+    """Create an event class and a binder id like wx.lib.newevent.NewEvent."""
+
+    class _Event:
+        def __init__(self, **kwargs):
+            self.__dict__.update(kwargs)
+
+    return _Event, next(_binders)
@@ -0,0 +1,94 @@
+import logging
+import re
+import threading
+
+# a regex that refers to its own groups can't be embedded into a combined pattern
+BACKREFERENCE = re.compile(r"\\[1-9]|\(\?P=")
+
+
+class CorrectionMatcher:
+    """Find the rotation correction for a footprint value / package pair.
+
+    All correction regexes are compiled once into a single alternation. Every
+    alternative is a lookahead followed by an empty named group, so matching
+    at position 0 tries the regexes in list order and the name of the last
+    closed group tells which one matched first. Results are memoized per
+    (value, package) pair, so a board only costs one regex run per distinct
+    combination.
+    """
+
+    def __init__(self, source=None):
+        self.logger = logging.getLogger(__name__)
+        self.source = source
+        self.lock = threading.Lock()
+        self.corrections = None
+        self.pattern = None
+        self.patterns = []
+        self.cache = {}
+
+    def invalidate(self):
+        """Forget the compiled corrections, they are reloaded from the source on next use."""
+        with self.lock:
+            self.corrections = None
+            self.cache = {}
+
+    def load(self, corrections):
+        """Compile a list of (regex, correction) pairs."""
+        valid = []
+        for regex, correction in corrections:
+            try:
+                re.compile(regex)
+            except re.error as e:
+                self.logger.warning(f"Skip invalid rotation regex '{regex}': {e}")
+                continue
+            valid.append((regex, correction))
+        pattern = None
+        if not any(BACKREFERENCE.search(regex) for regex, _ in valid):
+            try:
+                pattern = re.compile(
+                    "|".join(
+                        f"(?=[\\s\\S]*?(?:{regex}))(?P<_c{idx}>)"
+                        for idx, (regex, _) in enumerate(valid)
+                    )
+                )
+            except re.error:
+                pattern = None
+        with self.lock:
+            self.corrections = valid
+            self.pattern = pattern
+            # fall back to one compiled regex per correction if they can't be combined
+            self.patterns = [] if pattern else [re.compile(r) for r, _ in valid]
+            self.cache = {}
+
+    def ensure_loaded(self):
+        """Load the corrections from the source if that did not happen yet."""
+        if self.corrections is None:
+            self.load(self.source() if self.source else [])
+
+    def search(self, text):
+        """Get the first correction whose regex matches the text."""
+        if not self.corrections:
+            return None
+        if self.pattern:
+            m = self.pattern.match(text)
+            if m:
+                return self.corrections[int(m.lastgroup[2:])][1]
+            return None
+        for idx, regex in enumerate(self.patterns):
+            if regex.search(text):
+                return self.corrections[idx][1]
+        return None
+
+    def get(self, value, package):
+        """Get the correction for a part, the value takes precedence over the package."""
+        self.ensure_loaded()
+        key = (value, package)
+        try:
+            return self.cache[key]
+        except KeyError:
+            pass
+        correction = self.search(value)
+        if correction is None:
+            correction = self.search(package)
+        self.cache[key] = correction
+        return correction
@@ -0,0 +1,83 @@
+import logging
+
+import wx
+
+from .apiclient import client
+from .helpers import HighResWxSize
+from .perf import monitor
+from .profiling import profiler
+
+
+class DiagnosticsDialog(wx.Dialog):
+    """Summary of the recorded timings, SQL and HTTP counters."""
+
+    def __init__(self, parent, logfile=None):
+        wx.Dialog.__init__(
+            self,
+            parent,
+            id=wx.ID_ANY,
+            title="NextPCB tools diagnostics",
+            pos=wx.DefaultPosition,
+            size=HighResWxSize(parent.window, wx.Size(800, 600)),
+            style=wx.DEFAULT_DIALOG_STYLE | wx.RESIZE_BORDER | wx.MAXIMIZE_BOX,
+        )
+
+        self.logger = logging.getLogger(__name__)
+        self.parent = parent
+        self.logfile = logfile
+
+        self.summary = wx.TextCtrl(
+            self,
+            wx.ID_ANY,
+            style=wx.TE_MULTILINE | wx.TE_READONLY | wx.HSCROLL,
+        )
+        self.summary.SetFont(
+            wx.Font(9, wx.FONTFAMILY_TELETYPE, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL)
+        )
+
+        self.refresh_button = wx.Button(self, wx.ID_ANY, "Refresh")
+        self.reset_button = wx.Button(self, wx.ID_ANY, "Reset")
+        self.close_button = wx.Button(self, wx.ID_CLOSE, "Close")
+        self.refresh_button.Bind(wx.EVT_BUTTON, self.refresh)
+        self.reset_button.Bind(wx.EVT_BUTTON, self.reset)
+        self.close_button.Bind(wx.EVT_BUTTON, self.quit_dialog)
+        self.Bind(wx.EVT_CLOSE, self.quit_dialog)
+
+        button_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        button_sizer.Add(self.refresh_button, 0, wx.ALL, 5)
+        button_sizer.Add(self.reset_button, 0, wx.ALL, 5)
+        button_sizer.AddStretchSpacer()
+        button_sizer.Add(self.close_button, 0, wx.ALL, 5)
+
+        layout = wx.BoxSizer(wx.VERTICAL)
+        layout.Add(self.summary, 1, wx.ALL | wx.EXPAND, 5)
+        layout.Add(button_sizer, 0, wx.ALL | wx.EXPAND, 5)
+        self.SetSizer(layout)
+        self.Layout()
+        self.Centre(wx.BOTH)
+
+        self.refresh()
+
+    def refresh(self, e=None):
+        """Show the current statistics."""
+        if monitor.enabled:
+            lines = [f"Performance log: {self.logfile}"]
+        else:
+            lines = ["Performance log is disabled, enable it in the settings to record timings."]
+        if profiler.enabled:
+            lines.append(f"Profiles: {profiler.directory}")
+        lines += ["", "Operations:"]
+        lines += monitor.summary() or ["none recorded"]
+        lines += ["", "HTTP endpoints:"]
+        lines += client.summary() or ["none called"]
+        self.summary.SetValue("\n".join(lines))
+
+    def reset(self, e=None):
+        """Forget the recorded timings and counters."""
+        monitor.reset()
+        self.refresh()
+
+    def quit_dialog(self, e=None):
+        if self.IsModal():
+            self.EndModal(wx.ID_OK)
+        self.Destroy()
@@ -1,9 +1,9 @@
 import csv
+import hashlib
+import json
 import logging
 import os
-import re
 from pathlib import Path
-from zipfile import ZipFile
 
 from pcbnew import (
     EXCELLON_WRITER,
@@ -31,7 +31,51 @@ from pcbnew import (
     ToMM,
 )
 
-from .helpers import get_exclude_from_pos, get_footprint_by_ref, get_smd, is_nightly
+from .helpers import get_exclude_from_pos, get_smd, get_valid_footprints, is_nightly
+from .ziparchive import DEFAULT_COMPRESSION_LEVEL, write_zip
+
+# Getters whose results describe how a board item is plotted, missing ones are skipped,
+# an item whose getter fails cannot be described and its layers are replotted
+ITEM_SIGNATURE_GETTERS = (
+    "GetPosition",
+    "GetStart",
+    "GetEnd",
+    "GetWidth",
+    "GetShape",
+    "GetSize",
+    "GetDrillSize",
+    "GetDrillShape",
+    "GetOffset",
+    "GetOrientation",
+    "GetRoundRectRadiusRatio",
+    "GetChamferRectRatio",
+    "GetChamferPositions",
+    "GetAnchorPadShape",
+    "GetBezierC1",
+    "GetBezierC2",
+    "GetNetCode",
+    "GetText",
+    "GetTextSize",
+    "GetTextThickness",
+    "GetTextAngle",
+    "GetHorizJustify",
+    "GetVertJustify",
+    "IsMirrored",
+    "IsBold",
+    "IsItalic",
+    "GetFontName",
+    "IsVisible",
+    "GetLocalSolderMaskMargin",
+    "GetLocalSolderPasteMargin",
+)
+# gerber settings that change the plotted layers, the others only affect the ZIP or the zones
+PLOT_SETTINGS = ("plot_values", "plot_references", "tented_vias")
+
+# Silkscreen is clipped by the soldermask, so it has to be replotted when the mask changes
+PLOT_DEPENDENCIES = {
+    F_SilkS: (F_Mask,),
+    B_SilkS: (B_Mask,),
+}
 
 
 class Fabrication:
@@ -39,7 +83,6 @@ class Fabrication:
         self.parent = parent
         self.logger = logging.getLogger(__name__)
         self.board = GetBoard()
-        self.corrections = []
         self.path, self.filename = os.path.split(self.board.GetFileName())
         self.create_folders()
 
@@ -49,6 +92,7 @@ class Fabrication:
         Path(self.outputdir).mkdir(parents=True, exist_ok=True)
         self.gerberdir = os.path.join(self.path, "nextpcb", "gerber")
         Path(self.gerberdir).mkdir(parents=True, exist_ok=True)
+        self.plot_cache_file = os.path.join(self.path, "nextpcb", "plot_cache.json")
 
     def fill_zones(self):
         """Refill copper zones following user prompt."""
@@ -71,14 +115,12 @@ class Fabrication:
         if footprint.GetLayer() != 0:
             # bottom angles need to be mirrored on Y-axis
             rotation = (180 - rotation) % 360
-        # First check if the value aka part name matches
-        for regex, correction in self.corrections:
-            if re.search(regex, str(footprint.GetValue())):
-                return self.rotate(footprint, rotation, correction)
-        # Then if the package matches
-        for regex, correction in self.corrections:
-            if re.search(regex, str(footprint.GetFPID().GetLibItemName())):
-                return self.rotate(footprint, rotation, correction)
+        # The value aka part name takes precedence over the package
+        correction = self.parent.corrections.get(
+            str(footprint.GetValue()), str(footprint.GetFPID().GetLibItemName())
+        )
+        if correction is not None:
+            return self.rotate(footprint, rotation, correction)
         # If no correction matches, return the original rotation
         return rotation
 
@@ -158,10 +200,6 @@ class Fabrication:
 
         popt.SetPlotFrameRef(False)
 
-        # delete all existing files in the output directory first
-        for f in os.listdir(self.gerberdir):
-            os.remove(os.path.join(self.gerberdir, f))
-
         # if no layer_count is given, get the layer count from the board
         if not layer_count:
             layer_count = self.board.GetCopperLayerCount()
@@ -221,7 +259,33 @@ class Fabrication:
                 ("VScore", Cmts_User, "V score cut"),
             ]
 
+        # only replot layers whose content or plot options changed since the last run
+        fingerprints = self.get_layer_fingerprints(plot_plan, layer_count)
+        cache = self.load_plot_cache()
+        plot_cache = {}
+        # files of a renamed board are not reused, they would carry the old name into the ZIP
+        prefix = f"{os.path.splitext(self.filename)[0]}-"
         for layer_info in plot_plan:
+            cached = cache.get(layer_info[0])
+            if (
+                cached
+                and fingerprints[layer_info[0]] is not None
+                and cached["fingerprint"] == fingerprints[layer_info[0]]
+                and cached["file"].startswith(prefix)
+                and os.path.isfile(os.path.join(self.gerberdir, cached["file"]))
+            ):
+                plot_cache[layer_info[0]] = cached
+
+        # delete all files in the output directory that are not reused
+        reused = {c["file"] for c in plot_cache.values()}
+        for f in os.listdir(self.gerberdir):
+            if f not in reused:
+                os.remove(os.path.join(self.gerberdir, f))
+
+        for layer_info in plot_plan:
+            if layer_info[0] in plot_cache:
+                self.logger.info(f"{layer_info[2]} is unchanged, reusing the plotted file")
+                continue
             if layer_info[1] <= B_Cu:
                 popt.SetSkipPlotNPTH_Pads(True)
             else:
@@ -230,8 +294,158 @@ class Fabrication:
             pctl.OpenPlotfile(layer_info[0], PLOT_FORMAT_GERBER, layer_info[2])
             if pctl.PlotLayer() is False:
                 self.logger.error(f"Error plotting {layer_info[2]}")
+                continue
+            plot_cache[layer_info[0]] = {
+                "fingerprint": fingerprints[layer_info[0]],
+                "file": os.path.basename(pctl.GetPlotFileName()),
+            }
             self.logger.info(f"Successfully plotted {layer_info[2]}")
         pctl.ClosePlot()
+        self.save_plot_cache(plot_cache)
+
+    def load_plot_cache(self):
+        """Load the layer fingerprints of the last Gerber generation."""
+        try:
+            with open(self.plot_cache_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_plot_cache(self, cache):
+        """Persist the layer fingerprints of the current Gerber generation."""
+        with open(self.plot_cache_file, "w") as f:
+            json.dump(cache, f)
+
+    def get_board_items(self):
+        """Yield every item of the board that can end up in a Gerber file."""
+        yield from self.board.GetDrawings()
+        yield from self.board.GetTracks()
+        yield from self.board.Zones()
+        for fp in self.board.GetFootprints():
+            yield from fp.Pads()
+            yield from fp.GraphicalItems()
+            yield from fp.Zones()
+            if hasattr(fp, "GetFields"):
+                yield from fp.GetFields()
+            else:
+                yield fp.Reference()
+                yield fp.Value()
+
+    @staticmethod
+    def get_item_signature(item):
+        """Describe the plotted geometry of a board item as bytes, None if that is not possible."""
+        parts = [item.GetClass()]
+        for getter in ITEM_SIGNATURE_GETTERS:
+            fn = getattr(item, getter, None)
+            if fn is None:
+                continue
+            try:
+                v = fn()
+            except Exception:
+                return None
+            if hasattr(v, "AsDegrees"):
+                v = v.AsDegrees()
+            elif hasattr(v, "x") and hasattr(v, "y"):
+                v = (v.x, v.y)
+            parts.append(f"{getter}={v}")
+        try:
+            bbox = item.GetBoundingBox()
+            parts.append(f"{bbox.GetX()},{bbox.GetY()},{bbox.GetWidth()},{bbox.GetHeight()}")
+            if hasattr(item, "GetPolyShape"):
+                parts.append(f"poly={Fabrication.get_poly_set_signature(item.GetPolyShape())}")
+            if hasattr(item, "GetPrimitives"):
+                # custom pad shapes
+                for primitive in item.GetPrimitives():
+                    signature = Fabrication.get_item_signature(primitive)
+                    if signature is None:
+                        return None
+                    parts.append(signature.decode("utf-8").rstrip("\n"))
+        except Exception:
+            return None
+        if hasattr(item, "GetFilledPolysList"):
+            fill = Fabrication.get_zone_fill_signature(item)
+            if fill is None:
+                return None
+            parts.append(f"fill={fill}")
+        return ("|".join(parts) + "\n").encode("utf-8")
+
+    @staticmethod
+    def get_poly_set_signature(polys):
+        """Hash the outlines and holes of a SHAPE_POLY_SET."""
+        h = hashlib.sha1()
+        for idx in range(polys.OutlineCount()):
+            chains = [polys.Outline(idx)]
+            chains += [polys.Hole(idx, hole) for hole in range(polys.HoleCount(idx))]
+            for chain in chains:
+                points = (chain.CPoint(n) for n in range(chain.PointCount()))
+                h.update(";".join(f"{p.x},{p.y}" for p in points).encode("utf-8"))
+                h.update(b"|")
+        return h.hexdigest()
+
+    @staticmethod
+    def get_zone_fill_signature(zone):
+        """Hash the filled polygons of a zone on all its layers, None if they cannot be read."""
+        h = hashlib.sha1()
+        try:
+            for layer in zone.GetLayerSet().Seq():
+                polys = zone.GetFilledPolysList(layer)
+                h.update(f"{Fabrication.get_poly_set_signature(polys)}#{layer}\n".encode("utf-8"))
+        except Exception:
+            return None
+        return h.hexdigest()
+
+    def get_layer_fingerprints(self, plot_plan, layer_count):
+        """Hash the items on every layer of the plot plan together with the plot options."""
+        ds = self.board.GetDesignSettings()
+        aux_origin = ds.GetAuxOrigin()
+        options = json.dumps(
+            [
+                {
+                    setting: self.parent.settings.get("gerber", {}).get(setting, True)
+                    for setting in PLOT_SETTINGS
+                },
+                layer_count,
+                GetBuildVersion(),
+                (aux_origin.x, aux_origin.y),
+                [
+                    str(getattr(ds, a, ""))
+                    for a in (
+                        "m_SolderMaskExpansion",
+                        "m_SolderMaskMinWidth",
+                        "m_SolderPasteMargin",
+                        "m_SolderPasteMarginRatio",
+                    )
+                ],
+            ],
+            sort_keys=True,
+        ).encode("utf-8")
+        layers = {layer_info[1] for layer_info in plot_plan}
+        for layer_info in plot_plan:
+            layers.update(PLOT_DEPENDENCIES.get(layer_info[1], ()))
+        hashes = {layer: hashlib.sha1(options) for layer in layers}
+        # layers with an item that cannot be described are always replotted
+        undescribed = set()
+        for item in self.get_board_items():
+            signature = b""
+            for layer, h in hashes.items():
+                if item.IsOnLayer(layer):
+                    if signature == b"":
+                        signature = self.get_item_signature(item)
+                    if signature is None:
+                        undescribed.add(layer)
+                    else:
+                        h.update(signature)
+        fingerprints = {}
+        for name, layer, _ in plot_plan:
+            dependencies = PLOT_DEPENDENCIES.get(layer, ())
+            if layer in undescribed or undescribed.intersection(dependencies):
+                fingerprints[name] = None
+                continue
+            h = hashes[layer].copy()
+            for dependency in dependencies:
+                h.update(hashes[dependency].digest())
+            fingerprints[name] = h.hexdigest()
+        return fingerprints
 
     def generate_excellon(self):
         """Generate Excellon files."""
@@ -250,20 +464,50 @@ class Fabrication:
     def zip_gerber_excellon(self):
         """Zip Gerber and Excellon files, ready for upload to JLCPCB."""
         zipname = f"GERBER-{self.filename.split('.')[0]}.zip"
-        with ZipFile(os.path.join(self.outputdir, zipname), "w") as zipfile:
-            for folderName, subfolders, filenames in os.walk(self.gerberdir):
-                for filename in filenames:
-                    if not filename.endswith(("gbr", "drl", "pdf")):
-                        continue
-                    filePath = os.path.join(folderName, filename)
-                    zipfile.write(filePath, os.path.basename(filePath))
+        files = []
+        for folderName, subfolders, filenames in os.walk(self.gerberdir):
+            for filename in filenames:
+                if not filename.endswith(("gbr", "drl", "pdf")):
+                    continue
+                filePath = os.path.join(folderName, filename)
+                files.append((filePath, os.path.basename(filePath)))
+        level = self.parent.settings.get("gerber", {}).get(
+            "zip_compression_level", DEFAULT_COMPRESSION_LEVEL
+        )
+        write_zip(os.path.join(self.outputdir, zipname), files, level)
         self.logger.info("Finished generating ZIP file")
 
-    def generate_cpl(self):
+    def get_cpl_rows(self):
+        """Collect the placement data from the board, this has to run on the UI thread."""
+        aux_orgin = self.board.GetDesignSettings().GetAuxOrigin()
+        footprints = {}
+        for fp in get_valid_footprints(self.board):
+            footprints.setdefault(str(fp.GetReference()), []).append(fp)
+        rows = []
+        for part in self.parent.store.read_pos_parts():
+            for fp in footprints.get(part[0], []):
+                if get_exclude_from_pos(fp):
+                    continue
+                position = self.get_position(fp) - aux_orgin
+                rows.append(
+                    [
+                        part[0],
+                        part[1],
+                        part[2],
+                        ToMM(position.x),
+                        ToMM(position.y) * -1,
+                        '',
+                        #self.fix_rotation(fp),
+                        "top" if fp.GetLayer() == 0 else "bottom",
+                    ]
+                )
+        return rows
+
+    def generate_cpl(self, rows=None):
         """Generate placement file (CPL)."""
+        if rows is None:
+            rows = self.get_cpl_rows()
         cplname = f"CPL-{self.filename.split('.')[0]}.csv"
-        #self.corrections = self.parent.library.get_all_correction_data()
-        aux_orgin = self.board.GetDesignSettings().GetAuxOrigin()
         with open(
             os.path.join(self.outputdir, cplname), "w", newline="", encoding="utf-8"
         ) as csvfile:
@@ -271,23 +515,7 @@ class Fabrication:
             writer.writerow(
                 ["Designator", "Val", "Package", "Mid X", "Mid Y", "Rotation", "Layer"]
             )
-            for part in self.parent.store.read_pos_parts():
-                for fp in get_footprint_by_ref(self.board, part[0]):
-                    if get_exclude_from_pos(fp):
-                        continue
-                    position = self.get_position(fp) - aux_orgin
-                    writer.writerow(
-                        [
-                            part[0],
-                            part[1],
-                            part[2],
-                            ToMM(position.x),
-                            ToMM(position.y) * -1,
-                            '',
-                            #self.fix_rotation(fp),
-                            "top" if fp.GetLayer() == 0 else "bottom",
-                        ]
-                    )
+            writer.writerows(rows)
         self.logger.info("Finished generating CPL file")
 
     def generate_bom(self):
@@ -0,0 +1,140 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import wx
+
+from .events import MessageEvent, ResetGaugeEvent, UpdateGaugeEvent
+from .perf import monitor
+from .profiling import profiler
+
+
+class JobCancelled(Exception):
+    """Raised when a stage is about to start after the job was cancelled."""
+
+
+class Stage:
+    """A single step of a fabrication job."""
+
+    def __init__(self, name, func, foreground=False):
+        self.name = name
+        self.func = func
+        # foreground stages access pcbnew and have to run on the UI thread
+        self.foreground = foreground
+        self.duration = None
+
+
+class FabricationJob:
+    """Run fabrication stages with progress on the gauge, timing and cancellation.
+
+    Foreground stages run one after another on the UI thread. Between two of
+    them control goes back to the event loop, so the gauge repaints and a
+    cancel request can come in. Once they are done, the remaining stages
+    only need files and the project database and run in parallel on worker
+    threads. Cancellation takes effect before the next stage starts.
+    """
+
+    def __init__(self, parent, stages, on_finished=None):
+        self.logger = logging.getLogger(__name__)
+        self.parent = parent
+        self.stages = stages
+        self.on_finished = on_finished
+        self.cancelled = threading.Event()
+        self.lock = threading.Lock()
+        self.completed = 0
+        self.error = None
+        self.start_time = None
+        self.duration = None
+        self.pending = [s for s in stages if s.foreground]
+        self.background = [s for s in stages if not s.foreground]
+
+    @property
+    def succeeded(self):
+        """Whether all stages ran without error or cancellation."""
+        return self.error is None and not self.cancelled.is_set()
+
+    def start(self):
+        """Start the job, returns immediately."""
+        self.start_time = time.perf_counter()
+        wx.PostEvent(self.parent, ResetGaugeEvent())
+        wx.CallAfter(self.run_next_foreground)
+
+    def cancel(self):
+        """Ask the job to stop before the next stage."""
+        self.logger.info("Cancelling fabrication job...")
+        self.cancelled.set()
+
+    def run_stage(self, stage):
+        """Run a single stage, log its duration and advance the gauge."""
+        if self.cancelled.is_set():
+            raise JobCancelled()
+        start = time.perf_counter()
+        profiler.run(f"fabrication {stage.name}", stage.func)
+        stage.duration = time.perf_counter() - start
+        monitor.record(f"fabrication {stage.name}", stage.duration)
+        self.logger.info(f"Stage '{stage.name}' finished in {stage.duration:.2f}s")
+        with self.lock:
+            self.completed += 1
+            progress = self.completed / len(self.stages) * 100
+        wx.PostEvent(self.parent, UpdateGaugeEvent(value=progress))
+
+    def run_next_foreground(self):
+        """Run the next UI thread stage and schedule the one after it."""
+        if not self.pending:
+            threading.Thread(target=self.run_background, daemon=True).start()
+            return
+        try:
+            self.run_stage(self.pending.pop(0))
+        except JobCancelled:
+            self.finish()
+            return
+        except Exception as e:
+            self.finish(e)
+            return
+        wx.CallAfter(self.run_next_foreground)
+
+    def run_background(self):
+        """Run all worker thread stages in parallel and wait for them."""
+        error = None
+        if self.background:
+            with ThreadPoolExecutor(max_workers=len(self.background)) as pool:
+                futures = [pool.submit(self.run_stage, s) for s in self.background]
+                for future in futures:
+                    try:
+                        future.result()
+                    except JobCancelled:
+                        pass
+                    except Exception as e:
+                        error = error or e
+        wx.CallAfter(self.finish, error)
+
+    def finish(self, error=None):
+        """Log the stage timings and report the outcome, runs on the UI thread."""
+        self.error = error
+        self.duration = time.perf_counter() - self.start_time
+        timings = ", ".join(
+            f"{s.name}: {s.duration:.2f}s" for s in self.stages if s.duration is not None
+        )
+        if self.cancelled.is_set():
+            self.logger.info(f"Fabrication job cancelled after {self.duration:.2f}s ({timings})")
+        elif error:
+            self.logger.error(f"Fabrication job failed: {error}")
+        else:
+            self.logger.info(f"Fabrication job finished in {self.duration:.2f}s ({timings})")
+            monitor.record("fabrication", self.duration)
+        if not self.parent:
+            # the window was closed while the job was running
+            return
+        if error and not self.cancelled.is_set():
+            wx.PostEvent(
+                self.parent,
+                MessageEvent(
+                    title="Fabrication Error",
+                    text=f"Failed to generate the fabrication data, {error}",
+                    style="error",
+                ),
+            )
+        wx.PostEvent(self.parent, ResetGaugeEvent())
+        if self.on_finished:
+            self.on_finished(self)
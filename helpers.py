@@ -1,3 +1,4 @@
+import functools
 import os
 import re
 
@@ -5,6 +6,9 @@ import wx
 
 PLUGIN_PATH = os.path.split(os.path.abspath(__file__))[0]
 
+# scaled bitmaps and icons by (filename, scale, kind), filled on first use
+BITMAP_CACHE = {}
+
 THT = 0
 SMD = 1
 EXCLUDE_FROM_POS = 2
@@ -17,6 +21,7 @@ def is_nightly(version: str) -> bool:
     return any(v in version for v in ("6.99", "7.0", "7.99"))
 
 
+@functools.lru_cache(maxsize=None)
 def getWxWidgetsVersion():
     v = re.search(r"wxWidgets\s([\d\.]+)", wx.version())
     v = int(v.group(1).replace(".", ""))
@@ -48,7 +53,19 @@ def HighResWxSize(window, size):
 
 
 def loadBitmapScaled(filename, scale=1.0, static=False):
-    """Load a scaled bitmap, handle differences between Kicad versions"""
+    """Load a scaled bitmap, handle differences between Kicad versions
+
+    Every bitmap is read and scaled once, later calls get the cached bitmap.
+    """
+    key = (filename, scale, "static" if static else "bundle")
+    bmp = BITMAP_CACHE.get(key)
+    if bmp is None:
+        bmp = BITMAP_CACHE[key] = _renderBitmap(filename, scale, static)
+    return bmp
+
+
+def _renderBitmap(filename, scale, static):
+    """Read a bitmap from the icons folder and scale it."""
     if filename:
         path = os.path.join(PLUGIN_PATH, "icons", filename)
         bmp = wx.Bitmap(path)
@@ -67,21 +84,23 @@ def loadIconScaled(filename, scale=1.0):
     bmp = loadBitmapScaled(filename, scale=scale, static=False)
     if getWxWidgetsVersion() > 315:
         return bmp
-    return wx.Icon(bmp)
+    key = (filename, scale, "icon")
+    icon = BITMAP_CACHE.get(key)
+    if icon is None:
+        icon = BITMAP_CACHE[key] = wx.Icon(bmp)
+    return icon
+
+
+def natural_sort_key(text):
+    """Split a string into text and number chunks so that R2 sorts before R10."""
+    return [int(c) if c.isdigit() else c.lower() for c in re.split("([0-9]+)", text)]
 
 
 def natural_sort_collation(a, b):
     """Natural sort collation for use in sqlite."""
     if a == b:
         return 0
-
-    def convert(text):
-        return int(text) if text.isdigit() else text.lower()
-
-    def alphanum_key(key):
-        return [convert(c) for c in re.split("([0-9]+)", key)]
-
-    natorder = sorted([a, b], key=alphanum_key)
+    natorder = sorted([a, b], key=natural_sort_key)
     return -1 if natorder.index(a) == 0 else 1
 
 
@@ -131,10 +131,31 @@ for c in comps:
 
 conn.executemany("INSERT INTO parts VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
 conn.commit()
+
+# precompute the category tree, manufacturers and packages with their part counts,
+# the plugin loads them instead of scanning the parts table
+build_date = date.today().isoformat()
+conn.execute(
+    """
+    CREATE TABLE categories AS
+    SELECT "First Category" AS category, "Second Category" AS subcategory, COUNT(*) AS count
+    FROM parts GROUP BY 1, 2
+    """
+)
+conn.execute(
+    'CREATE TABLE manufacturers AS SELECT "Manufacturer" AS name, COUNT(*) AS count FROM parts GROUP BY 1'
+)
+conn.execute(
+    'CREATE TABLE packages AS SELECT "Package" AS name, COUNT(*) AS count FROM parts GROUP BY 1'
+)
+conn.execute("CREATE TABLE summary_info ('date')")
+conn.execute("INSERT INTO summary_info VALUES(?)", [build_date])
+conn.commit()
+
 db_size = os.stat(partsdb).st_size
 conn.execute(
     "INSERT INTO meta VALUES(?, ?, ?, ?, ?)",
-    ["cache.sqlite3", db_size, len(comps), date.today(), datetime.now().isoformat()],
+    ["cache.sqlite3", db_size, len(comps), build_date, datetime.now().isoformat()],
 )
 conn.commit()
 conn.close()
@@ -2,6 +2,7 @@ import contextlib
 import logging
 import os
 import shlex
+import shutil
 import sqlite3
 import time
 from enum import Enum
@@ -13,6 +14,7 @@ from glob import glob
 import requests
 import wx
 
+from .apiclient import client
 from .events import (
     MessageEvent,
     PopulateFootprintListEvent,
@@ -20,6 +22,19 @@ from .events import (
     UpdateGaugeEvent,
 )
 from .helpers import PLUGIN_PATH, natural_sort_collation
+from .perf import connect, monitor
+from .profiling import profiler
+
+# names the parts database in use, it is replaced atomically after an update
+PARTS_POINTER = "parts.current"
+LEGACY_PARTS_DB = "parts.db"
+# tables precomputed from the parts table, they belong to the meta date in summary_info
+SUMMARY_TABLES = {
+    "categories": 'SELECT "First Category" AS category, "Second Category" AS subcategory, '
+    'COUNT(*) AS count FROM parts GROUP BY 1, 2',
+    "manufacturers": 'SELECT "Manufacturer" AS name, COUNT(*) AS count FROM parts GROUP BY 1',
+    "packages": 'SELECT "Package" AS name, COUNT(*) AS count FROM parts GROUP BY 1',
+}
 
 
 class LibraryState(Enum):
@@ -40,11 +55,16 @@ class Library:
         self.order_by = "LCSC Part"
         self.order_dir = "ASC"
         self.datadir = os.path.join(PLUGIN_PATH, "jlcpcb")
-        self.partsdb_file = os.path.join(self.datadir, "parts.db")
+        self.pointer_file = os.path.join(self.datadir, PARTS_POINTER)
+        self.pointer_mtime = None
+        self.partsdb_name = LEGACY_PARTS_DB
         self.rotationsdb_file = os.path.join(self.datadir, "rotations.db")
         self.mappingsdb_file = os.path.join(self.datadir, "mappings.db")
         self.state = None
         self.category_map = {}
+        # None until the precomputed tables are loaded
+        self.summary = None
+        self.mapping_cache = None
         self.setup()
         self.check_library()
 
@@ -56,6 +76,45 @@ class Library:
             )
             Path(self.datadir).mkdir(parents=True, exist_ok=True)
 
+    @property
+    def partsdb_file(self):
+        """Path of the parts database in use.
+
+        The pointer file is followed, so every new connection goes to the
+        database of the last update while open connections finish on theirs.
+        """
+        try:
+            mtime = os.stat(self.pointer_file).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime != self.pointer_mtime:
+            self.pointer_mtime = mtime
+            self.partsdb_name = self.read_parts_pointer()
+            self.category_map = {}
+            self.summary = None
+        return os.path.join(self.datadir, self.partsdb_name)
+
+    def read_parts_pointer(self):
+        """Name of the current parts database, parts.db if no update was swapped in yet."""
+        try:
+            with open(self.pointer_file) as f:
+                name = f.read().strip()
+        except OSError:
+            return LEGACY_PARTS_DB
+        if name and os.path.isfile(os.path.join(self.datadir, name)):
+            return name
+        self.logger.warning(f"Parts database '{name}' of the pointer file is missing.")
+        return LEGACY_PARTS_DB
+
+    @property
+    def searchable(self):
+        """True if there is a parts database to search, also while an update downloads."""
+        if self.state == LibraryState.INITIALIZED:
+            return True
+        return self.state == LibraryState.DOWNLOAD_RUNNING and os.path.isfile(
+            self.partsdb_file
+        )
+
     def check_library(self):
         """Check if the database files exists, if not trigger update / create database"""
         if (
@@ -65,18 +124,21 @@ class Library:
             self.state = LibraryState.UPDATE_NEEDED
         else:
             self.state = LibraryState.INITIALIZED
+            self.ensure_summary()
         if (
             not os.path.isfile(self.rotationsdb_file)
             or os.path.getsize(self.rotationsdb_file) == 0
         ):
             self.create_rotation_table()
             self.migrate_rotations()
+        self.migrate_rotation_key()
         if (
             not os.path.isfile(self.mappingsdb_file)
             or os.path.getsize(self.mappingsdb_file) == 0
         ):
             self.create_mapping_table()
             self.migrate_mappings()
+        self.create_mapping_index()
 
     def set_order_by(self, n):
         """Set which value we want to order by when getting data from the database"""
@@ -97,6 +159,7 @@ class Library:
             self.order_by = order_by[n]
             self.order_dir = "ASC"
 
+    @monitor.timed("library search")
     def search(self, parameters):
         """Search the database for parts that meet the given parameters."""
         columns = [
@@ -117,6 +180,7 @@ class Library:
             keywords = shlex.split(parameters["keyword"])
         except ValueError as e:
             self.logger.error("Can't split keyword: %s", str(e))
+            keywords = parameters["keyword"].split()
 
         keyword_columns = [
             "LCSC Part",
@@ -165,23 +229,23 @@ class Library:
 
         query += " AND ".join(query_chunks)
         query += f' ORDER BY "{self.order_by}" COLLATE naturalsort {self.order_dir}'
-        query += " LIMIT 1000"
+        query += f" LIMIT {int(parameters.get('limit', 1000))}"
 
-        with contextlib.closing(sqlite3.connect(self.partsdb_file)) as con:
+        with contextlib.closing(connect(self.partsdb_file)) as con:
             con.create_collation("naturalsort", natural_sort_collation)
             with con as cur:
                 return cur.execute(query).fetchall()
 
     def delete_parts_table(self):
         """Delete the parts table."""
-        with contextlib.closing(sqlite3.connect(self.partsdb_file)) as con:
+        with contextlib.closing(connect(self.partsdb_file)) as con:
             with con as cur:
                 cur.execute("DROP TABLE IF EXISTS parts")
                 cur.commit()
 
     def create_meta_table(self):
         """Create the meta table."""
-        with contextlib.closing(sqlite3.connect(self.partsdb_file)) as con:
+        with contextlib.closing(connect(self.partsdb_file)) as con:
             with con as cur:
                 cur.execute(
                     "CREATE TABLE IF NOT EXISTS meta ('filename', 'size', 'partcount', 'date', 'last_update')"
@@ -189,52 +253,70 @@ class Library:
                 cur.commit()
 
     def create_rotation_table(self):
-        self.logger.debug("Create SQLite table for rotations")
         """Create the rotation table."""
-        with contextlib.closing(sqlite3.connect(self.rotationsdb_file)) as con:
+        self.logger.debug("Create SQLite table for rotations")
+        with contextlib.closing(connect(self.rotationsdb_file)) as con:
             with con as cur:
                 cur.execute(
-                    "CREATE TABLE IF NOT EXISTS rotation ('regex', 'correction')"
+                    "CREATE TABLE IF NOT EXISTS rotation ('regex' PRIMARY KEY, 'correction')"
                 )
                 cur.commit()
 
+    def migrate_rotation_key(self):
+        """Rebuild rotation tables of older databases with regex as primary key, the latest duplicate wins."""
+        with contextlib.closing(connect(self.rotationsdb_file)) as con:
+            with con as cur:
+                columns = cur.execute("PRAGMA table_info(rotation)").fetchall()
+                if not columns or any(name == "regex" and pk for _, name, _, _, _, pk in columns):
+                    return
+                cur.execute("CREATE TABLE rotation_new ('regex' PRIMARY KEY, 'correction')")
+                cur.execute(
+                    "INSERT INTO rotation_new SELECT regex, correction FROM rotation \
+                    WHERE rowid IN (SELECT MAX(rowid) FROM rotation GROUP BY regex)"
+                )
+                cur.execute("DROP TABLE rotation")
+                cur.execute("ALTER TABLE rotation_new RENAME TO rotation")
+                self.logger.debug("Migrated rotation table to a primary key on regex.")
+
     def get_correction_data(self, regex):
         """Get the correction data by its regex."""
-        with contextlib.closing(sqlite3.connect(self.rotationsdb_file)) as con:
+        with contextlib.closing(connect(self.rotationsdb_file)) as con:
             with con as cur:
                 return cur.execute(
-                    f"SELECT * FROM rotation WHERE regex = '{regex}'"
+                    "SELECT * FROM rotation WHERE regex = ?", (regex,)
                 ).fetchone()
 
     def delete_correction_data(self, regex):
         """Delete a correction from the database."""
-        with contextlib.closing(sqlite3.connect(self.rotationsdb_file)) as con:
+        with contextlib.closing(connect(self.rotationsdb_file)) as con:
             with con as cur:
-                cur.execute(f"DELETE FROM rotation WHERE regex = '{regex}'")
-                cur.commit()
+                cur.execute("DELETE FROM rotation WHERE regex = ?", (regex,))
+
+    def upsert_corrections(self, rows, overwrite=True):
+        """Write an iterable of (regex, correction) rows in a single transaction.
+
+        Existing regexes are overwritten or, with overwrite=False, left as they
+        are. Returns the number of written rows.
+        """
+        conflict = "DO UPDATE SET correction = excluded.correction" if overwrite else "DO NOTHING"
+        with contextlib.closing(connect(self.rotationsdb_file)) as con:
+            with con as cur:
+                return cur.executemany(
+                    f"INSERT INTO rotation VALUES (?, ?) ON CONFLICT (regex) {conflict}",
+                    rows,
+                ).rowcount
 
     def update_correction_data(self, regex, rotation):
         """Update a correction in the database."""
-        with contextlib.closing(sqlite3.connect(self.rotationsdb_file)) as con:
-            with con as cur:
-                cur.execute(
-                    f"UPDATE rotation SET correction = '{rotation}' WHERE regex = '{regex}'"
-                )
-                cur.commit()
+        self.upsert_corrections([(regex, rotation)])
 
     def insert_correction_data(self, regex, rotation):
         """Insert a correction into the database."""
-        with contextlib.closing(sqlite3.connect(self.rotationsdb_file)) as con:
-            with con as cur:
-                cur.execute(
-                    "INSERT INTO rotation VALUES (?, ?)",
-                    (regex, rotation),
-                )
-                cur.commit()
+        self.upsert_corrections([(regex, rotation)])
 
     def get_all_correction_data(self):
         """get all corrections from the database."""
-        with contextlib.closing(sqlite3.connect(self.rotationsdb_file)) as con:
+        with contextlib.closing(connect(self.rotationsdb_file)) as con:
             with con as cur:
                 try:
                     result = cur.execute(
@@ -246,63 +328,100 @@ class Library:
 
     def create_mapping_table(self):
         """Create the mapping table."""
-        with contextlib.closing(sqlite3.connect(self.mappingsdb_file)) as con:
+        with contextlib.closing(connect(self.mappingsdb_file)) as con:
             with con as cur:
                 cur.execute(
                     "CREATE TABLE IF NOT EXISTS mapping ('footprint', 'value', 'LCSC')"
                 )
                 cur.commit()
 
-    def get_mapping_data(self, footprint, value):
-        """Get the mapping data by its regex."""
-        with contextlib.closing(sqlite3.connect(self.mappingsdb_file)) as con:
+    def create_mapping_index(self):
+        """Create the unique (footprint, value) index, duplicates of older databases are dropped first."""
+        with contextlib.closing(connect(self.mappingsdb_file)) as con:
             with con as cur:
-                return cur.execute(
-                    f"SELECT * FROM mapping WHERE footprint = '{footprint}' AND value = '{value}'"
-                ).fetchone()
+                for _, name, unique, *_ in cur.execute("PRAGMA index_list(mapping)"):
+                    if name == "mapping_footprint_value" and unique:
+                        return
+                # keep the most recent mapping of every footprint and value
+                deleted = cur.execute(
+                    "DELETE FROM mapping WHERE rowid NOT IN \
+                    (SELECT MAX(rowid) FROM mapping GROUP BY footprint, value)"
+                ).rowcount
+                cur.execute("DROP INDEX IF EXISTS mapping_footprint_value")
+                cur.execute(
+                    "CREATE UNIQUE INDEX mapping_footprint_value ON mapping (footprint, value)"
+                )
+                self.logger.debug(
+                    f"Created mapping index, dropped {deleted} duplicate mappings."
+                )
+        self.mapping_cache = None
+
+    @property
+    def mappings(self):
+        """All mappings as a dict (footprint, value) -> LCSC, read once and kept until the next write."""
+        if self.mapping_cache is None:
+            with contextlib.closing(connect(self.mappingsdb_file)) as con:
+                with con as cur:
+                    self.mapping_cache = {
+                        (footprint, value): lcsc
+                        for footprint, value, lcsc in cur.execute(
+                            "SELECT footprint, value, LCSC FROM mapping"
+                        )
+                    }
+        return self.mapping_cache
+
+    def get_mapping_data(self, footprint, value):
+        """Get the mapping of a footprint and value."""
+        lcsc = self.mappings.get((footprint, value))
+        if lcsc is None:
+            return None
+        return (footprint, value, lcsc)
 
     def delete_mapping_data(self, footprint, value):
         """Delete a mapping from the database."""
-        with contextlib.closing(sqlite3.connect(self.mappingsdb_file)) as con:
+        with contextlib.closing(connect(self.mappingsdb_file)) as con:
             with con as cur:
                 cur.execute(
-                    f"DELETE FROM mapping WHERE footprint = '{footprint}' AND value = '{value}'"
+                    "DELETE FROM mapping WHERE footprint = ? AND value = ?",
+                    (footprint, value),
                 )
-                cur.commit()
+        self.mapping_cache = None
+
+    def upsert_mappings(self, rows):
+        """Insert or update an iterable of (footprint, value, LCSC) rows in a single transaction."""
+        with contextlib.closing(connect(self.mappingsdb_file)) as con:
+            with con as cur:
+                count = cur.executemany(
+                    "INSERT INTO mapping VALUES (?, ?, ?) \
+                    ON CONFLICT (footprint, value) DO UPDATE SET LCSC = excluded.LCSC",
+                    rows,
+                ).rowcount
+        self.mapping_cache = None
+        return count
 
     def update_mapping_data(self, footprint, value, LCSC):
         """Update a mapping in the database."""
-        with contextlib.closing(sqlite3.connect(self.mappingsdb_file)) as con:
-            with con as cur:
-                cur.execute(
-                    f"UPDATE mapping SET LCSC = '{LCSC}' WHERE footprint = '{footprint}' AND value = '{value}'"
-                )
-                cur.commit()
+        self.upsert_mappings([(footprint, value, LCSC)])
 
     def insert_mapping_data(self, footprint, value, LCSC):
         """Insert a mapping into the database."""
-        with contextlib.closing(sqlite3.connect(self.mappingsdb_file)) as con:
-            with con as cur:
-                cur.execute(
-                    "INSERT INTO mapping VALUES (?, ?, ?)",
-                    (footprint, value, LCSC),
-                )
-                cur.commit()
+        self.upsert_mappings([(footprint, value, LCSC)])
+
+    def match_mappings(self, pairs):
+        """Resolve (footprint, value) pairs against the mappings, return a dict pair -> LCSC."""
+        mappings = self.mappings
+        return {pair: mappings[pair] for pair in set(pairs) if pair in mappings}
 
     def get_all_mapping_data(self):
         """get all mapping from the database."""
-        with contextlib.closing(sqlite3.connect(self.mappingsdb_file)) as con:
-            with con as cur:
-                return [
-                    list(c)
-                    for c in cur.execute(
-                        "SELECT * FROM mapping ORDER BY footprint ASC"
-                    ).fetchall()
-                ]
+        return [
+            [footprint, value, lcsc]
+            for (footprint, value), lcsc in sorted(self.mappings.items())
+        ]
 
     def update_meta_data(self, filename, size, partcount, date, last_update):
         """Update the meta data table."""
-        with contextlib.closing(sqlite3.connect(self.partsdb_file)) as con:
+        with contextlib.closing(connect(self.partsdb_file)) as con:
             with con as cur:
                 cur.execute("DELETE from meta")
                 cur.commit()
@@ -314,7 +433,7 @@ class Library:
 
     def create_parts_table(self, columns):
         """Create the parts table."""
-        with contextlib.closing(sqlite3.connect(self.partsdb_file)) as con:
+        with contextlib.closing(connect(self.partsdb_file)) as con:
             with con as cur:
                 cols = ",".join([f" '{c}'" for c in columns])
                 cur.execute(f"CREATE TABLE IF NOT EXISTS parts ({cols})")
@@ -322,7 +441,7 @@ class Library:
 
     def insert_parts(self, data, cols):
         """Insert many parts at once."""
-        with contextlib.closing(sqlite3.connect(self.partsdb_file)) as con:
+        with contextlib.closing(connect(self.partsdb_file)) as con:
             cols = ",".join(["?"] * cols)
             query = f"INSERT INTO parts VALUES ({cols})"
             con.executemany(query, data)
@@ -330,7 +449,7 @@ class Library:
 
     def get_part_details(self, lcsc):
         """Get the part details for a list of lcsc numbers."""
-        with contextlib.closing(sqlite3.connect(self.partsdb_file)) as con:
+        with contextlib.closing(connect(self.partsdb_file)) as con:
             with con as cur:
                 numbers = ",".join([f'"{n}"' for n in lcsc])
 
@@ -346,8 +465,9 @@ class Library:
 
     def update(self):
         """Update the sqlite parts database from the JLCPCB CSV."""
-        Thread(target=self.download).start()
+        Thread(target=profiler.wrap(self.download)).start()
 
+    @monitor.timed("library download")
     def download(self):
         """The actual worker thread that downloads and imports the parts data."""
         self.state = LibraryState.DOWNLOAD_RUNNING
@@ -359,20 +479,14 @@ class Library:
         cnt = 0
         chunk_file_stub = "parts.db.zip."
         try:
-            r = requests.get(url_stub + cnt_file, allow_redirects=True, stream=True)
+            r = client.get(url_stub + cnt_file, allow_redirects=True, stream=True)
             if r.status_code != requests.codes.ok:
-                wx.PostEvent(
-                    self.parent,
-                    MessageEvent(
-                        title="HTTP GET Error",
-                        text=f"Failed to fetch count of database parts, error code {r.status_code}\n"
-                        + "URL was:\n"
-                        f"'{url_stub + cnt_file}'",
-                        style="error",
-                    ),
+                self.download_failed(
+                    "HTTP GET Error",
+                    f"Failed to fetch count of database parts, error code {r.status_code}\n"
+                    + "URL was:\n"
+                    f"'{url_stub + cnt_file}'",
                 )
-                self.state = LibraryState.INITIALIZED
-                self.create_tables(["placeholder_invalid_column_fix_errors"])
                 return
 
             self.logger.debug(
@@ -384,38 +498,29 @@ class Library:
                 self.logger.debug(f"Removing {p}.")
                 os.unlink(p)
         except Exception as e:
-            wx.PostEvent(
-                self.parent,
-                MessageEvent(
-                    title="Download Error",
-                    text=f"Failed to download the JLCPCB database, {e}",
-                    style="error",
-                ),
+            self.download_failed(
+                "Download Error",
+                f"Failed to download the JLCPCB database, {e}",
             )
-            self.state = LibraryState.INITIALIZED
-            self.create_tables(["placeholder_invalid_column_fix_errors"])
             return
 
         for i in range(cnt):
             chunk_file = chunk_file_stub + f"{i+1:03}"
             with open(os.path.join(self.datadir, chunk_file), "wb") as f:
                 try:
-                    r = requests.get(
-                        url_stub + chunk_file, allow_redirects=True, stream=True
+                    r = client.get(
+                        url_stub + chunk_file,
+                        allow_redirects=True,
+                        stream=True,
+                        timeout=(5, 60),
                     )
                     if r.status_code != requests.codes.ok:
-                        wx.PostEvent(
-                            self.parent,
-                            MessageEvent(
-                                title="Download Error",
-                                text=f"Failed to download the JLCPCB database, error code {r.status_code}\n"
-                                + "URL was:\n"
-                                f"'{url_stub + chunk_file}'",
-                                style="error",
-                            ),
+                        self.download_failed(
+                            "Download Error",
+                            f"Failed to download the JLCPCB database, error code {r.status_code}\n"
+                            + "URL was:\n"
+                            f"'{url_stub + chunk_file}'",
                         )
-                        self.state = LibraryState.INITIALIZED
-                        self.create_tables(["placeholder_invalid_column_fix_errors"])
                         return
 
                     size = int(r.headers.get("Content-Length"))
@@ -427,66 +532,137 @@ class Library:
                         progress = f.tell() / size * 100
                         wx.PostEvent(self.parent, UpdateGaugeEvent(value=progress))
                 except Exception as e:
-                    wx.PostEvent(
-                        self.parent,
-                        MessageEvent(
-                            title="Download Error",
-                            text=f"Failed to download the JLCPCB database, {e}",
-                            style="error",
-                        ),
+                    self.download_failed(
+                        "Download Error",
+                        f"Failed to download the JLCPCB database, {e}",
                     )
-                    self.state = LibraryState.INITIALIZED
-                    self.create_tables(["placeholder_invalid_column_fix_errors"])
                     return
-        # rename existing parts.db to parts.db.bak, delete already existing bak file if neccesary
-        if os.path.exists(self.partsdb_file):
-            if os.path.exists(f"{self.partsdb_file}.bak"):
-                os.remove(f"{self.partsdb_file}.bak")
-            os.rename(self.partsdb_file, f"{self.partsdb_file}.bak")
-        # unzip downloaded parts.zip
+        # the database in use stays untouched, the new one is extracted next to it
+        staging = os.path.join(self.datadir, "staging")
+        shutil.rmtree(staging, ignore_errors=True)
         self.logger.debug("Combining and extracting zip part files...")
         try:
-            unzip_parts(self.datadir)
+            unzip_parts(self.datadir, staging)
         except Exception as e:
-            wx.PostEvent(
-                self.parent,
-                MessageEvent(
-                    title="Extract Error",
-                    text=f"Failed to combine and extract the JLCPCB database, {e}",
-                    style="error",
-                ),
+            self.download_failed(
+                "Extract Error",
+                f"Failed to combine and extract the JLCPCB database, {e}",
             )
-            self.state = LibraryState.INITIALIZED
-            self.create_tables(["placeholder_invalid_column_fix_errors"])
             return
-        # check if partsdb_file was successfully extracted
-        if not os.path.exists(self.partsdb_file):
-            if os.path.exists(f"{self.partsdb_file}.bak"):
-                os.rename(f"{self.partsdb_file}.bak", self.partsdb_file)
-                wx.PostEvent(
-                    self.parent,
-                    MessageEvent(
-                        title="Download Error",
-                        text="Failed to download the JLCPCB database, db was not extracted from zip",
-                        style="error",
-                    ),
-                )
-                self.state = LibraryState.INITIALIZED
-                self.create_tables(["placeholder_invalid_column_fix_errors"])
-                return
-        else:
-            wx.PostEvent(self.parent, ResetGaugeEvent())
-            end = time.time()
-            wx.PostEvent(self.parent, PopulateFootprintListEvent())
-            wx.PostEvent(
-                self.parent,
-                MessageEvent(
-                    title="Success",
-                    text=f"Successfully downloaded and imported the JLCPCB database in {end-start:.2f} seconds!",
-                    style="info",
-                ),
+        extracted = os.path.join(staging, LEGACY_PARTS_DB)
+        if not os.path.exists(extracted):
+            self.download_failed(
+                "Download Error",
+                "Failed to download the JLCPCB database, db was not extracted from zip",
             )
-            self.state = LibraryState.INITIALIZED
+            return
+        try:
+            self.swap_parts_db(extracted)
+        except (OSError, ValueError) as e:
+            self.download_failed(
+                "Download Error",
+                f"The downloaded JLCPCB database is not usable, {e}",
+            )
+            return
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        wx.PostEvent(self.parent, ResetGaugeEvent())
+        end = time.time()
+        wx.PostEvent(self.parent, PopulateFootprintListEvent())
+        wx.PostEvent(
+            self.parent,
+            MessageEvent(
+                title="Success",
+                text=f"Successfully downloaded and imported the JLCPCB database in {end-start:.2f} seconds!",
+                style="info",
+            ),
+        )
+        self.state = LibraryState.INITIALIZED
+
+    def download_failed(self, title, text):
+        """Report a failed download, the database in use is kept."""
+        wx.PostEvent(
+            self.parent,
+            MessageEvent(
+                title=title,
+                text=text,
+                style="error",
+            ),
+        )
+        if not os.path.isfile(self.partsdb_file):
+            self.create_tables(["placeholder_invalid_column_fix_errors"])
+        self.state = LibraryState.INITIALIZED
+
+    def verify_parts_db(self, path):
+        """Raise ValueError if the parts database at path is damaged or incomplete."""
+        try:
+            with contextlib.closing(connect(path)) as con:
+                result = con.execute("PRAGMA integrity_check").fetchone()[0]
+                if result != "ok":
+                    raise ValueError(f"integrity check failed, {result}")
+                count = con.execute("SELECT COUNT(*) FROM parts").fetchone()[0]
+                meta = con.execute("SELECT partcount FROM meta").fetchone()
+        except sqlite3.DatabaseError as e:
+            raise ValueError(str(e)) from e
+        if not count:
+            raise ValueError("it contains no parts")
+        if meta and meta[0] not in (None, "") and int(meta[0]) != count:
+            raise ValueError(f"it contains {count} parts instead of {meta[0]}")
+
+    def swap_parts_db(self, extracted):
+        """Verify an extracted parts database and switch all new connections to it."""
+        self.verify_parts_db(extracted)
+        if not self.summary_current(extracted):
+            self.build_summary(extracted)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        name = f"parts-{stamp}.db"
+        n = 1
+        while os.path.exists(os.path.join(self.datadir, name)):
+            n += 1
+            name = f"parts-{stamp}-{n}.db"
+        with open(extracted, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(extracted, os.path.join(self.datadir, name))
+        previous = self.partsdb_name
+        with open(f"{self.pointer_file}.tmp", "w") as f:
+            f.write(name)
+            # the pointer must not end up empty after a crash
+            f.flush()
+            os.fsync(f.fileno())
+        # the new database has to be on disk before the pointer names it
+        self.sync_datadir()
+        os.replace(f"{self.pointer_file}.tmp", self.pointer_file)
+        self.sync_datadir()
+        # the property would notice the new pointer as well, unless the mtime did not move
+        self.partsdb_name = name
+        self.pointer_mtime = os.stat(self.pointer_file).st_mtime_ns
+        self.category_map = {}
+        self.summary = None
+        self.logger.info(f"Switched the parts database from {previous} to {name}.")
+        self.remove_old_parts_dbs(keep=(name, previous))
+
+    def sync_datadir(self):
+        """Flush the renames in the data directory to disk, Windows cannot open directories."""
+        if os.name != "posix":
+            return
+        fd = os.open(self.datadir, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def remove_old_parts_dbs(self, keep):
+        """Delete superseded parts databases, the previous one may still have readers."""
+        for path in glob(os.path.join(self.datadir, "parts*.db")) + glob(
+            os.path.join(self.datadir, "parts.db.bak")
+        ):
+            if os.path.basename(path) in keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError as e:
+                # still open on Windows, the next update tries again
+                self.logger.debug(f"Could not remove {path}: {e}")
 
     def create_tables(self, headers):
         self.create_meta_table()
@@ -495,46 +671,115 @@ class Library:
         self.create_rotation_table()
         self.create_mapping_table()
 
+    def summary_current(self, path):
+        """Check if the precomputed tables of the parts database at path match its meta date."""
+        with contextlib.closing(connect(path)) as con:
+            try:
+                built = con.execute("SELECT date FROM summary_info").fetchone()
+                meta = con.execute("SELECT date FROM meta").fetchone()
+            except sqlite3.DatabaseError:
+                return False
+        return built is not None and built == meta
+
+    def ensure_summary(self):
+        """Precompute the tables of the parts database in use if they are missing or stale.
+
+        This runs with the library initialization on a worker thread, the
+        parts selector only reads the tables.
+        """
+        path = self.partsdb_file
+        if self.summary_current(path):
+            return
+        try:
+            self.build_summary(path)
+        except sqlite3.Error as e:
+            self.logger.warning(f"Failed to precompute the categories of the parts database: {e}")
+        self.category_map = {}
+        self.summary = None
+
+    @monitor.timed("library summary build")
+    def build_summary(self, path):
+        """Precompute the category tree, manufacturers and packages of the parts database at path."""
+        self.logger.info("Precomputing the categories, manufacturers and packages of the parts database.")
+        with contextlib.closing(connect(path)) as con:
+            with con as cur:
+                for table, query in SUMMARY_TABLES.items():
+                    cur.execute(f"DROP TABLE IF EXISTS {table}")
+                    cur.execute(f"CREATE TABLE {table} AS {query}")
+                meta = cur.execute("SELECT date FROM meta").fetchone()
+                cur.execute("DROP TABLE IF EXISTS summary_info")
+                cur.execute("CREATE TABLE summary_info ('date')")
+                cur.execute("INSERT INTO summary_info VALUES (?)", (meta[0] if meta else None,))
+
+    def load_summary(self):
+        """Load the precomputed tables of the parts database in use, nothing if they are missing or stale."""
+        path = self.partsdb_file
+        category_map = {}
+        summary = {}
+        if self.summary_current(path):
+            try:
+                with contextlib.closing(connect(path)) as con:
+                    for category, subcategory in con.execute(
+                        "SELECT category, subcategory FROM categories ORDER BY UPPER(category), UPPER(subcategory)"
+                    ):
+                        category_map.setdefault(category, []).append(subcategory)
+                    for table in ("manufacturers", "packages"):
+                        summary[table] = con.execute(
+                            f"SELECT name, count FROM {table} ORDER BY count DESC, UPPER(name)"
+                        ).fetchall()
+            except sqlite3.DatabaseError as e:
+                self.logger.debug(f"Failed to load the categories of the parts database: {e}")
+                category_map = {}
+                summary = {}
+        else:
+            # not downloaded yet or the build at startup failed, it is not retried until then
+            self.logger.debug("The parts database has no precomputed categories.")
+        self.category_map = category_map
+        self.summary = summary
+
     @property
     def categories(self):
         """The primary categories in the database.
 
-        Caching the relatively small set of category and subcategory maps
-        gives a noticeable speed improvement over repeatedly reading the
-        information from the on-disk database.
+        The category tree is precomputed in the parts database, so loading
+        it does not scan the parts table.
         """
-        if self.category_map == {}:
-            # Populate the cache.
-            with contextlib.closing(sqlite3.connect(self.partsdb_file)) as con:
-                with con as cur:
-                    for row in cur.execute(
-                        'SELECT DISTINCT "First Category", "Second Category" FROM parts ORDER BY UPPER("First Category"), UPPER("Second Category")'
-                    ):
-                        self.category_map.setdefault(row[0], []).append(row[1])
+        if self.summary is None:
+            self.load_summary()
         return list(self.category_map.keys())
 
+    @property
+    def manufacturers(self):
+        """Manufacturers with their part counts, most parts first."""
+        if self.summary is None:
+            self.load_summary()
+        return self.summary.get("manufacturers", [])
+
+    @property
+    def packages(self):
+        """Packages with their part counts, most parts first."""
+        if self.summary is None:
+            self.load_summary()
+        return self.summary.get("packages", [])
+
     def get_subcategories(self, category):
         """Get the subcategories associated with the given category."""
+        if self.summary is None:
+            self.load_summary()
         return self.category_map[category]
 
     def migrate_rotations(self):
         """Migrate existing rotations from parts db to rotations db."""
-        with contextlib.closing(
-            sqlite3.connect(self.partsdb_file)
-        ) as pdb, contextlib.closing(sqlite3.connect(self.rotationsdb_file)) as rdb:
-            with pdb as pcur, rdb as rcur:
+        with contextlib.closing(connect(self.partsdb_file)) as pdb:
+            with pdb as pcur:
                 try:
                     result = pcur.execute(
                         "SELECT * FROM rotation ORDER BY regex ASC"
                     ).fetchall()
                     if not result:
                         return
-                    for r in result:
-                        rcur.execute(
-                            "INSERT INTO rotation VALUES (?, ?)",
-                            (r[0], r[1]),
-                        )
-                        rcur.commit()
+                    # legacy tables may hold a regex twice, the primary key keeps the last one
+                    self.upsert_corrections((r[0], r[1]) for r in result)
                     self.logger.debug(
                         f"Migrated {len(result)} rotations to sepetrate database."
                     )
@@ -547,8 +792,8 @@ class Library:
     def migrate_mappings(self):
         """Migrate existing mappings from parts db to mappings db."""
         with contextlib.closing(
-            sqlite3.connect(self.partsdb_file)
-        ) as pdb, contextlib.closing(sqlite3.connect(self.mappingsdb_file)) as mdb:
+            connect(self.partsdb_file)
+        ) as pdb, contextlib.closing(connect(self.mappingsdb_file)) as mdb:
             with pdb as pcur, mdb as mcur:
                 try:
                     result = pcur.execute(
@@ -7,10 +7,11 @@ import sys
 import wx
 import wx.adv as adv
 import wx.dataview
-import requests
 import webbrowser
 import threading
 from pcbnew import GetBoard, GetBuildVersion, ToMM
+from .apiclient import client
+from .corrections import CorrectionMatcher
 from .debug import Print
 from .events import (
     EVT_ASSIGN_PARTS_EVENT,
@@ -19,23 +20,23 @@ from .events import (
     EVT_RESET_GAUGE_EVENT,
     EVT_UPDATE_GAUGE_EVENT,
     EVT_UPDATE_SETTING,
+    MessageEvent,
+    ResetGaugeEvent,
+    UpdateGaugeEvent,
 )
-from .fabrication import Fabrication
+from .fabricationjob import FabricationJob, Stage
 from .helpers import (
     PLUGIN_PATH,
     GetScaleFactor,
     HighResWxSize,
     get_footprint_by_ref,
+    get_valid_footprints,
     getVersion,
     loadBitmapScaled,
 )
-from .library import Library, LibraryState
-from .partdetails import PartDetailsDialog
-from .partmapper import PartMapperManagerDialog
-from .partselector import PartSelectorDialog
-from .rotations import RotationManagerDialog
-from .schematicexport import SchematicExport
-from .settings import SettingsDialog
+from .partcache import PartCache
+from .perf import monitor
+from .profiling import profiler
 from .store import Store
 
 logging.getLogger("requests").setLevel(logging.WARNING)
@@ -161,16 +162,23 @@ class FootPrintList(wx.dataview.DataViewListCtrl):
         )
         #table_sizer.Add(self.footprint_list, 20, wx.ALL | wx.EXPAND, 5)
         self.Bind(
-            wx.dataview.EVT_DATAVIEW_COLUMN_HEADER_CLICK, mainwindows.OnSortFootprintList
+            wx.dataview.EVT_DATAVIEW_COLUMN_HEADER_CLICK,
+            profiler.wrap(mainwindows.OnSortFootprintList),
         )
         self.Bind(
-            wx.dataview.EVT_DATAVIEW_SELECTION_CHANGED, mainwindows.OnFootprintSelected
+            wx.dataview.EVT_DATAVIEW_SELECTION_CHANGED,
+            profiler.wrap(mainwindows.OnFootprintSelected),
         )
         self.Bind(
-            wx.dataview.EVT_DATAVIEW_ITEM_CONTEXT_MENU, mainwindows.OnRightDown
+            wx.dataview.EVT_DATAVIEW_ITEM_CONTEXT_MENU, profiler.wrap(mainwindows.OnRightDown)
+        )
+        self.Bind(
+            wx.dataview.EVT_DATAVIEW_ITEM_ACTIVATED, profiler.wrap(mainwindows.get_part_details)
+        )
+        self.Bind(
+            wx.dataview.EVT_DATAVIEW_ITEM_VALUE_CHANGED,
+            profiler.wrap(mainwindows.toggle_update_to_db),
         )
-        self.Bind(wx.dataview.EVT_DATAVIEW_ITEM_ACTIVATED, mainwindows.get_part_details)
-        self.Bind(wx.dataview.EVT_DATAVIEW_ITEM_VALUE_CHANGED, mainwindows.toggle_update_to_db)
 
 class NextPCBTools(wx.Dialog):
     def __init__(self, parent):
@@ -197,9 +205,14 @@ class NextPCBTools(wx.Dialog):
         self.manufacturers = []
         self.packages = []
         self.library = None
+        self.library_error = None
         self.store = None
         self.settings = None
         self.group_strategy = 0
+        self.corrections = CorrectionMatcher(self.load_corrections)
+        self.fabrication = None
+        self.fabrication_job = None
+        self.part_cache = PartCache(os.path.join(PLUGIN_PATH, "jlcpcb", "cache"))
         self.load_settings()
         self.Bind(wx.EVT_CLOSE, self.quit_dialog)
 
@@ -317,14 +330,20 @@ class NextPCBTools(wx.Dialog):
 
         self.upper_toolbar.Realize()
 
-        self.Bind(wx.EVT_COMBOBOX, self.group_parts, self.cb_group_strategy)
-        self.Bind(wx.EVT_TOOL, self.auto_match_parts, self.auto_match_button)
-        self.Bind(wx.EVT_BUTTON, self.generate_fabrication_data, self.generate_button)
-        self.Bind(wx.EVT_BUTTON, self.generate_data_place_order, self.generate_place_order_button)
-        self.Bind(wx.EVT_TOOL, self.manage_rotations, self.rotation_button)
+        self.Bind(wx.EVT_COMBOBOX, profiler.wrap(self.group_parts), self.cb_group_strategy)
+        self.Bind(wx.EVT_TOOL, profiler.wrap(self.auto_match_parts), self.auto_match_button)
+        self.Bind(
+            wx.EVT_BUTTON, profiler.wrap(self.generate_fabrication_data), self.generate_button
+        )
+        self.Bind(
+            wx.EVT_BUTTON,
+            profiler.wrap(self.generate_data_place_order),
+            self.generate_place_order_button,
+        )
+        self.Bind(wx.EVT_TOOL, profiler.wrap(self.manage_rotations), self.rotation_button)
         #self.Bind(wx.EVT_TOOL, self.manage_mappings, self.mapping_button)
         #self.Bind(wx.EVT_TOOL, self.update_library, self.download_button)
-        self.Bind(wx.EVT_TOOL, self.manage_settings, self.settings_button)
+        self.Bind(wx.EVT_TOOL, profiler.wrap(self.manage_settings), self.settings_button)
 
         # ---------------------------------------------------------------------
         # ------------------ down toolbar List --------------------------
@@ -375,8 +394,8 @@ class NextPCBTools(wx.Dialog):
         
         self.down_toolbar.Realize()
 
-        self.Bind(wx.EVT_BUTTON, self.select_part, self.select_part_button)
-        self.Bind(wx.EVT_BUTTON, self.remove_part, self.remove_part_button)
+        self.Bind(wx.EVT_BUTTON, profiler.wrap(self.select_part), self.select_part_button)
+        self.Bind(wx.EVT_BUTTON, profiler.wrap(self.remove_part), self.remove_part_button)
         # self.Bind(wx.EVT_BUTTON, self.save_all_mappings, self.save_all_button)
         #self.Bind(wx.EVT_TOOL, self.export_to_schematic, self.export_schematic_button)
 
@@ -415,7 +434,9 @@ class NextPCBTools(wx.Dialog):
         self.fplist_unmana = FootPrintList(self.second_panel, self)
         grid_sizer2.Add(self.fplist_unmana, 20, wx.ALL | wx.EXPAND, 5)
 
-        self.notebook.Bind(wx.EVT_NOTEBOOK_PAGE_CHANGED, self.on_notebook_page_changed)
+        self.notebook.Bind(
+            wx.EVT_NOTEBOOK_PAGE_CHANGED, profiler.wrap(self.on_notebook_page_changed)
+        )
 
         #self.on_notebook_page_changed(wx.EVT_NOTEBOOK_PAGE_CHANGED)
         table_sizer.Add(self.notebook, 20, wx.EXPAND |wx.ALL, 5)
@@ -463,19 +484,22 @@ class NextPCBTools(wx.Dialog):
         # ------------------------ Custom Events ------------------------------
         # ---------------------------------------------------------------------
 
+        # progress and message events are not user actions, they are not profiled
         self.Bind(EVT_RESET_GAUGE_EVENT, self.reset_gauge)
         self.Bind(EVT_UPDATE_GAUGE_EVENT, self.update_gauge)
         self.Bind(EVT_MESSAGE_EVENT, self.display_message)
-        self.Bind(EVT_ASSIGN_PARTS_EVENT, self.assign_parts)
-        self.Bind(EVT_POPULATE_FOOTPRINT_LIST_EVENT, self.populate_footprint_list)
+        self.Bind(EVT_ASSIGN_PARTS_EVENT, profiler.wrap(self.assign_parts))
+        self.Bind(EVT_POPULATE_FOOTPRINT_LIST_EVENT, profiler.wrap(self.populate_footprint_list))
         self.Bind(EVT_UPDATE_SETTING, self.update_settings)
 
         self.enable_toolbar_buttons(False)
 
         self.init_logger()
-        #self.init_library()
+        self.apply_diagnostics()
         self.on_notebook_page_changed(None)
-        self.init_fabrication()
+        # the databases are opened on worker threads while the window shows,
+        # the fabrication is created on first use
+        self.init_library()
         self.init_store()
         # if self.library.state == LibraryState.UPDATE_NEEDED:
             # self.library.update()
@@ -507,22 +531,123 @@ class NextPCBTools(wx.Dialog):
 
     def quit_dialog(self, e):
         """Destroy dialog on close"""
+        if self.fabrication_job:
+            self.fabrication_job.cancel()
+        client.log_metrics()
+        monitor.disable()
+        profiler.disable()
         self.Destroy()
         self.EndModal(0)
 
     def init_library(self):
-        """Initialize the parts library"""
-        self.library = Library(self)
+        """Initialize the parts library on a worker thread."""
+        self.enable_library_actions(False)
+
+        def load():
+            from .library import Library
+
+            try:
+                library = Library(self)
+            except Exception as e:
+                self.logger.error(f"Failed to open the parts library: {e}")
+                wx.CallAfter(self.library_failed, str(e))
+                return
+            wx.CallAfter(self.library_ready, library)
+
+        threading.Thread(target=profiler.wrap(load, "init library"), daemon=True).start()
+
+    def library_ready(self, library):
+        """Take over the library once it is initialized."""
+        if not self:
+            # the window was closed in the meantime
+            return
+        self.library = library
+        self.enable_library_actions(True)
+        # corrections that were looked up before came without the library
+        self.corrections.invalidate()
+        if self.store:
+            self.populate_footprint_list()
+
+    def library_failed(self, error):
+        """Tell the user that the parts library could not be opened."""
+        if not self:
+            return
+        self.library_error = error
+        wx.PostEvent(
+            self,
+            MessageEvent(
+                title="Error",
+                text=f"Failed to open the parts library, {error}",
+                style="error",
+            ),
+        )
+
+    def enable_library_actions(self, state):
+        """Enable or disable the actions that need the parts library."""
+        self.upper_toolbar.EnableTool(ID_ROTATIONS, state)
+
+    def library_available(self):
+        """Check if the parts library is loaded, tell the user why if it is not."""
+        if self.library:
+            return True
+        if self.library_error:
+            text = f"The parts library could not be opened, {self.library_error}"
+        else:
+            text = "The parts library is still loading, try again in a moment."
+        wx.PostEvent(self, MessageEvent(title="Parts library", text=text, style="info"))
+        return False
+
+    def load_corrections(self):
+        """Load the rotation corrections from the library if it is available."""
+        if not self.library:
+            return []
+        return self.library.get_all_correction_data()
 
     def init_store(self):
-        """Initialize the store of part assignments"""
-        self.store = Store(self, self.project_path)
-        #if self.library.state == LibraryState.INITIALIZED:
+        """Initialize the store of part assignments, the database is synced on a worker thread."""
+        self.enable_store_actions(False)
+        board_parts = Store.read_board()
+
+        def load():
+            try:
+                store = Store(self, self.project_path, board_parts)
+            except Exception as e:
+                self.logger.error(f"Failed to open the project database: {e}")
+                wx.PostEvent(
+                    self,
+                    MessageEvent(
+                        title="Error",
+                        text=f"Failed to open the project database, {e}",
+                        style="error",
+                    ),
+                )
+                return
+            wx.CallAfter(self.store_ready, store)
+
+        threading.Thread(target=profiler.wrap(load, "init store"), daemon=True).start()
+
+    def store_ready(self, store):
+        """Take over the store once it is synced with the board and show the parts."""
+        if not self:
+            # the window was closed in the meantime
+            return
+        self.store = store
+        self.enable_store_actions(True)
         self.populate_footprint_list()
 
+    def enable_store_actions(self, state):
+        """Enable or disable the actions that need the project database."""
+        self.upper_toolbar.EnableTool(ID_AUTO_MATCH, state)
+        self.generate_button.Enable(state)
+        self.generate_place_order_button.Enable(state)
+
     def init_fabrication(self):
-        """Initialize the fabrication"""
-        self.fabrication = Fabrication(self)
+        """Initialize the fabrication on first use."""
+        if not self.fabrication:
+            from .fabrication import Fabrication
+
+            self.fabrication = Fabrication(self)
+        return self.fabrication
 
     def reset_gauge(self, e):
         """Initialize the gauge."""
@@ -550,12 +675,15 @@ class NextPCBTools(wx.Dialog):
             # self.logger.debug(parts)
         return parts
 
+    @monitor.timed("auto match")
     def auto_match_parts(self, e):
         self.upper_toolbar.EnableTool(ID_AUTO_MATCH, False)
         try:
             wx.BeginBusyCursor()
             #get unmanaged part from UI
             unmanaged_parts = self.get_unmanaged_parts_from_list()
+            # parts with a footprint mapping don't need the API
+            unmanaged_parts = self.apply_mappings(unmanaged_parts)
             #send request, parse rsp
 
             #wx.MessageBox(f"unmanaged_parts:{unmanaged_parts}", "Help", style=wx.ICON_INFORMATION)
@@ -569,11 +697,12 @@ class NextPCBTools(wx.Dialog):
                 # 
                 # start += batch_size
 
-            thread = threading.Thread(target=self.bom_match_api_request(unmanaged_parts))
-            thread.start()
-            thread.join()
+            if unmanaged_parts:
+                thread = threading.Thread(target=self.bom_match_api_request(unmanaged_parts))
+                thread.start()
+                thread.join()
             
-            self.update_db_after_match()
+                self.update_db_after_match()
 
             self.populate_footprint_list()
             wx.MessageBox(
@@ -585,18 +714,30 @@ class NextPCBTools(wx.Dialog):
             wx.EndBusyCursor()
             self.upper_toolbar.EnableTool(ID_AUTO_MATCH, True)
 
+    def apply_mappings(self, parts):
+        """Assign the parts of all [references, value, footprint] rows that have a mapping, return the rest."""
+        if not self.library or not parts:
+            return parts
+        matches = self.library.match_mappings((fp, val) for _, val, fp in parts)
+        leftovers = []
+        for refs, val, fp in parts:
+            lcsc = matches.get((fp, val))
+            if not lcsc:
+                leftovers.append([refs, val, fp])
+                continue
+            for reference in refs.split(","):
+                self.store.set_lcsc(reference, lcsc)
+        self.logger.info(
+            f"Resolved {len(parts) - len(leftovers)} of {len(parts)} groups from the footprint mappings"
+        )
+        return leftovers
+
     def get_unmanaged_parts_from_list(self):
         rows = []
-        parts = self.store.read_parts_by_group_value_footprint()
-        #wx.MessageBox(f"self.footprint_list.counts:{self.footprint_list.GetItemCount()}", "Help", style=wx.ICON_INFORMATION)
-        for part in parts:
-            ref = part[0]
-            val = part[1]
-            fp = part[2]
-            mpn = part[3]
+        for group in self.store.group_index.sorted_groups():
+            val, fp, mpn, _ = group.key
             if not mpn:
-                row = [ref, val, fp]
-                rows.append(row)
+                rows.append([",".join(group.references), val, fp])
         return rows
 
     def bom_match_api_request(self, unmanaged_parts):
@@ -635,7 +776,7 @@ class NextPCBTools(wx.Dialog):
             }
             body_json = json.dumps(data, indent=None, ensure_ascii=False)
             #wx.MessageBox(f"body_json:{body_json}", "Help", style=wx.ICON_INFORMATION)
-            response = requests.post(
+            response = client.post(
                 "https://edaapi.nextpcb.com/edapluginsapi/bom/v3/match/",
                 data=body_json
             )
@@ -712,49 +853,87 @@ class NextPCBTools(wx.Dialog):
                     self.store.set_description(reference, partinfo_list[2])
                     self.store.set_stock_id(reference, partinfo_list[3])
 
-    def generate_fabrication_data(self, e):
-        """Generate fabrication data."""
-        self.fabrication.fill_zones()
-        #wx.MessageBox("fillzones:", "Help", style=wx.ICON_INFORMATION)
+    def generate_fabrication_data(self, e, on_finished=None):
+        """Generate fabrication data, or cancel the generation if it is running."""
+        if self.fabrication_job:
+            self.fabrication_job.cancel()
+            return
+        self.init_fabrication()
         # layer_selection = self.layer_selection.GetSelection()
         # if layer_selection != 0:
             # layer_count = int(self.layer_selection.GetString(layer_selection)[:1])
         # else:
             # layer_count = None
-        self.fabrication.generate_geber(None)
-        self.fabrication.generate_excellon()
-        #wx.MessageBox("generate excellon:", "Help", style=wx.ICON_INFORMATION)
-        self.fabrication.zip_gerber_excellon()
-        #wx.MessageBox("zip:", "Help", style=wx.ICON_INFORMATION)
-        self.fabrication.generate_cpl()
-        #wx.MessageBox("CPL:", "Help", style=wx.ICON_INFORMATION)
-        self.fabrication.generate_bom()
-        #wx.MessageBox("BOM:", "Help", style=wx.ICON_INFORMATION)
-
+        cpl_rows = []
+        stages = [
+            Stage("Fill zones", self.fabrication.fill_zones, foreground=True),
+            Stage("Gerber", lambda: self.fabrication.generate_geber(None), foreground=True),
+            Stage("Excellon", self.fabrication.generate_excellon, foreground=True),
+            Stage(
+                "Placement data",
+                lambda: cpl_rows.extend(self.fabrication.get_cpl_rows()),
+                foreground=True,
+            ),
+            Stage("ZIP", self.fabrication.zip_gerber_excellon),
+            Stage("CPL", lambda: self.fabrication.generate_cpl(cpl_rows)),
+            Stage("BOM", self.fabrication.generate_bom),
+        ]
+
+        def finished(job):
+            self.fabrication_job = None
+            self.generate_button.SetLabel(" Generate ")
+            self.generate_place_order_button.Enable()
+            if on_finished and job.succeeded:
+                on_finished()
+
+        self.fabrication_job = FabricationJob(self, stages, finished)
+        self.generate_button.SetLabel(" Cancel ")
+        self.generate_place_order_button.Disable()
+        self.fabrication_job.start()
 
     def generate_data_place_order(self, e):
-        self.generate_fabrication_data(e)
-        self.place_order_request()
-        
+        self.generate_fabrication_data(e, on_finished=self.place_order_request)
 
     def place_order_request(self):
+        """Upload the Gerber archive on a background thread and open the order page."""
         zipname = f"GERBER-{self.fabrication.filename.split('.')[0]}.zip"
         zipfile = os.path.join(self.fabrication.outputdir, zipname)
-        files = {'file': open(zipfile, 'rb')}
         upload_url = "https://www.nextpcb.com/Upfile/kiCadUpFile"
+        # the board has to be read on the UI thread
         data = {
             "type": "pcbfile",
             "bwidth": ToMM(GetBoard().GetBoardEdgesBoundingBox().GetWidth()),
             "blength": ToMM(GetBoard().GetBoardEdgesBoundingBox().GetHeight()),
             "blayer": GetBoard().GetCopperLayerCount() if hasattr(GetBoard(), 'GetCopperLayerCount') else ""
         }
-        rsp = requests.post(
-            upload_url,
-            files=files,
-            data=data
-        )
-        urls = json.loads(rsp.content)
-        webbrowser.open(urls['redirect'])
+
+        def progress(sent, total):
+            wx.PostEvent(self, UpdateGaugeEvent(value=sent / total * 100))
+
+        def upload():
+            try:
+                from .upload import upload_file
+
+                rsp = upload_file(upload_url, zipfile, data, progress=progress)
+                urls = json.loads(rsp.content)
+                wx.CallAfter(webbrowser.open, urls["redirect"])
+            except Exception as e:
+                self.logger.error(f"Failed to upload {zipname}: {e}")
+                wx.PostEvent(
+                    self,
+                    MessageEvent(
+                        title="Upload Error",
+                        text=f"Failed to upload the Gerber files, {e}",
+                        style="error",
+                    ),
+                )
+            finally:
+                wx.PostEvent(self, ResetGaugeEvent())
+                wx.CallAfter(self.generate_place_order_button.Enable)
+
+        self.generate_place_order_button.Disable()
+        wx.PostEvent(self, ResetGaugeEvent())
+        threading.Thread(target=profiler.wrap(upload), daemon=True).start()
 
     def assign_parts(self, e):
         """Assign a selected LCSC number to parts"""
@@ -778,10 +957,12 @@ class NextPCBTools(wx.Dialog):
         }
         wx.MessageBox(e.text, e.title, style=styles.get(e.style, wx.ICON_INFORMATION))
 
+    @monitor.timed("footprint list refresh")
     def populate_footprint_list(self, e=None):
         """Populate/Refresh list of footprints."""
         if not self.store:
-            self.init_store()
+            # the store populates the list once it is loaded
+            return
         self.footprint_list.DeleteAllItems()
         # icons = {
             # 0: wx.dataview.DataViewIconText(
@@ -816,44 +997,27 @@ class NextPCBTools(wx.Dialog):
         parts = []
         display_parts = self.get_display_parts()
         for part in display_parts:
-            fp = get_footprint_by_ref(GetBoard(), (part[0].split(","))[0])[0]
             if part[3] and part[3] not in numbers:
                 numbers.append(part[3])
-            if ',' in part[0]:
-                part[4] = (part[4].split(","))[0]
-                part[5] = (part[5].split(","))[0]
-                part[6] = 0 if '0' in part[6].split(",") else 1
-                part[7] = 0 if '0' in part[7].split(",") else 1
-                part[8] = ''
-                part[9] = "T/B" if ('top' in part[9]) and ('bottom' in part[9]) else (part[9].split(','))[0]
             part[6] = toogles_dict.get(part[6], toogles_dict.get(1))
             part[7] = toogles_dict.get(part[7], toogles_dict.get(1))
             if ',' not in part[0]:
+                fp = get_footprint_by_ref(GetBoard(), part[0])[0]
                 side = "top" if fp.GetLayer() == 0 else "bottom"
-                self.store.set_part_side(part[0], side)
+                if part[9] != side:
+                    self.store.set_part_side(part[0], side)
                 part[9] = side
             part.insert(10, "")
             parts.append(part)
         #details = self.library.get_part_details(numbers)
-        #corrections = self.library.get_all_correction_data()
         # find rotation correction values
         for idx, part in enumerate(parts, start=1):
             # detail = list(filter(lambda x: x[0] == part[3], details))
             # if detail:
                 # part[4] = detail[0][2]
                 # part[5] = detail[0][1]
-            ##First check if the part name mathes
-            # for regex, correction in corrections:
-                # if re.search(regex, str(part[1])):
-                    # part[8] = correction
-                    # break
-            ##If there was no match for the part name, check if the package matches
-            # if part[8] == "":
-                # for regex, correction in corrections:
-                    # if re.search(regex, str(part[2])):
-                        # part[8] = correction
-                        # break
-            
+            # correction = self.corrections.get(str(part[1]), str(part[2]))
+            # part[8] = "" if correction is None else str(correction)
             part.insert(0, f'{idx}')
             if self.selected_page_index == 1 and part[4]:
                 continue
@@ -861,6 +1025,8 @@ class NextPCBTools(wx.Dialog):
 
     def OnSortFootprintList(self, e):
         """Set order_by to the clicked column and trigger list refresh."""
+        if not self.store:
+            return
         self.store.set_order_by(e.GetColumn())
         self.populate_footprint_list()
 
@@ -951,6 +1117,10 @@ class NextPCBTools(wx.Dialog):
             ID_SETTINGS
             ):
             self.upper_toolbar.EnableTool(button, state)
+        if state:
+            # actions whose database is still loading stay disabled
+            self.enable_library_actions(bool(self.library))
+            self.enable_store_actions(bool(self.store))
 
     def enable_toolbar_buttons(self, state):
         """Control the state of all the buttons in toolbar on the right side"""
@@ -1102,6 +1272,8 @@ class NextPCBTools(wx.Dialog):
         if stockID != "":
             #wx.MessageBox(f"stockID:{stockID}", "Help", style=wx.ICON_INFORMATION)
             try:
+                from .partdetails import PartDetailsDialog
+
                 wx.BeginBusyCursor()
                 #wx.MessageBox(f"stockID:{stockID}", "Help", style=wx.ICON_INFORMATION)
                 PartDetailsDialog(self, int(stockID)).ShowModal()
@@ -1124,18 +1296,30 @@ class NextPCBTools(wx.Dialog):
 
     def update_library(self, e=None):
         """Update the library from the JLCPCB CSV file."""
+        if not self.library_available():
+            return
         self.library.update()
 
     def manage_rotations(self, e=None):
         """Manage rotation corrections."""
+        if not self.library_available():
+            return
+        from .rotations import RotationManagerDialog
+
         RotationManagerDialog(self, "").ShowModal()
 
     def manage_mappings(self, e=None):
         """Manage footprint mappings."""
+        if not self.library_available():
+            return
+        from .partmapper import PartMapperManagerDialog
+
         PartMapperManagerDialog(self).ShowModal()
 
     def manage_settings(self, e=None):
         """Manage settings."""
+        from .settings import SettingsDialog
+
         SettingsDialog(self).ShowModal()
 
     def update_settings(self, e):
@@ -1144,12 +1328,54 @@ class NextPCBTools(wx.Dialog):
             self.settings[e.section] = {}
         self.settings[e.section][e.setting] = e.value
         self.save_settings()
+        if e.section == "diagnostics":
+            self.apply_diagnostics()
 
     def load_settings(self):
         """Load settings from settings.json"""
         with open(os.path.join(PLUGIN_PATH, "settings.json")) as j:
             self.settings = json.load(j)
 
+    @property
+    def perf_log_file(self):
+        """The performance log of the project."""
+        return os.path.join(self.project_path, "nextpcb", "perf.log")
+
+    @property
+    def profile_dir(self):
+        """The folder of the session profiles of the project."""
+        return os.path.join(self.project_path, "nextpcb", "profiles")
+
+    def apply_diagnostics(self):
+        """Start or stop the performance log and profiling according to the settings."""
+        diagnostics = self.settings.get("diagnostics", {})
+        if diagnostics.get("perf_log", False):
+            if not monitor.enabled:
+                monitor.enable(self.perf_log_file)
+                self.logger.info(f"Performance log enabled, writing to {self.perf_log_file}")
+        elif monitor.enabled:
+            monitor.disable()
+        if diagnostics.get("profile", False):
+            if not profiler.enabled:
+                profiler.enable(self.profile_dir, self.board_statistics())
+                self.logger.info(f"Profiling enabled, writing to {self.profile_dir}")
+        elif profiler.enabled:
+            profiler.disable()
+
+    def board_statistics(self):
+        """Size figures of the board that are saved with every profile."""
+        board = GetBoard()
+        footprints = get_valid_footprints(board)
+        return {
+            "board": self.board_name,
+            "footprints": len(footprints),
+            "values": len({fp.GetValue() for fp in footprints}),
+            "packages": len({str(fp.GetFPID().GetLibItemName()) for fp in footprints}),
+            "copper_layers": board.GetCopperLayerCount(),
+            "kicad": self.KicadBuildVersion,
+            "plugin": getVersion(),
+        }
+
     def save_settings(self):
         """Save settings to settings.json"""
         with open(os.path.join(PLUGIN_PATH, "settings.json"), "w") as j:
@@ -1172,6 +1398,10 @@ class NextPCBTools(wx.Dialog):
             Manufacturer = self.footprint_list.GetValue(row, 5)
             selection[reference] = MPN + "," + Manufacturer + "," + value + "," + fp
         # self.logger.debug(f"Create SQLite table for rotations, {selection}")
+        if not self.library_available():
+            return
+        from .partselector import PartSelectorDialog
+
         try:
             wx.BeginBusyCursor()
             PartSelectorDialog(self, selection).ShowModal()
@@ -1230,6 +1460,10 @@ class NextPCBTools(wx.Dialog):
         self.populate_footprint_list()
 
     def add_part_rot(self, e):
+        if not self.library_available():
+            return
+        from .rotations import RotationManagerDialog
+
         for item in self.footprint_list.GetSelections():
             row = self.footprint_list.ItemToRow(item)
             if row == -1:
@@ -1244,15 +1478,16 @@ class NextPCBTools(wx.Dialog):
                     RotationManagerDialog(self, re.escape(name)).ShowModal()
 
     def save_all_mappings(self, e):
+        rows = []
         for r in range(self.footprint_list.GetItemCount()):
-            footp = self.footprint_list.GetTextValue(r, 2)
-            partval = self.footprint_list.GetTextValue(r, 1)
-            lcscpart = self.footprint_list.GetTextValue(r, 3)
+            footp = self.footprint_list.GetTextValue(r, 3)
+            partval = self.footprint_list.GetTextValue(r, 2)
+            lcscpart = self.footprint_list.GetTextValue(r, 4)
             if footp != "" and partval != "" and lcscpart != "":
-                if self.library.get_mapping_data(footp, partval):
-                    self.library.update_mapping_data(footp, partval, lcscpart)
-                else:
-                    self.library.insert_mapping_data(footp, partval, lcscpart)
+                rows.append((footp, partval, lcscpart))
+        if not self.library_available():
+            return
+        self.library.upsert_mappings(rows)
         self.logger.info("All mappings saved")
 
     def export_to_schematic(self, e):
@@ -1268,9 +1503,29 @@ class NextPCBTools(wx.Dialog):
             if openFileDialog.ShowModal() == wx.ID_CANCEL:
                 return
             paths = openFileDialog.GetPaths()
-            SchematicExport(self).load_schematic(paths)
+            from .schematicexport import SchematicExport
+
+            results = SchematicExport(self).load_schematic(paths)
+            lines = []
+            for result in results:
+                name = os.path.basename(result.path)
+                if result.error:
+                    lines.append(f"{name}: failed, {result.error}")
+                elif result.skipped:
+                    lines.append(f"{name}: up to date")
+                else:
+                    lines.append(
+                        f"{name}: {result.changes} LCSC numbers updated ({result.duration:.2f}s)"
+                    )
+            failed = any(result.error for result in results)
+            wx.MessageBox(
+                "\n".join(lines),
+                "Export to schematic",
+                style=wx.ICON_ERROR if failed else wx.ICON_INFORMATION,
+            )
 
     def add_foot_mapping(self, e):
+        rows = []
         for item in self.footprint_list.GetSelections():
             row = self.footprint_list.ItemToRow(item)
             if row == -1:
@@ -1279,12 +1534,13 @@ class NextPCBTools(wx.Dialog):
             partval = self.footprint_list.GetTextValue(row, 2)
             lcscpart = self.footprint_list.GetTextValue(row, 4)
             if footp != "" and partval != "" and lcscpart != "":
-                if self.library.get_mapping_data(footp, partval):
-                    self.library.update_mapping_data(footp, partval, lcscpart)
-                else:
-                    self.library.insert_mapping_data(footp, partval, lcscpart)
+                rows.append((footp, partval, lcscpart))
+        if not self.library_available():
+            return
+        self.library.upsert_mappings(rows)
 
     def search_foot_mapping(self, e):
+        rows = []
         for item in self.footprint_list.GetSelections():
             row = self.footprint_list.ItemToRow(item)
             if row == -1:
@@ -1292,11 +1548,10 @@ class NextPCBTools(wx.Dialog):
             footp = self.footprint_list.GetTextValue(row, 3)
             partval = self.footprint_list.GetTextValue(row, 2)
             if footp != "" and partval != "":
-                if self.library.get_mapping_data(footp, partval):
-                    lcsc = self.library.get_mapping_data(footp, partval)[2]
-                    reference = self.footprint_list.GetTextValue(row, 0)
-                    self.store.set_lcsc(reference, lcsc)
-                    self.logger.info(f"Found {lcsc}")
+                rows.append([self.footprint_list.GetTextValue(row, 1), partval, footp])
+        if not self.library_available():
+            return
+        self.apply_mappings(rows)
         self.populate_footprint_list()
 
     def sanitize_lcsc(self, lcsc_PN):
@@ -1310,27 +1565,27 @@ class NextPCBTools(wx.Dialog):
         conMenu = wx.Menu()
         copy_lcsc = wx.MenuItem(conMenu, ID_COPY_MPN, "Copy MPN")
         conMenu.Append(copy_lcsc)
-        conMenu.Bind(wx.EVT_MENU, self.copy_part_lcsc, copy_lcsc)
+        conMenu.Bind(wx.EVT_MENU, profiler.wrap(self.copy_part_lcsc), copy_lcsc)
 
         paste_lcsc = wx.MenuItem(conMenu, ID_PASTE_MPN, "Paste MPN")
         conMenu.Append(paste_lcsc)
-        conMenu.Bind(wx.EVT_MENU, self.paste_part_lcsc, paste_lcsc)
+        conMenu.Bind(wx.EVT_MENU, profiler.wrap(self.paste_part_lcsc), paste_lcsc)
 
         manual_match = wx.MenuItem(
             conMenu, ID_MANUAL_MATCH, "Manual Match"
         )
         conMenu.Append(manual_match)
-        conMenu.Bind(wx.EVT_MENU, self.select_part, manual_match)
+        conMenu.Bind(wx.EVT_MENU, profiler.wrap(self.select_part), manual_match)
 
         remove_mpn = wx.MenuItem(
             conMenu, ID_REMOVE_PART, "Remove Assigned MPN"
         )
         conMenu.Append(remove_mpn)
-        conMenu.Bind(wx.EVT_MENU, self.remove_part, remove_mpn)
+        conMenu.Bind(wx.EVT_MENU, profiler.wrap(self.remove_part), remove_mpn)
 
         part_detail = wx.MenuItem(conMenu, ID_PART_DETAILS, "Show Part Details")
         conMenu.Append(part_detail)
-        conMenu.Bind(wx.EVT_MENU, self.get_part_details, part_detail)
+        conMenu.Bind(wx.EVT_MENU, profiler.wrap(self.get_part_details), part_detail)
 
         item_count = len(self.footprint_list.GetSelections())
         if item_count > 1:
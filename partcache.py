@@ -0,0 +1,94 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+DETAIL_TTL = 7 * 24 * 60 * 60
+IMAGE_CACHE_SIZE = 50 * 1024 * 1024
+
+
+class PartCache:
+    """Disk cache for part details and part images.
+
+    Details are stored as JSON per stockId and refreshed after a TTL, images
+    are stored per URL and evicted least recently used first once the image
+    directory grows beyond its size limit. If a refresh fails, a stale entry
+    is used, so parts that were looked at before also show up offline.
+    """
+
+    def __init__(self, datadir, detail_ttl=DETAIL_TTL, image_cache_size=IMAGE_CACHE_SIZE):
+        self.logger = logging.getLogger(__name__)
+        self.detail_dir = os.path.join(datadir, "details")
+        self.image_dir = os.path.join(datadir, "images")
+        self.detail_ttl = detail_ttl
+        self.image_cache_size = image_cache_size
+        self.lock = threading.Lock()
+        Path(self.detail_dir).mkdir(parents=True, exist_ok=True)
+        Path(self.image_dir).mkdir(parents=True, exist_ok=True)
+
+    def write(self, path, data):
+        """Write a cache file atomically, concurrent readers never see partial files."""
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def get_detail(self, stock_id, fetch):
+        """Get the details of a part, fetch(stock_id) is called if they are missing or expired."""
+        path = os.path.join(self.detail_dir, f"{stock_id}.json")
+        cached = None
+        try:
+            with open(path) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            pass
+        if cached and time.time() - cached.get("fetched", 0) < self.detail_ttl:
+            return cached["data"]
+        try:
+            data = fetch(stock_id)
+        except Exception as e:
+            if cached:
+                self.logger.info(f"Using cached details of {stock_id}, refresh failed: {e}")
+                return cached["data"]
+            raise
+        self.write(
+            path, json.dumps({"fetched": time.time(), "data": data}).encode("utf-8")
+        )
+        return data
+
+    def get_image(self, url, fetch):
+        """Get the raw image data of an URL, fetch(url) is called if it is not cached."""
+        path = os.path.join(self.image_dir, hashlib.sha1(url.encode("utf-8")).hexdigest())
+        try:
+            with open(path, "rb") as f:
+                content = f.read()
+            # the modification time tracks the last use
+            os.utime(path)
+            return content
+        except OSError:
+            pass
+        content = fetch(url)
+        self.write(path, content)
+        self.prune_images()
+        return content
+
+    def prune_images(self):
+        """Remove the least recently used images until the cache fits its size limit."""
+        with self.lock:
+            entries = []
+            for entry in os.scandir(self.image_dir):
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.image_cache_size:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
@@ -2,10 +2,11 @@ import io
 import logging
 import webbrowser
 import json
-import requests
+import threading
 import wx
 from requests.exceptions import Timeout
 
+from .apiclient import client
 from .helpers import HighResWxSize, loadBitmapScaled
 from .debug import Print
 
@@ -28,6 +29,16 @@ from .debug import Print
         # webbrowser.open(url)  
 
 class PartDetailsDialog(wx.Dialog):
+    PARAMETERS = {
+        "goodsName": "MPN",
+        "providerName": "Manufacturer",
+        "goodsDesc": "Description",
+        "encap": "Package / Footprint",
+        "categoryName": "Category",
+        "stockNumber": "Stock",
+        "minBuynum": "Minimum Order Quantity(MOQ)",
+    }
+
     def __init__(self, parent, stockID):
         wx.Dialog.__init__(
             self,
@@ -43,6 +54,8 @@ class PartDetailsDialog(wx.Dialog):
         self.parent = parent
         self.stockID = stockID
         self.pdfurl = None
+        # set when the dialog closes, late results of the workers are dropped
+        self.closed = threading.Event()
         #self.picture = None
 
         # ---------------------------------------------------------------------
@@ -126,12 +139,21 @@ class PartDetailsDialog(wx.Dialog):
         self.SetSizer(layout)
         self.Layout()
         self.Centre(wx.BOTH)
+        self.Bind(wx.EVT_CLOSE, self.quit_dialog)
 
-        self.get_part_data()
+        for v in self.PARAMETERS.values():
+            self.data_list.AppendItem([v, "Loading..."])
+        threading.Thread(target=self.get_part_data, daemon=True).start()
 
     def quit_dialog(self, e):
+        self.closed.set()
+        if self.IsModal():
+            self.EndModal(wx.ID_OK)
         self.Destroy()
-        self.EndModal(wx.ID_OK)
+
+    def is_closed(self):
+        """Check if the dialog was closed while a worker was busy."""
+        return self.closed.is_set() or not self
 
     def on_open_pdf(self, e):
         """Open the linked datasheet PDF on button click."""
@@ -142,67 +164,106 @@ class PartDetailsDialog(wx.Dialog):
             self.logger.info("opening %s", str(self.pdfurl))
             webbrowser.open("https:" + self.pdfurl)
 
-    def get_scaled_bitmap(self, url, width, height):
-        """Download a picture from a URL and convert it into a wx Bitmap"""
+    @staticmethod
+    def download_image(url):
+        """Download a picture from a URL"""
         header = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 \
             (KHTML, like Gecko) Chrome/99.0.9999.999 Safari/537.36'
         }
-        content = requests.get(url,headers=header).content
+        response = client.get(url, headers=header, timeout=(5, 10))
+        response.raise_for_status()
+        return response.content
+
+    def get_scaled_bitmap(self, content, width, height):
+        """Convert picture data into a scaled wx Bitmap"""
         io_bytes = io.BytesIO(content)
         image = wx.Image(io_bytes, type=wx.BITMAP_TYPE_ANY)
         image = image.Scale(width, height, wx.IMAGE_QUALITY_HIGH)
         result = wx.Bitmap(image)
         return result
 
-    def get_part_data(self):
-        """fetch part data from NextPCB API and parse it into the table, set picture and PDF link"""
+    def get_picture(self, url):
+        """Get the part picture from the cache or URL, runs on a worker thread"""
+        try:
+            content = self.parent.part_cache.get_image(url, self.download_image)
+        except Exception as e:
+            self.logger.warning(f"Failed to load picture {url}: {e}")
+            return
+        if not self.closed.is_set():
+            wx.CallAfter(self.show_picture, content)
+
+    def show_picture(self, content):
+        """Show the downloaded part picture"""
+        if self.is_closed():
+            return
+        try:
+            self.image.SetBitmap(
+                self.get_scaled_bitmap(
+                    content,
+                    int(200 * self.parent.scale_factor),
+                    int(200 * self.parent.scale_factor),
+                )
+            )
+        except Exception as e:
+            self.logger.warning(f"Failed to show picture: {e}")
+        self.Layout()
+
+    @staticmethod
+    def fetch_part_data(stock_id):
+        """Fetch the part data from the NextPCB API, raise on failure so that it is not cached"""
         headers = {
             "Content-Type": "application/json",
         }
         body = {
-            "stockId": self.stockID
+            "stockId": stock_id
         }
         body_json = json.dumps(body, indent=None, ensure_ascii=False)
-        try:
-            response = requests.post(
-                "https://edaapi.nextpcb.com/edapluginsapi/v1/stock/detail",
-                headers=headers,
-                data=body_json,
-                timeout=5
-            )
-        except Timeout:
-            self.Destroy()
-            self.EndModal(wx.ID_OK)
-        except Exception as e:
-            self.Destroy()
-            self.EndModal(wx.ID_OK)
-
+        response = client.post(
+            "https://edaapi.nextpcb.com/edapluginsapi/v1/stock/detail",
+            headers=headers,
+            data=body_json,
+            timeout=5
+        )
         if response.status_code != 200:
-            self.report_part_data_fetch_error("non-OK HTTP response status")
-
+            raise ValueError("non-OK HTTP response status")
         data = response.json()
-        #wx.MessageBox(f"return data detail:{data}", "Help", style=wx.ICON_INFORMATION)
         if not data.get("result"):
-            self.report_part_data_fetch_error(
+            raise ValueError(
                 "returned JSON data does not have expected 'result' attribute"
             )
         if not data.get("result").get("stock"):
-            self.report_part_data_fetch_error(
+            raise ValueError(
                 "returned JSON data does not have expected 'stock' attribute"
             )
-        
+        return data
+
+    def get_part_data(self):
+        """Fetch part data on a worker thread, the picture is downloaded while the table is filled"""
+        try:
+            data = self.parent.part_cache.get_detail(self.stockID, self.fetch_part_data)
+        except Timeout:
+            wx.CallAfter(self.report_part_data_fetch_error, "request timed out")
+            return
+        except Exception as e:
+            wx.CallAfter(self.report_part_data_fetch_error, e)
+            return
+        if self.closed.is_set():
+            return
+        picture = data.get("result").get("stock", {}).get("goodsImage", [])
+        if picture:
+            threading.Thread(
+                target=self.get_picture, args=("https:" + picture[0],), daemon=True
+            ).start()
+        wx.CallAfter(self.show_part_data, data)
+
+    def show_part_data(self, data):
+        """Parse the part data into the table and set the PDF link"""
+        if self.is_closed():
+            return
+        self.data_list.DeleteAllItems()
         self.info = data.get("result").get("stock", {})
-        parameters = {
-            "goodsName": "MPN",
-            "providerName": "Manufacturer",
-            "goodsDesc": "Description",
-            "encap": "Package / Footprint",
-            "categoryName": "Category",
-            "stockNumber": "Stock",
-            "minBuynum": "Minimum Order Quantity(MOQ)",
-        }
-        for k, v in parameters.items():
+        for k, v in self.PARAMETERS.items():
             val = self.info.get(k, "-")
             if val != "null" and val:
                 self.data_list.AppendItem([v, str(val)])
@@ -241,22 +302,6 @@ class PartDetailsDialog(wx.Dialog):
         
         #renderer = URLRenderer()
         #self.data_list.SetItemCustomRenderer(datasheet_item, 1, renderer)
-        picture = self.info.get("goodsImage", [])
-        #wx.MessageBox(f"self.pdfurl{self.pdfurl}", "Help", style=wx.ICON_INFORMATION)
-        #wx.MessageBox(f"picture:{picture}", "Help", style=wx.ICON_INFORMATION)
-        if picture:
-            
-            picture = "https:" + picture[0]
-            #webbrowser.open(picture)
-            #Print(self, str(picture)).ShowModal()
-            
-            self.image.SetBitmap(
-                self.get_scaled_bitmap(
-                    picture,
-                    int(200 * self.parent.scale_factor),
-                    int(200 * self.parent.scale_factor),
-                )
-            )
 
     # def on_datasheet_pdf(self):
         # item = self.data_list.GetSelection()
@@ -264,12 +309,13 @@ class PartDetailsDialog(wx.Dialog):
         # pdf_url = self.data_list.GetTextValue(row, 1)
 
     def report_part_data_fetch_error(self, reason):
+        if self.is_closed():
+            return
         wx.MessageBox(
             f"Failed to download part detail from the NextPCB API ({reason})\r\n"
             f"We looked for a part named:\r\n{self.stockID}\r\n[hint: did you fill in the NextPCB field correctly?]",
             "Error",
             style=wx.ICON_ERROR,
         )
-        self.Destroy()
-        self.EndModal(wx.ID_OK)
+        self.quit_dialog(None)
         #self.EndModal(-1)
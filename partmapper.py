@@ -231,17 +231,9 @@ class PartMapperManagerDialog(wx.Dialog):
             with open(path) as f:
                 csvreader = csv.DictReader(f, fieldnames=("footprint", "value", "lcsc"))
                 next(csvreader)
-                for row in csvreader:
-                    if self.parent.library.get_mapping_data(
-                        row["footprint"], row["value"]
-                    ):
-                        self.parent.library.update_mapping_data(
-                            row["footprint"], row["value"], row["lcsc"]
-                        )
-                    else:
-                        self.parent.library.insert_mapping_data(
-                            row["footprint"], row["value"], row["lcsc"]
-                        )
+                self.parent.library.upsert_mappings(
+                    (row["footprint"], row["value"], row["lcsc"]) for row in csvreader
+                )
             self.populate_mapping_list()
 
     def _export_mappings(self, path):
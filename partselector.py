@@ -1,14 +1,26 @@
 import logging
+import math
 
 import wx
-import requests
 import threading
 import json
+from .apiclient import client
 from .events import AssignPartsEvent, UpdateSetting
 from .helpers import HighResWxSize, loadBitmapScaled
 from .partdetails import PartDetailsDialog
+from .perf import monitor
+from .profiling import profiler
+from .prefetch import PREFETCH_COUNT, Prefetcher
+from .searchcache import SearchCache, normalize_keyword
 from requests.exceptions import Timeout
 
+SEARCH_URL = "https://edaapi.nextpcb.com/edapluginsapi/v1/stock/search"
+PAGE_SIZE = 150
+# the API only serves the first results of a search
+RESULT_LIMIT = 1000
+# milliseconds without typing before a search is sent
+SEARCH_DELAY = 400
+
 class PartSelectorDialog(wx.Dialog):
     def __init__(self, parent, parts):
         wx.Dialog.__init__(
@@ -26,6 +38,27 @@ class PartSelectorDialog(wx.Dialog):
         self.parts = parts
         #self.response_json_data = {}
         self.MPN_stockID_dict = {}
+        self.keyword = None
+        # bumped by every search, responses of older searches are dropped
+        self.search_generation = 0
+        self.page = 1
+        self.total_num = 0
+        self.search_part_list = None
+        # results of the current page from the API and for page 1 from the local library
+        self.online_parts = []
+        self.local_parts = []
+        self.shown_page = None
+        # the page that should be shown once it arrives
+        self.wanted_page = None
+        self.pending_pages = set()
+        self.page_cache = SearchCache()
+        self.prefetcher = None
+        if self.parent.settings.get("partselector", {}).get("prefetch_details", True):
+            self.prefetcher = Prefetcher(
+                self.parent.part_cache,
+                PartDetailsDialog.fetch_part_data,
+                PartDetailsDialog.download_image,
+            )
 
         part_selection = self.get_existing_selection(parts)
         #self.logger.debug(part_selection)
@@ -212,6 +245,16 @@ class PartSelectorDialog(wx.Dialog):
         self.description.Bind(wx.EVT_TEXT_ENTER, self.search)
         self.package.Bind(wx.EVT_TEXT_ENTER, self.search)
         self.search_button.Bind(wx.EVT_BUTTON, self.search)
+        self.search_timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self.search, self.search_timer)
+        for textctrl in (self.mpn_textctrl, self.manufacturer, self.description, self.package):
+            textctrl.Bind(wx.EVT_TEXT, self.on_search_text_change)
+        if self.parent.library is not None:
+            # suggest the manufacturers and packages of the local library, most parts first
+            self.manufacturer.AutoComplete(
+                [name for name, _ in self.parent.library.manufacturers if name]
+            )
+            self.package.AutoComplete([name for name, _ in self.parent.library.packages if name])
         # help_button.Bind(wx.EVT_BUTTON, self.help)
 
         # ---------------------------------------------------------------------
@@ -222,8 +265,37 @@ class PartSelectorDialog(wx.Dialog):
             self, wx.ID_ANY, "0 Results", wx.DefaultPosition, HighResWxSize(parent.window, wx.Size(-1, 20)),
         )
 
+        self.prev_page_button = wx.Button(
+            self,
+            wx.ID_ANY,
+            "< Previous",
+            wx.DefaultPosition,
+            HighResWxSize(parent.window, wx.Size(100, 30)),
+            0,
+        )
+        self.page_label = wx.StaticText(
+            self, wx.ID_ANY, "", wx.DefaultPosition, HighResWxSize(parent.window, wx.Size(120, 20)),
+            wx.ALIGN_CENTER_HORIZONTAL,
+        )
+        self.next_page_button = wx.Button(
+            self,
+            wx.ID_ANY,
+            "Next >",
+            wx.DefaultPosition,
+            HighResWxSize(parent.window, wx.Size(100, 30)),
+            0,
+        )
+        self.prev_page_button.Bind(wx.EVT_BUTTON, self.prev_page)
+        self.next_page_button.Bind(wx.EVT_BUTTON, self.next_page)
+        self.prev_page_button.Disable()
+        self.next_page_button.Disable()
+
         result_sizer = wx.BoxSizer(wx.HORIZONTAL)
         result_sizer.Add(self.result_count, 0, wx.LEFT | wx.ALIGN_BOTTOM, 5)
+        result_sizer.AddStretchSpacer()
+        result_sizer.Add(self.prev_page_button, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
+        result_sizer.Add(self.page_label, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
+        result_sizer.Add(self.next_page_button, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
 
         # ---------------------------------------------------------------------
         # ------------------------- Result Part list --------------------------
@@ -384,6 +456,9 @@ class PartSelectorDialog(wx.Dialog):
         return list(s)[0]
 
     def quit_dialog(self, e):
+        self.search_timer.Stop()
+        if self.prefetcher:
+            self.prefetcher.shutdown()
         self.Destroy()
         self.EndModal(0)
 
@@ -396,6 +471,11 @@ class PartSelectorDialog(wx.Dialog):
         """Enable the toolbar buttons when a selection was made."""
         if self.part_list.GetSelectedItemsCount() > 0:
             self.enable_toolbar_buttons(True)
+            if self.prefetcher:
+                self.prefetcher.prefetch(
+                    [self.get_stock_id(self.part_list.ItemToRow(self.part_list.GetSelection()))],
+                    cancel=False,
+                )
         else:
             self.enable_toolbar_buttons(False)
 
@@ -407,8 +487,13 @@ class PartSelectorDialog(wx.Dialog):
         ]:
             b.Enable(bool(state))
 
+    def on_search_text_change(self, e):
+        """Search as you type, the timer restarts on every change so only the last one is sent."""
+        self.search_timer.StartOnce(SEARCH_DELAY)
+
     def search(self, e):
         """Search the library for parts that meet the search criteria."""
+        self.search_timer.Stop()
         search_keyword = ""
         # for word in self.part_info:
         for word in [
@@ -419,62 +504,250 @@ class PartSelectorDialog(wx.Dialog):
         ]:
             if word:
                 search_keyword += str(word + " ")
-        self.page = 1    
-        body = {
-            "keyword": search_keyword,
-            "limit": 150,
-            "page": self.page,
-            "supplier": [],
-            "supplierSort": []
+        search_keyword = normalize_keyword(search_keyword)
+        if isinstance(e, wx.TimerEvent) and (
+            not search_keyword or (search_keyword, 1) == self.wanted_page
+        ):
+            return
+        if self.prefetcher:
+            self.prefetcher.cancel()
+        self.keyword = search_keyword
+        self.search_generation += 1
+        self.pending_pages.clear()
+        self.local_parts = []
+        if self.library_available():
+            threading.Thread(
+                target=profiler.wrap(self.local_search),
+                args=(search_keyword, self.search_generation),
+                daemon=True,
+            ).start()
+        self.load_page(1)
+
+    def library_available(self):
+        """Check if the local parts library can be searched."""
+        library = self.parent.library
+        return library is not None and library.searchable
+
+    def local_search(self, keyword, generation):
+        """Search the local parts library, runs on a worker thread."""
+        try:
+            rows = self.parent.library.search(
+                {
+                    "keyword": keyword,
+                    "basic": False,
+                    "extended": False,
+                    "stock": False,
+                    "limit": PAGE_SIZE,
+                }
+            )
+        except Exception as e:
+            self.logger.debug(f"Local search failed: {e}")
+            return
+        wx.CallAfter(
+            self.local_loaded, keyword, generation, [self.local_part_info(r) for r in rows]
+        )
+
+    @staticmethod
+    def local_part_info(row):
+        """Convert a row of the local parts library into the shape of an API result."""
+        lcsc, mpn, package, _, _, manufacturer, description, price, stock = row
+        price_stair = []
+        for stair in (price or "").split(","):
+            try:
+                quantity, value = stair.split(":")
+                price_stair.append(
+                    {"purchase": int(quantity.split("-")[0]), "hkPrice": float(value)}
+                )
+            except ValueError:
+                continue
+        return {
+            "goodsName": str(mpn or ""),
+            "providerName": str(manufacturer or ""),
+            "goodsDesc": str(description or ""),
+            "encap": str(package or ""),
+            "stockNumber": str(stock or 0),
+            "priceStair": price_stair,
+            "supplierName": f"LCSC {lcsc} (local)",
+            "stockId": 0,
         }
-        
-        url = "https://edaapi.nextpcb.com/edapluginsapi/v1/stock/search"
+
+    def local_loaded(self, keyword, generation, parts):
+        """Show the local results right away, they are merged with the online ones."""
+        if not self or generation != self.search_generation or keyword != self.keyword:
+            return
+        self.local_parts = parts
+        if self.shown_page != (keyword, 1):
+            if self.wanted_page != (keyword, 1):
+                return
+            # the online results are not there yet
+            self.page = 1
+            self.total_num = 0
+            self.online_parts = []
+        self.show_parts()
+
+    @property
+    def page_count(self):
+        """Number of result pages of the current search."""
+        return max(1, math.ceil(min(self.total_num, RESULT_LIMIT) / PAGE_SIZE))
+
+    def prev_page(self, e):
+        """Show the previous page of the search results."""
+        if self.page > 1:
+            self.load_page(self.page - 1)
+
+    def next_page(self, e):
+        """Show the next page of the search results."""
+        if self.page < self.page_count:
+            self.load_page(self.page + 1)
+
+    def load_page(self, page):
+        """Show a page of the current search, from the cache or the API."""
+        self.wanted_page = (self.keyword, page)
+        result = self.page_cache.get(self.search_body(self.keyword, page))
+        if result is not None:
+            self.show_page(self.keyword, page, result)
+            return
         self.search_button.Disable()
-        try:
-            threading.Thread(target=self.search_api_request(url, body)).start()
-        finally:
-            wx.EndBusyCursor()
-            self.search_button.Enable()
+        self.prev_page_button.Disable()
+        self.next_page_button.Disable()
+        self.result_count.SetLabel("Searching...")
+        self.request_page(self.keyword, page)
+
+    def request_page(self, keyword, page):
+        """Fetch a page on a worker thread unless that already happens.
 
-    def search_api_request(self, url, data):
-        wx.CallAfter(wx.BeginBusyCursor)
+        A running request can't be aborted, it is tagged with the generation of
+        the search so a response that arrives after a newer search was started
+        only goes into the cache and is not shown.
+        """
+        if (keyword, page) in self.pending_pages:
+            return
+        self.pending_pages.add((keyword, page))
+        threading.Thread(
+            target=profiler.wrap(self.search_api_request),
+            args=(keyword, page, self.search_generation),
+            daemon=True,
+        ).start()
 
+    @staticmethod
+    def search_body(keyword, page):
+        """Get the request body of a search."""
+        return {
+            "keyword": keyword,
+            "limit": PAGE_SIZE,
+            "page": page,
+            "supplier": [],
+            "supplierSort": []
+        }
+
+    @monitor.timed("part search")
+    def search_api_request(self, keyword, page, generation):
+        """Fetch a page of search results from the API, runs on a worker thread."""
+        body = self.search_body(keyword, page)
         headers = {
             "Content-Type": "application/json",
         }
-        body_json = json.dumps(data, indent=None, ensure_ascii=False)
-        #wx.MessageBox(f"{body_json}", "Help", style=wx.ICON_INFORMATION)
+        body_json = json.dumps(body, indent=None, ensure_ascii=False)
         try:
-            response = requests.post(
-                url,
+            response = client.post(
+                SEARCH_URL,
                 headers=headers,
                 data=body_json,
                 timeout=10
             )
+            if response.status_code != 200:
+                raise ValueError("non-OK HTTP response status")
+            data = response.json()
+            if not data.get("result", {}):
+                raise ValueError(
+                    "returned JSON data does not have expected 'result' attribute"
+                )
+            result = data.get("result")
         except Timeout:
-            self.report_part_search_error("HTTP response timeout")
+            wx.CallAfter(
+                self.page_failed, keyword, page, generation, "HTTP response timeout"
+            )
+            return
+        except Exception as e:
+            wx.CallAfter(self.page_failed, keyword, page, generation, e)
+            return
+        self.page_cache.put(body, result)
+        wx.CallAfter(self.page_loaded, keyword, page, generation, result)
+
+    def is_stale(self, keyword, page, generation):
+        """Check if a response belongs to an older search or a page that is not wanted."""
+        return (
+            not self
+            or generation != self.search_generation
+            or (keyword, page) != self.wanted_page
+        )
+
+    def page_loaded(self, keyword, page, generation, result):
+        """Show a fetched page if it is still wanted, prefetched pages just stay in the cache."""
+        if generation == self.search_generation:
+            self.pending_pages.discard((keyword, page))
+        if self.is_stale(keyword, page, generation):
+            return
+        self.show_page(keyword, page, result)
 
-        if response.status_code != 200:
-            self.report_part_search_error("non-OK HTTP response status")
+    def page_failed(self, keyword, page, generation, reason):
+        """Report a failed request for the wanted page, failed prefetches are ignored."""
+        if generation == self.search_generation:
+            self.pending_pages.discard((keyword, page))
+        if self.is_stale(keyword, page, generation):
             return
-        data = response.json()
-        if not data.get("result", {}):
-            self.report_part_search_error(
-                "returned JSON data does not have expected 'result' attribute"
-            )
-        if not data.get("result").get("stockList"):
-            self.report_part_search_error(
-                "returned JSON data does not have expected 'stockList' attribute"
-            )
-        self.total_num = data.get("result").get("total", 0)
-        
-        self.search_part_list = data.get("result").get("stockList", [])
-        
-        wx.CallAfter(self.populate_part_list)
-        wx.CallAfter(wx.EndBusyCursor)
-        
+        self.update_page_controls()
+        self.report_part_search_error(reason)
+
+    def show_page(self, keyword, page, result):
+        """Populate the list with a page and prefetch the next one."""
+        self.page = page
+        self.total_num = result.get("total", 0)
+        self.online_parts = result.get("stockList", [])
+        self.shown_page = (keyword, page)
+        self.show_parts()
+        if (
+            page < self.page_count
+            and self.search_body(keyword, page + 1) not in self.page_cache
+        ):
+            self.request_page(keyword, page + 1)
+
+    def show_parts(self):
+        """Merge the online and local results, the online entry wins for parts found in both."""
+        online = {
+            (str(p.get("goodsName", "")).lower(), str(p.get("providerName", "")).lower())
+            for p in self.online_parts
+        }
+        local = []
+        if self.page == 1:
+            local = [
+                p
+                for p in self.local_parts
+                if (p["goodsName"].lower(), p["providerName"].lower()) not in online
+            ]
+        self.search_part_list = self.online_parts + local
+        self.populate_part_list()
+        self.update_page_controls()
+
+    def update_page_controls(self):
+        """Enable the paging buttons according to the current page."""
+        self.search_button.Enable()
+        self.prev_page_button.Enable(self.page > 1)
+        self.next_page_button.Enable(self.page < self.page_count)
+        self.page_label.SetLabel(f"Page {self.page} of {self.page_count}")
+        if self.search_part_list is not None:
+            local = len(self.search_part_list) - len(self.online_parts)
+            if self.total_num >= RESULT_LIMIT:
+                results = f"{RESULT_LIMIT} Results (limited)"
+            else:
+                results = f"{self.total_num} Results"
+            if self.shown_page != (self.keyword, self.page):
+                self.result_count.SetLabel(f"{local} local Results, searching online...")
+            elif local:
+                self.result_count.SetLabel(f"{results}, {local} more local")
+            else:
+                self.result_count.SetLabel(results)
 
-  
     def update_subcategories(self, e):
         """Update the possible subcategory selection."""
         self.subcategory.Clear()
@@ -490,10 +763,6 @@ class PartSelectorDialog(wx.Dialog):
         self.MPN_stockID_dict.clear()
         if self.search_part_list is None:
             return
-        if self.total_num >= 1000:
-            self.result_count.SetLabel("1000 Results (limited)")
-        else:
-            self.result_count.SetLabel(f"{self.total_num} Results")
 
         parameters = [
             "goodsName",
@@ -504,7 +773,8 @@ class PartSelectorDialog(wx.Dialog):
         ]
         self.item_list = []
         #wx.MessageBox(f"self.search_part_list_json{self.search_part_list}", "Help", style=wx.ICON_INFORMATION)
-        for idx, part_info in enumerate(self.search_part_list, start=1):
+        first = (self.page - 1) * PAGE_SIZE + 1
+        for idx, part_info in enumerate(self.search_part_list, start=first):
             # if idx > 50 :
                 # break
             part = []
@@ -533,6 +803,10 @@ class PartSelectorDialog(wx.Dialog):
             self.MPN_stockID_dict["".join(part[:4])] = part_info.get("stockId", 0)
             self.part_list.AppendItem(part)
             #wx.MessageBox(f"parts:{parts}", "Help", style=wx.ICON_INFORMATION)
+        if self.prefetcher:
+            self.prefetcher.prefetch(
+                [p.get("stockId", 0) for p in self.search_part_list[:PREFETCH_COUNT]]
+            )
 
 
         # for idx, item in enumerate(self.item_list, start=1):
@@ -544,6 +818,13 @@ class PartSelectorDialog(wx.Dialog):
 
 
 
+    def get_stock_id(self, row):
+        """Get the stockId of a row in the part list."""
+        if row == -1:
+            return 0
+        key = "".join(str(self.part_list.GetValue(row, col)) for col in range(4))
+        return self.MPN_stockID_dict.get(key, 0)
+
     def select_part(self, e):
         """Save the selected part number and close the modal."""
         item = self.part_list.GetSelection()
@@ -553,7 +834,6 @@ class PartSelectorDialog(wx.Dialog):
         selection = self.part_list.GetValue(row, 1)
         manu = self.part_list.GetValue(row, 2)
         des = self.part_list.GetValue(row, 3)
-        key = str(row + 1) + selection + manu + des
         #wx.MessageBox(f"key:{key}", "Help", style=wx.ICON_INFORMATION)
         #wx.MessageBox(f"keyss:{list(self.parts.keys())}", "Help", style=wx.ICON_INFORMATION)
         #wx.MessageBox(f"stockID:{self.MPN_stockID_dict.get(key, 0)}", "Help", style=wx.ICON_INFORMATION)
@@ -564,9 +844,11 @@ class PartSelectorDialog(wx.Dialog):
                 manufacturer=manu,
                 description=des,
                 references=list(self.parts.keys()),
-                stock_id=self.MPN_stockID_dict.get(key, 0)
+                stock_id=self.get_stock_id(row)
             ),
         )
+        if self.prefetcher:
+            self.prefetcher.shutdown()
         self.EndModal(wx.ID_OK)
 
     def get_part_details(self, e):
@@ -576,14 +858,10 @@ class PartSelectorDialog(wx.Dialog):
         row = self.part_list.ItemToRow(item)
         if row == -1:
             return
-        selection = self.part_list.GetValue(row, 1)
-        manu = self.part_list.GetValue(row, 2)
-        des = self.part_list.GetValue(row, 3)
-        key = str(row + 1) + selection + manu + des
         # part = self.part_list.GetValue(row, 1)
-        stock_id = self.MPN_stockID_dict.get(key, 0)
+        stock_id = self.get_stock_id(row)
         
-        if stock_id != "":
+        if stock_id:
             try:
                 wx.BeginBusyCursor()
                 #wx.MessageBox(f"stock_id:{stock_id}", "Help", style=wx.ICON_INFORMATION)
@@ -592,7 +870,7 @@ class PartSelectorDialog(wx.Dialog):
                  wx.EndBusyCursor()
         else:
             wx.MessageBox(
-                "Failed to get part stockID from NextPCB\r\n",
+                "Failed to get part stockID from NextPCB, local parts have no NextPCB details\r\n",
                 "Error",
                 style=wx.ICON_ERROR,
             )
@@ -616,10 +894,8 @@ class PartSelectorDialog(wx.Dialog):
     def report_part_search_error(self, reason):
         wx.MessageBox(
             f"Failed to download part detail from the NextPCB API ({reason})\r\n"
-            f"We looked for a part named:\r\n{self.part}\r\n[hint: did you fill in the NextPCB field correctly?]",
+            f"We looked for a part named:\r\n{self.keyword}\r\n[hint: did you fill in the NextPCB field correctly?]",
             "Error",
             style=wx.ICON_ERROR,
         )
-        wx.CallAfter(wx.EndBusyCursor)
-        wx.CallAfter(self.search_button.Enable())
         return
\ No newline at end of file
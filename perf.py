@@ -0,0 +1,170 @@
+import contextlib
+import functools
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from logging.handlers import RotatingFileHandler
+
+# upper bounds of the histogram buckets in milliseconds, the last bucket is open
+BUCKETS = (1, 5, 10, 50, 100, 500, 1000, 5000, 10000)
+LOG_MAX_BYTES = 1024 * 1024
+LOG_BACKUPS = 3
+
+
+class OperationStats:
+    """Duration histogram of a single operation."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def add(self, duration):
+        """Add a duration in seconds."""
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        ms = duration * 1000
+        for idx, bound in enumerate(BUCKETS):
+            if ms <= bound:
+                self.buckets[idx] += 1
+                return
+        self.buckets[-1] += 1
+
+    @property
+    def mean(self):
+        """Average duration in seconds."""
+        return self.total / self.count if self.count else 0.0
+
+    def histogram(self):
+        """The non-empty buckets as text, e.g. '<=10ms: 3'."""
+        labels = [f"<={b}ms" for b in BUCKETS] + [f">{BUCKETS[-1]}ms"]
+        return ", ".join(
+            f"{label}: {n}" for label, n in zip(labels, self.buckets) if n
+        )
+
+    def __str__(self):
+        return (
+            f"{self.count} runs, mean {self.mean * 1000:.1f}ms, "
+            f"max {self.max * 1000:.1f}ms, total {self.total:.2f}s"
+        )
+
+
+class PerfMonitor:
+    """Timing of the hot paths and counters of SQL statements and HTTP calls.
+
+    Operations are timed with monitor.timer(name) or the monitor.timed(name)
+    decorator. While the monitor is disabled both only cost a flag check.
+    Once enabled every timed operation is added to its histogram and written
+    to a rotating perf log together with the SQL and HTTP counts it caused.
+    Counts are global, so concurrent operations share them.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.operations = {}
+        self.counters = Counter()
+        self.logger = logging.getLogger(f"{__name__}.log")
+        # keep the timings out of the log box
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        self.handler = None
+
+    def enable(self, logfile):
+        """Start recording, timings are appended to logfile."""
+        self.disable()
+        os.makedirs(os.path.dirname(logfile), exist_ok=True)
+        self.handler = RotatingFileHandler(
+            logfile, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8"
+        )
+        self.handler.setFormatter(
+            logging.Formatter("%(asctime)s %(message)s", datefmt="%Y.%m.%d %H:%M:%S")
+        )
+        self.logger.addHandler(self.handler)
+        self.enabled = True
+
+    def disable(self):
+        """Stop recording and close the perf log, collected statistics are kept."""
+        self.enabled = False
+        if self.handler:
+            self.logger.removeHandler(self.handler)
+            self.handler.close()
+            self.handler = None
+
+    def reset(self):
+        """Forget all collected statistics."""
+        with self.lock:
+            self.operations = {}
+            self.counters = Counter()
+
+    def count(self, name, n=1):
+        """Increase a counter, e.g. 'sql' or 'http'."""
+        if self.enabled:
+            with self.lock:
+                self.counters[name] += n
+
+    def record(self, name, duration, counts=None):
+        """Add a duration in seconds to an operation and log it."""
+        if not self.enabled:
+            return
+        with self.lock:
+            self.operations.setdefault(name, OperationStats()).add(duration)
+        details = "".join(f" {k}={v}" for k, v in sorted((counts or {}).items()) if v)
+        self.logger.info(f"{name}: {duration * 1000:.1f}ms{details}")
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        """Time the enclosed block as operation name."""
+        if not self.enabled:
+            yield
+            return
+        with self.lock:
+            before = Counter(self.counters)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            with self.lock:
+                counts = self.counters - before
+            self.record(name, duration, counts)
+
+    def timed(self, name):
+        """Decorator that times every call of a function as operation name."""
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def summary(self):
+        """The statistics of all operations and counters as lines of text."""
+        with self.lock:
+            lines = []
+            for name, stats in sorted(self.operations.items()):
+                lines.append(f"{name}: {stats}")
+                lines.append(f"    {stats.histogram()}")
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"{name}: {value}")
+        return lines
+
+
+monitor = PerfMonitor()
+
+
+def connect(database, **kwargs):
+    """Open a sqlite connection whose statements are counted while the monitor is enabled."""
+    con = sqlite3.connect(database, **kwargs)
+    if monitor.enabled:
+        con.set_trace_callback(lambda statement: monitor.count("sql"))
+    return con
@@ -1,8 +1,6 @@
 import os
 from pcbnew import ActionPlugin
 
-from .mainwindow import NextPCBTools
-
 
 class JLCPCBPlugin(ActionPlugin):
     def defaults(self):
@@ -17,6 +15,9 @@ class JLCPCBPlugin(ActionPlugin):
         self._pcbnew_frame = None
 
     def Run(self):
+        # imported on first use so that the plugin does not slow down KiCad startup
+        from .mainwindow import NextPCBTools
+
         dialog = NextPCBTools(None)
         dialog.Center()
         dialog.Show()
@@ -0,0 +1,87 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+PREFETCH_COUNT = 10
+MAX_WORKERS = 3
+# minimum time between two network requests of the prefetcher
+MIN_INTERVAL = 0.2
+
+
+class PrefetchCancelled(Exception):
+    """Raised when a prefetch belongs to an outdated search."""
+
+
+class Prefetcher:
+    """Warm the part cache with details and pictures in the background.
+
+    Requests go through a small worker pool and are spaced out by a minimum
+    interval, so the prefetcher never floods the API. Every call to prefetch()
+    with cancel=True starts a new generation, queued work of older
+    generations is dropped before it touches the network.
+    """
+
+    def __init__(self, cache, fetch_detail, fetch_image, max_workers=MAX_WORKERS):
+        self.logger = logging.getLogger(__name__)
+        self.cache = cache
+        self.fetch_detail = fetch_detail
+        self.fetch_image = fetch_image
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.next_request = 0.0
+
+    def prefetch(self, stock_ids, cancel=True):
+        """Queue stock ids for prefetching, optionally dropping everything queued before."""
+        if cancel:
+            self.cancel()
+        generation = self.generation
+        for stock_id in stock_ids:
+            if stock_id:
+                self.pool.submit(self.warm, generation, stock_id)
+
+    def cancel(self):
+        """Drop all queued prefetches."""
+        with self.lock:
+            self.generation += 1
+
+    def shutdown(self):
+        """Drop all queued prefetches and stop the workers."""
+        self.cancel()
+        self.pool.shutdown(wait=False)
+
+    def throttle(self, generation):
+        """Wait for the next request slot, give up if the generation is outdated."""
+        with self.lock:
+            if generation != self.generation:
+                raise PrefetchCancelled()
+            now = time.monotonic()
+            slot = max(now, self.next_request)
+            self.next_request = slot + MIN_INTERVAL
+        time.sleep(slot - now)
+        if generation != self.generation:
+            raise PrefetchCancelled()
+
+    def warm(self, generation, stock_id):
+        """Fetch the details and picture of a part into the cache, runs on a worker."""
+
+        def fetch_detail(stock_id):
+            self.throttle(generation)
+            return self.fetch_detail(stock_id)
+
+        def fetch_image(url):
+            self.throttle(generation)
+            return self.fetch_image(url)
+
+        try:
+            if generation != self.generation:
+                return
+            data = self.cache.get_detail(stock_id, fetch_detail)
+            picture = data.get("result", {}).get("stock", {}).get("goodsImage", [])
+            if picture:
+                self.cache.get_image("https:" + picture[0], fetch_image)
+        except PrefetchCancelled:
+            pass
+        except Exception as e:
+            self.logger.debug(f"Prefetch of {stock_id} failed: {e}")
@@ -0,0 +1,123 @@
+#!/bin/env python3
+
+"""
+Aggregate the .pstats files of a profiling session into the collapsed
+stack format of flamegraph.pl, speedscope and similar tools:
+
+    python profile_collapse.py path/to/project/nextpcb/profiles > out.folded
+    python profile_collapse.py --action populate_footprint_list profiles/*.pstats
+
+cProfile only records caller/callee pairs, not full stacks. The stacks are
+rebuilt from the call graph and the time of a function is split among its
+callers in proportion to the time spent on behalf of each of them, which
+is exact for trees and a good approximation for shared helpers.
+"""
+
+import argparse
+import glob
+import json
+import os
+import pstats
+import sys
+from collections import Counter
+
+# stop following paths below this many microseconds
+MIN_MICROSECONDS = 1
+MAX_DEPTH = 200
+
+
+def find_profiles(paths, action=None):
+    """Expand directories and filter the profiles by the action of their metadata."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "*.pstats"))))
+        else:
+            files.append(path)
+    if not action:
+        return files
+    selected = []
+    for file in files:
+        try:
+            with open(f"{os.path.splitext(file)[0]}.json") as f:
+                name = json.load(f).get("action")
+        except (OSError, ValueError):
+            name = None
+        if name == action:
+            selected.append(file)
+    return selected
+
+
+def label(func):
+    """Frame label of a pstats function key."""
+    filename, line, name = func
+    if filename == "~":
+        return name.replace(";", ",")
+    return f"{name} ({os.path.basename(filename)}:{line})".replace(";", ",")
+
+
+def collapse(stats):
+    """Rebuild the stacks of a pstats.Stats object, return a Counter stack -> microseconds."""
+    entries = stats.stats
+    callees = {}
+    for func, (_, _, _, _, callers) in entries.items():
+        for caller, edge in callers.items():
+            # edge is (primitive calls, calls, own time, cumulative time) for this caller
+            callees.setdefault(caller, []).append((func, edge[3]))
+    stacks = Counter()
+
+    def walk(func, path, funcs, share):
+        _, _, own, cumulative, _ = entries[func]
+        path = path + [label(func)]
+        own_us = own * share * 1000000
+        if own_us >= MIN_MICROSECONDS:
+            stacks[";".join(path)] += own_us
+        if len(path) >= MAX_DEPTH:
+            return
+        for callee, edge_cumulative in callees.get(func, ()):
+            # recursion is folded into the outermost call
+            if callee in funcs or callee not in entries:
+                continue
+            callee_cumulative = entries[callee][3]
+            if callee_cumulative <= 0:
+                continue
+            callee_share = share * edge_cumulative / callee_cumulative
+            if callee_cumulative * callee_share * 1000000 < MIN_MICROSECONDS:
+                continue
+            walk(callee, path, funcs | {callee}, callee_share)
+
+    for func, entry in entries.items():
+        if not entry[4]:
+            walk(func, [], {func}, 1.0)
+    return stacks
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Collapse .pstats files for flame graphs.")
+    parser.add_argument("paths", nargs="+", help="profile folders or .pstats files")
+    parser.add_argument("--action", help="only use profiles of this action")
+    parser.add_argument("--output", help="write to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    files = find_profiles(args.paths, args.action)
+    if not files:
+        print("No profiles found.", file=sys.stderr)
+        return 1
+    stats = pstats.Stats(files[0])
+    for file in files[1:]:
+        stats.add(file)
+    stacks = collapse(stats)
+    out = open(args.output, "w") if args.output else sys.stdout
+    try:
+        for stack, us in sorted(stacks.items()):
+            if round(us):
+                out.write(f"{stack} {round(us)}\n")
+    finally:
+        if args.output:
+            out.close()
+    print(f"Collapsed {len(files)} profiles into {len(stacks)} stacks.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
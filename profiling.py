@@ -0,0 +1,101 @@
+import cProfile
+import functools
+import json
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+
+class SessionProfiler:
+    """Capture cProfile data of user actions while profiling is switched on.
+
+    Every profiled action is written as <timestamp>-<action>.pstats into the
+    profile folder, next to a .json file with its duration, thread and the
+    board statistics. Actions nested in a profiled action are part of the
+    outer profile. Python 3.12 allows only one active profiler at a time, so
+    an action that starts while another thread is profiled runs unprofiled.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.enabled = False
+        self.directory = None
+        self.statistics = {}
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.counter = 0
+
+    def enable(self, directory, statistics=None):
+        """Start profiling actions into directory."""
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        self.directory = directory
+        self.statistics = statistics or {}
+        self.enabled = True
+
+    def disable(self):
+        """Stop profiling, actions that are running finish their profile."""
+        self.enabled = False
+
+    def run(self, name, func, *args, **kwargs):
+        """Call func, profiled as action name if profiling is on."""
+        if not self.enabled or getattr(self.local, "active", False):
+            return func(*args, **kwargs)
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as e:
+            self.logger.debug(f"Not profiling {name}: {e}")
+            return func(*args, **kwargs)
+        self.local.active = True
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.disable()
+            self.local.active = False
+            self.save(name, profile, time.perf_counter() - start)
+
+    def wrap(self, func, name=None):
+        """Wrap a handler or thread target so that its calls are profiled."""
+        name = name or getattr(func, "__name__", "action")
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return self.run(name, func, *args, **kwargs)
+
+        return wrapper
+
+    def save(self, name, profile, duration):
+        """Write the profile of an action and its metadata."""
+        with self.lock:
+            self.counter += 1
+            stem = "{}-{:03d}-{}".format(
+                time.strftime("%Y%m%d-%H%M%S"),
+                self.counter % 1000,
+                re.sub(r"[^\w.-]+", "_", name),
+            )
+        path = os.path.join(self.directory, stem)
+        try:
+            profile.dump_stats(f"{path}.pstats")
+            with open(f"{path}.json", "w") as f:
+                json.dump(
+                    {
+                        "action": name,
+                        "thread": threading.current_thread().name,
+                        "duration": duration,
+                        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                        "board": self.statistics,
+                    },
+                    f,
+                    indent=2,
+                )
+        except OSError as e:
+            self.logger.warning(f"Failed to save the profile of {name}: {e}")
+            return
+        self.logger.debug(f"Profiled {name} in {duration:.2f}s, saved to {path}.pstats")
+
+
+profiler = SessionProfiler()
@@ -1,10 +1,11 @@
+import codecs
 import csv
 import logging
 import os
 
-import requests
 import wx
 
+from .apiclient import client
 from .events import (
     PopulateFootprintListEvent,
 )
@@ -278,6 +279,7 @@ class RotationManagerDialog(wx.Dialog):
             self.parent.library.insert_correction_data(regex, correction)
             self.selection_regex = None
         self.populate_rotations_list()
+        self.parent.corrections.invalidate()
         wx.PostEvent(self.parent, PopulateFootprintListEvent())
 
     def delete_correction(self, e):
@@ -289,6 +291,7 @@ class RotationManagerDialog(wx.Dialog):
         regex = self.rotations_list.GetTextValue(row, 0)
         self.parent.library.delete_correction_data(regex)
         self.populate_rotations_list()
+        self.parent.corrections.invalidate()
         wx.PostEvent(self.parent, PopulateFootprintListEvent())
 
     def on_correction_selected(self, e):
@@ -318,21 +321,25 @@ class RotationManagerDialog(wx.Dialog):
         """Fetch the latest rotation correction table from Matthew Lai's JLCKicadTool repo"""
         self.parent.library.create_rotation_table()
         try:
-            r = requests.get(
-                "https://raw.githubusercontent.com/matthewlai/JLCKicadTools/master/jlc_kicad_tools/cpl_rotations_db.csv"
-            )
-            corrections = csv.reader(r.text.splitlines(), delimiter=",", quotechar='"')
-            next(corrections)
-            for row in corrections:
-                if not self.parent.library.get_correction_data(row[0]):
-                    self.parent.library.insert_correction_data(row[0], row[1])
-                else:
-                    self.logger.info(
-                        f"Correction '{row[0]}' exists already in database with correction value {row[1]}. Leaving this one out."
-                    )
+            with client.get(
+                "https://raw.githubusercontent.com/matthewlai/JLCKicadTools/master/jlc_kicad_tools/cpl_rotations_db.csv",
+                stream=True,
+            ) as r:
+                r.raise_for_status()
+                corrections = csv.reader(
+                    codecs.iterdecode(r.iter_lines(), "utf-8"), delimiter=",", quotechar='"'
+                )
+                next(corrections)
+                # corrections that exist already in the database are left as they are
+                added = self.parent.library.upsert_corrections(
+                    ((row[0], row[1]) for row in corrections if len(row) >= 2),
+                    overwrite=False,
+                )
+            self.logger.info(f"Added {added} downloaded corrections to the database.")
         except Exception as err:
             self.logger.debug(err)
         self.populate_rotations_list()
+        self.parent.corrections.invalidate()
         wx.PostEvent(self.parent, PopulateFootprintListEvent())
 
     def import_legacy_corrections(self):
@@ -378,22 +385,13 @@ class RotationManagerDialog(wx.Dialog):
             with open(path) as f:
                 csvreader = csv.DictReader(f, fieldnames=("regex", "correction"))
                 next(csvreader)
-                for row in csvreader:
-                    if self.parent.library.get_correction_data(row["regex"]):
-                        self.parent.library.update_correction_data(
-                            row["regex"], row["correction"]
-                        )
-                        self.logger.info(
-                            f"Correction '{row['regex']}' exists already in database with correction value {row['correction']}. Overwrite it with local values from CSV."
-                        )
-                    else:
-                        self.parent.library.insert_correction_data(
-                            row["regex"], row["correction"]
-                        )
-                        self.logger.info(
-                            f"Correction '{row['regex']}' with correction value {row['correction']} is added to the database from local CSV."
-                        )
+                # local values from the CSV overwrite existing corrections
+                count = self.parent.library.upsert_corrections(
+                    (row["regex"], row["correction"]) for row in csvreader
+                )
+                self.logger.info(f"Imported {count} corrections from {path}.")
             self.populate_rotations_list()
+            self.parent.corrections.invalidate()
             wx.PostEvent(self.parent, PopulateFootprintListEvent())
 
     def _export_corrections(self, path):
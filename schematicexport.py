@@ -1,13 +1,53 @@
+import hashlib
+import json
 import logging
 import os
 import os.path
 import re
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-from pcbnew import (
-    GetBuildVersion,
-)
+from .perf import monitor
 
-from .helpers import is_nightly
+# tokens of a KiCad S-expression, whitespace in between is skipped and copied verbatim
+TOKEN = re.compile(r'\(|\)|"(?:[^"\\]|\\.)*"|[^\s()"]+')
+
+
+class Node:
+    """An open S-expression list while the file is scanned."""
+
+    __slots__ = ("head", "start", "end", "atoms", "children", "properties")
+
+    def __init__(self, start):
+        self.head = None
+        self.start = start
+        self.end = None
+        # direct atoms after the head as (text, start, end)
+        self.atoms = []
+        # first child list per head, e.g. "at" or "id" of a property
+        self.children = {}
+        # property lists of a symbol instance
+        self.properties = []
+
+
+class SheetResult:
+    """Outcome of exporting to a single schematic sheet."""
+
+    def __init__(self, path, changes=0, skipped=False, duration=0.0, error=None):
+        self.path = path
+        self.changes = changes
+        self.skipped = skipped
+        self.duration = duration
+        self.error = error
+        # LCSC value of every placed symbol after the export, by reference
+        self.lcsc = {}
+        self.digest = None
+
+
+def quote(text):
+    """Quote a string for use in a S-expression."""
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
 
 
 class SchematicExport:
@@ -20,169 +60,186 @@ class SchematicExport:
         self.logger = logging.getLogger(__name__)
         self.parent = parent
 
+    @monitor.timed("schematic export")
     def load_schematic(self, paths):
-        if is_nightly(GetBuildVersion()):
-            self.logger.info("Kicad 7+...")
-            for path in paths:
-                self._update_schematic7(path)
-        else:
-            self.logger.info("Kicad 6...")
-            for path in paths:
-                self._update_schematic(path)
-
-    def _update_schematic(self, path):
-        """This only works with KiCad V6 files"""
-        self.logger.info(f"Reading {path}...")
-        """Regex to look through schematic property, if we hit the pin section without finding a LCSC property, add it"""
-        """keep track of property ids and Reference property location to use with new LCSC property"""
-        propRx = re.compile(
-            '\\(property\\s\\"(.*)\\"\\s\\"(.*)\\"\\s\\(id\\s(\\d+)\\)\\s\\(at\\s(-?\\d+(?:.\\d+)?\\s-?\\d+(?:.\\d+)?)\\s\\d+\\)'
-        )
-        pinRx = re.compile('\\(pin\\s\\"(.*)\\"\\s\\(')
-
-        store_parts = self.parent.store.read_all()
-
-        lastID = -1
-        lastLoc = ""
-        lastLcsc = ""
-        newLcsc = ""
-        lastRef = ""
-
-        lines = []
-        newlines = []
-        with open(path) as f:
-            lines = f.readlines()
-
-        if os.path.exists(path + "_old"):
-            os.remove(path + "_old")
-        os.rename(path, path + "_old")
-        partSection = False
-
-        for line in lines:
-            inLine = line.rstrip()
-            outLine = inLine
-            if "(symbol (lib_id" in inLine:  # skip library section
-                partSection = True
-            m = propRx.search(inLine)
-            if m and partSection:
-                key = m.group(1)
-                value = m.group(2)
-                lastID = int(m.group(3))
-
-                # found a LCSC property, so update it if needed
-                if key == "LCSC":
-                    lastLcsc = value
-                    if lastLcsc != newLcsc and newLcsc != "":
-                        self.logger.info(f"Updating {newLcsc} on {lastRef}")
-                        outLine = outLine.replace(
-                            '"' + lastLcsc + '"', '"' + newLcsc + '"'
-                        )
-                        lastLcsc = newLcsc
-
-                if key == "Reference":
-                    lastLoc = m.group(4)
-                    lastRef = value
-                    for part in store_parts:
-                        if value == part[0]:
-                            newLcsc = part[3]
-                            break
-            # if we hit the pin section without finding a LCSC property, add it
-            m = pinRx.search(inLine)
-            if m:
-                if lastLcsc == "" and newLcsc != "" and lastLoc != "" and lastID != -1:
-                    self.logger.info(f"added {newLcsc} to {lastRef}")
-                    newTxt = '    (property "LCSC" "{}" (id {}) (at {} 0)'.format(
-                        newLcsc, (lastID + 1), lastLoc
+        """Export the LCSC numbers to the sheets concurrently, return a SheetResult per sheet.
+
+        A sheet whose content hash matches the last export and whose symbols
+        already carry the current LCSC numbers is skipped without parsing.
+        """
+        start = time.perf_counter()
+        # read-only snapshot shared by all workers
+        mpns = self.parent.store.read_mpns()
+        cache_file = os.path.join(self.parent.store.datadir, "schematic_cache.json")
+        cache = self.load_cache(cache_file)
+        with ThreadPoolExecutor(max_workers=min(8, len(paths) or 1)) as pool:
+            results = list(
+                pool.map(lambda p: self._export_sheet(p, mpns, cache.get(p)), paths)
+            )
+        for result in results:
+            if result.error:
+                self.logger.error(f"Failed to update {result.path}: {result.error}")
+                cache.pop(result.path, None)
+            else:
+                if result.skipped:
+                    self.logger.info(f"Skipped {result.path}, nothing to update")
+                else:
+                    self.logger.info(
+                        f"Updated {result.changes} LCSC properties in {result.path} in {result.duration:.2f}s"
                     )
-                    newlines.append(newTxt)
-                    newlines.append("      (effects (font (size 1.27 1.27)) hide)")
-                    newlines.append("    )")
-                lastID = -1
-                lastLoc = ""
-                lastLcsc = ""
-                newLcsc = ""
-                lastRef = ""
-            newlines.append(outLine)
-
-        f = open(path, "w")
-        for line in newlines:
-            f.write(line + "\n")
-        f.close()
-        self.logger.info(f"Added LCSC's to {path}(maybe?)")
-
-    def _update_schematic7(self, path):
-        """This only works with KiCad V7 files"""
-        self.logger.info(f"Reading {path}...")
-        """Regex to look through schematic property, if we hit the pin section without finding a LCSC property, add it"""
-        """keep track of property ids and Reference property location to use with new LCSC property"""
-        propRx = re.compile(
-            '\\(property\\s\\"(.*)\\"\\s\\"(.*)\\"\\s\\(at\\s(-?\\d+(?:.\\d+)?\\s-?\\d+(?:.\\d+)?)\\s\\d+\\)'
+                cache[result.path] = {"hash": result.digest, "lcsc": result.lcsc}
+        self.save_cache(cache_file, cache)
+        self.logger.info(
+            f"Exported to {len(paths)} sheets in {time.perf_counter() - start:.2f}s"
         )
-        pinRx = re.compile('\\(pin\\s\\"(.*)\\"\\s\\(')
-
-        store_parts = self.parent.store.read_all()
-
-        lastLoc = ""
-        lastLcsc = ""
-        newLcsc = ""
-        lastRef = ""
-
-        lines = []
-        newlines = []
-        with open(path) as f:
-            lines = f.readlines()
-
-        if os.path.exists(path + "_old"):
-            os.remove(path + "_old")
-        os.rename(path, path + "_old")
-        partSection = False
-
-        for line in lines:
-            inLine = line.rstrip()
-            outLine = inLine
-            if "(symbol (lib_id" in inLine:  # skip library section
-                partSection = True
-            m = propRx.search(inLine)
-            if m and partSection:
-                key = m.group(1)
-                value = m.group(2)
-
-                # found a LCSC property, so update it if needed
-                if key == "LCSC":
-                    lastLcsc = value
-                    if lastLcsc != newLcsc and newLcsc != "":
-                        self.logger.info(f"Updating {newLcsc} on {lastRef}")
-                        outLine = outLine.replace(
-                            '"' + lastLcsc + '"', '"' + newLcsc + '"'
-                        )
-                        lastLcsc = newLcsc
-
-                if key == "Reference":
-                    lastLoc = m.group(3)
-                    lastRef = value
-                    for part in store_parts:
-                        if value == part[0]:
-                            newLcsc = part[3]
-                            break
-            # if we hit the pin section without finding a LCSC property, add it
-            m = pinRx.search(inLine)
-            if m:
-                if lastLcsc == "" and newLcsc != "" and lastLoc != "":
-                    self.logger.info(f"added {newLcsc} to {lastRef}")
-                    newTxt = '    (property "LCSC" "{}" (at {} 0)'.format(
-                        newLcsc, lastLoc
-                    )
-                    newlines.append(newTxt)
-                    newlines.append("      (effects (font (size 1.27 1.27)) hide)")
-                    newlines.append("    )")
-                lastLoc = ""
-                lastLcsc = ""
-                newLcsc = ""
-                lastRef = ""
-            newlines.append(outLine)
-
-        f = open(path, "w")
-        for line in newlines:
-            f.write(line + "\n")
-        f.close()
-        self.logger.info(f"Added LCSC's to {path}(maybe?)")
+        return results
+
+    def load_cache(self, cache_file):
+        """Load the content hashes and LCSC values of the last export."""
+        try:
+            with open(cache_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_cache(self, cache_file, cache):
+        """Persist the content hashes and LCSC values of this export."""
+        with open(cache_file, "w") as f:
+            json.dump(cache, f)
+
+    def _export_sheet(self, path, mpns, cached):
+        """Update a single sheet unless its cached state shows nothing changed, runs on a worker."""
+        start = time.perf_counter()
+        result = SheetResult(path)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            digest = hashlib.sha1(data).hexdigest()
+            if (
+                cached
+                and cached.get("hash") == digest
+                and all(
+                    not mpns.get(ref) or mpns[ref] == lcsc
+                    for ref, lcsc in cached.get("lcsc", {}).items()
+                )
+            ):
+                result.skipped = True
+                result.digest = digest
+                result.lcsc = cached["lcsc"]
+            else:
+                self._update_schematic(path, data.decode("utf-8"), mpns, result)
+        except Exception as e:
+            result.error = e
+        result.duration = time.perf_counter() - start
+        return result
+
+    def _update_schematic(self, path, text, mpns, result):
+        """Set the LCSC property of every placed symbol in a single pass over the file.
+
+        KiCad V6 property lists carry an (id n) child, V7 dropped it; new
+        properties follow whatever the Reference property of the symbol uses,
+        and the line endings of the sheet. The result is written to a temporary file which atomically replaces the
+        schematic, the previous version is kept as <path>_old.
+        """
+        tmp = f"{path}.tmp"
+        first = text.find("\n")
+        newline = "\r\n" if first > 0 and text[first - 1] == "\r" else "\n"
+        written = 0
+        stack = []
+        digest = hashlib.sha1()
+        with open(tmp, "w", encoding="utf-8", newline="") as out:
+
+            def write(piece):
+                out.write(piece)
+                digest.update(piece.encode("utf-8"))
+
+            for m in TOKEN.finditer(text):
+                token = m.group()
+                if token == "(":
+                    stack.append(Node(m.start()))
+                    continue
+                if not stack:
+                    continue
+                node = stack[-1]
+                if token != ")":
+                    if node.head is None:
+                        node.head = token
+                    else:
+                        node.atoms.append((token, m.start(), m.end()))
+                    continue
+                stack.pop()
+                node.end = m.end()
+                if not stack:
+                    continue
+                parent = stack[-1]
+                parent.children.setdefault(node.head, node)
+                if node.head == "property":
+                    parent.properties.append(node)
+                elif (
+                    node.head == "symbol"
+                    and parent.head == "kicad_sch"
+                    and "lib_id" in node.children
+                ):
+                    # a placed symbol, the symbols in lib_symbols are one level deeper
+                    for start, end, replacement in self._symbol_edits(
+                        text, node, mpns, result.lcsc, newline
+                    ):
+                        write(text[written:start])
+                        write(replacement)
+                        written = end
+                        result.changes += 1
+            write(text[written:])
+        result.digest = digest.hexdigest()
+        if not result.changes:
+            os.remove(tmp)
+            return
+        shutil.copy2(path, f"{path}_old")
+        os.replace(tmp, path)
+
+    def _symbol_edits(self, text, symbol, mpns, lcsc_values, newline="\n"):
+        """Get the (start, end, replacement) edits of a placed symbol, record its final LCSC value."""
+        properties = {}
+        for prop in symbol.properties:
+            if len(prop.atoms) >= 2:
+                properties.setdefault(prop.atoms[0][0][1:-1], prop)
+        reference = properties.get("Reference")
+        if not reference:
+            return []
+        ref = reference.atoms[1][0][1:-1]
+        lcsc = properties.get("LCSC")
+        lcsc_values[ref] = lcsc.atoms[1][0][1:-1] if lcsc else ""
+        mpn = mpns.get(ref)
+        if not mpn:
+            return []
+        lcsc_values[ref] = mpn
+        if lcsc:
+            value, start, end = lcsc.atoms[1]
+            if value[1:-1] == mpn:
+                return []
+            self.logger.info(f"Updating {mpn} on {ref}")
+            return [(start, end, quote(mpn))]
+        # add the property after the last one, with the location of the reference
+        last = symbol.properties[-1]
+        indent = text[text.rfind("\n", 0, last.start) + 1 : last.start]
+        if indent.strip():
+            indent = ""
+        at = reference.children.get("at")
+        location = " ".join(a[0] for a in at.atoms[:2]) if at else "0 0"
+        if "id" in reference.children:
+            ids = [
+                int(p.children["id"].atoms[0][0])
+                for p in symbol.properties
+                if "id" in p.children and p.children["id"].atoms
+            ]
+            prop = f"(property \"LCSC\" {quote(mpn)} (id {max(ids) + 1}) (at {location} 0)"
+        else:
+            prop = f"(property \"LCSC\" {quote(mpn)} (at {location} 0)"
+        self.logger.info(f"added {mpn} to {ref}")
+        return [
+            (
+                last.end,
+                last.end,
+                f"{newline}{indent}{prop}{newline}{indent}  (effects (font (size 1.27 1.27)) hide)"
+                f"{newline}{indent})",
+            )
+        ]
@@ -0,0 +1,59 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+MAX_PAGES = 50
+# search results are only reused for a short time, stock numbers change
+TTL = 300
+
+
+def normalize_keyword(keyword):
+    """Normalize a search keyword, case and extra whitespace do not change the results."""
+    return " ".join(keyword.lower().split())
+
+
+class SearchCache:
+    """Least recently used cache of search result pages with a short TTL.
+
+    Entries are keyed by the normalized request body, so the same query on the
+    same page is served from memory no matter how it was typed.
+    """
+
+    def __init__(self, max_pages=MAX_PAGES, ttl=TTL):
+        self.max_pages = max_pages
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.pages = OrderedDict()
+
+    @staticmethod
+    def key(body):
+        """Get the cache key of a request body."""
+        body = dict(body, keyword=normalize_keyword(body.get("keyword", "")))
+        return json.dumps(body, sort_keys=True, ensure_ascii=False)
+
+    def get(self, body):
+        """Get the cached result of a request body or None."""
+        key = self.key(body)
+        with self.lock:
+            entry = self.pages.get(key)
+            if entry is None:
+                return None
+            stored, result = entry
+            if time.monotonic() - stored > self.ttl:
+                del self.pages[key]
+                return None
+            self.pages.move_to_end(key)
+            return result
+
+    def put(self, body, result):
+        """Store a result, evict the least recently used ones beyond the limit."""
+        key = self.key(body)
+        with self.lock:
+            self.pages[key] = (time.monotonic(), result)
+            self.pages.move_to_end(key)
+            while len(self.pages) > self.max_pages:
+                self.pages.popitem(last=False)
+
+    def __contains__(self, body):
+        return self.get(body) is not None
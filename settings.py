@@ -2,8 +2,10 @@ import logging
 
 import wx
 
+from .diagnostics import DiagnosticsDialog
 from .events import UpdateSetting
 from .helpers import HighResWxSize, loadBitmapScaled
+from .ziparchive import DEFAULT_COMPRESSION_LEVEL
 
 
 class SettingsDialog(wx.Dialog):
@@ -164,6 +166,115 @@ class SettingsDialog(wx.Dialog):
             self.plot_references_setting, 100, wx.ALL | wx.EXPAND, 5
         )
 
+        ##### ZIP compression level #####
+
+        self.zip_compression_level_label = wx.StaticText(
+            self,
+            wx.ID_ANY,
+            "ZIP compression level",
+            wx.DefaultPosition,
+            wx.DefaultSize,
+            0,
+        )
+
+        self.zip_compression_level_setting = wx.SpinCtrl(
+            self,
+            id=wx.ID_ANY,
+            value="",
+            pos=wx.DefaultPosition,
+            size=wx.DefaultSize,
+            style=wx.SP_ARROW_KEYS,
+            min=0,
+            max=9,
+            initial=DEFAULT_COMPRESSION_LEVEL,
+            name="gerber_zip_compression_level",
+        )
+
+        self.zip_compression_level_setting.SetToolTip(
+            wx.ToolTip(
+                "Deflate level of the Gerber archive, 0 is fastest, 9 gives the smallest upload"
+            )
+        )
+
+        self.zip_compression_level_setting.Bind(wx.EVT_SPINCTRL, self.update_settings)
+
+        zip_compression_level_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        zip_compression_level_sizer.Add(
+            self.zip_compression_level_label, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5
+        )
+        zip_compression_level_sizer.Add(
+            self.zip_compression_level_setting, 0, wx.ALL, 5
+        )
+
+        ##### Prefetch part details #####
+
+        self.prefetch_details_setting = wx.CheckBox(
+            self,
+            id=wx.ID_ANY,
+            label="Prefetch part details",
+            pos=wx.DefaultPosition,
+            size=wx.DefaultSize,
+            style=0,
+            name="partselector_prefetch_details",
+        )
+
+        self.prefetch_details_setting.SetToolTip(
+            wx.ToolTip(
+                "Whether details and pictures of the top search results are downloaded in the background"
+            )
+        )
+
+        self.prefetch_details_setting.Bind(wx.EVT_CHECKBOX, self.update_settings)
+
+        prefetch_details_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        prefetch_details_sizer.Add(self.prefetch_details_setting, 100, wx.ALL | wx.EXPAND, 5)
+
+        ##### Performance log #####
+
+        self.perf_log_setting = wx.CheckBox(
+            self,
+            id=wx.ID_ANY,
+            label="Performance log",
+            pos=wx.DefaultPosition,
+            size=wx.DefaultSize,
+            style=0,
+            name="diagnostics_perf_log",
+        )
+
+        self.perf_log_setting.SetToolTip(
+            wx.ToolTip(
+                "Whether the duration of searches, syncs, list refreshes, downloads, matches and exports is written to nextpcb/perf.log of the project"
+            )
+        )
+
+        self.perf_log_setting.Bind(wx.EVT_CHECKBOX, self.update_settings)
+
+        self.diagnostics_button = wx.Button(self, wx.ID_ANY, "Diagnostics...")
+        self.diagnostics_button.Bind(wx.EVT_BUTTON, self.show_diagnostics)
+
+        self.profile_setting = wx.CheckBox(
+            self,
+            id=wx.ID_ANY,
+            label="Profile actions",
+            pos=wx.DefaultPosition,
+            size=wx.DefaultSize,
+            style=0,
+            name="diagnostics_profile",
+        )
+
+        self.profile_setting.SetToolTip(
+            wx.ToolTip(
+                "Whether every action is profiled into nextpcb/profiles of the project, this slows the plugin down"
+            )
+        )
+
+        self.profile_setting.Bind(wx.EVT_CHECKBOX, self.update_settings)
+
+        perf_log_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        perf_log_sizer.Add(self.perf_log_setting, 100, wx.ALL | wx.EXPAND, 5)
+        perf_log_sizer.Add(self.profile_setting, 100, wx.ALL | wx.EXPAND, 5)
+        perf_log_sizer.Add(self.diagnostics_button, 0, wx.ALL, 5)
+
         ##### LCSC priority #####
 
         self.lcsc_priority_setting = wx.CheckBox(
@@ -207,6 +318,9 @@ class SettingsDialog(wx.Dialog):
         layout.Add(plot_values_sizer, 0, wx.ALL | wx.EXPAND, 5)
         layout.Add(plot_references_sizer, 0, wx.ALL | wx.EXPAND, 5)
         layout.Add(lcsc_priority_sizer, 0, wx.ALL | wx.EXPAND, 5)
+        layout.Add(zip_compression_level_sizer, 0, wx.ALL | wx.EXPAND, 5)
+        layout.Add(prefetch_details_sizer, 0, wx.ALL | wx.EXPAND, 5)
+        layout.Add(perf_log_sizer, 0, wx.ALL | wx.EXPAND, 5)
         self.SetSizer(layout)
         self.Layout()
         self.Centre(wx.BOTH)
@@ -300,6 +414,26 @@ class SettingsDialog(wx.Dialog):
                 )
             )
 
+    def update_zip_compression_level(self, level):
+        """Update settings dialog according to the settings."""
+        self.zip_compression_level_setting.SetValue(level)
+
+    def update_prefetch_details(self, prefetch):
+        """Update settings dialog according to the settings."""
+        self.prefetch_details_setting.SetValue(prefetch)
+
+    def update_perf_log(self, enabled):
+        """Update settings dialog according to the settings."""
+        self.perf_log_setting.SetValue(enabled)
+
+    def update_profile(self, enabled):
+        """Update settings dialog according to the settings."""
+        self.profile_setting.SetValue(enabled)
+
+    def show_diagnostics(self, e=None):
+        """Show the recorded timings and counters."""
+        DiagnosticsDialog(self.parent, self.parent.perf_log_file).ShowModal()
+
     def load_settings(self):
         """Load settings and set checkboxes accordingly"""
         self.update_tented_vias(
@@ -317,6 +451,20 @@ class SettingsDialog(wx.Dialog):
         self.update_lcsc_priority(
             self.parent.settings.get("general", {}).get("lcsc_priority", True)
         )
+        self.update_zip_compression_level(
+            self.parent.settings.get("gerber", {}).get(
+                "zip_compression_level", DEFAULT_COMPRESSION_LEVEL
+            )
+        )
+        self.update_prefetch_details(
+            self.parent.settings.get("partselector", {}).get("prefetch_details", True)
+        )
+        self.update_perf_log(
+            self.parent.settings.get("diagnostics", {}).get("perf_log", False)
+        )
+        self.update_profile(
+            self.parent.settings.get("diagnostics", {}).get("profile", False)
+        )
 
     def update_settings(self, event):
         """Update and persist a setting that was changed."""
@@ -2,7 +2,7 @@ import contextlib
 import csv
 import logging
 import os
-import sqlite3
+import threading
 from pathlib import Path
 
 from pcbnew import GetBoard
@@ -13,13 +13,154 @@ from .helpers import (
     get_lcsc_value,
     get_valid_footprints,
     natural_sort_collation,
+    natural_sort_key,
 )
+from .perf import connect, monitor
+
+# column positions of a part row as returned by `SELECT * FROM part_info`
+REFERENCE, VALUE, FOOTPRINT, MPN, MANUFACTURER, DESCRIPTION = range(6)
+BOMCHECK, POSCHECK, ROTATION, SIDE, STOCKID = range(6, 11)
+
+
+class PartGroup:
+    """All parts that share value, footprint, mpn and manufacturer.
+
+    The BOM/POS flags and the side are kept as counters so that adding or
+    removing a single member never requires to look at the other members.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.members = {}
+        self.bom_excluded = 0
+        self.pos_excluded = 0
+        self.sides = {}
+
+    def add(self, part):
+        """Add a part row to the group."""
+        self.members[part[REFERENCE]] = part
+        self.bom_excluded += not int(part[BOMCHECK])
+        self.pos_excluded += not int(part[POSCHECK])
+        if part[SIDE]:
+            self.sides[part[SIDE]] = self.sides.get(part[SIDE], 0) + 1
+
+    def remove(self, ref):
+        """Remove a part from the group by its reference."""
+        part = self.members.pop(ref)
+        self.bom_excluded -= not int(part[BOMCHECK])
+        self.pos_excluded -= not int(part[POSCHECK])
+        if part[SIDE]:
+            self.sides[part[SIDE]] -= 1
+            if not self.sides[part[SIDE]]:
+                del self.sides[part[SIDE]]
+        return part
+
+    @property
+    def references(self):
+        """The references of all members in natural order."""
+        return sorted(self.members, key=natural_sort_key)
+
+    @property
+    def side(self):
+        """The side of the group, T/B if parts are on both sides."""
+        if "top" in self.sides and "bottom" in self.sides:
+            return "T/B"
+        return next(iter(self.sides), "")
+
+    def as_row(self):
+        """Return the group in the same layout as a single part row."""
+        refs = self.references
+        first = self.members[refs[0]]
+        return [
+            ",".join(refs),
+            first[VALUE],
+            first[FOOTPRINT],
+            first[MPN],
+            first[MANUFACTURER],
+            first[DESCRIPTION],
+            int(not self.bom_excluded),
+            int(not self.pos_excluded),
+            first[ROTATION] if len(refs) == 1 else "",
+            self.side,
+        ]
+
+
+class GroupIndex:
+    """In-memory index of the parts grouped by value, footprint, mpn and manufacturer.
+
+    The index is built once from the database and then kept up to date by the
+    Store whenever a single part changes.
+    """
+
+    def __init__(self, parts):
+        self.lock = threading.RLock()
+        self.groups = {}
+        self.keys = {}
+        for part in parts:
+            self.put(part)
+
+    @staticmethod
+    def group_key(part):
+        """Build the grouping key of a part row."""
+        return (
+            part[VALUE],
+            part[FOOTPRINT],
+            part[MPN] or "",
+            part[MANUFACTURER] or "",
+        )
+
+    def put(self, part):
+        """Insert or replace a part row."""
+        part = list(part)
+        with self.lock:
+            self.discard(part[REFERENCE])
+            key = self.group_key(part)
+            group = self.groups.get(key)
+            if group is None:
+                group = self.groups[key] = PartGroup(key)
+            group.add(part)
+            self.keys[part[REFERENCE]] = key
+
+    def discard(self, ref):
+        """Remove a part by its reference if it is indexed."""
+        with self.lock:
+            key = self.keys.pop(ref, None)
+            if key is None:
+                return None
+            group = self.groups[key]
+            part = group.remove(ref)
+            if not group.members:
+                del self.groups[key]
+            return part
+
+    def update(self, ref, column, value):
+        """Change a single column of an indexed part."""
+        with self.lock:
+            part = self.discard(ref)
+            if part is None:
+                return
+            part[column] = value
+            self.put(part)
+
+    def retain(self, refs):
+        """Drop all parts whose reference is not in refs."""
+        with self.lock:
+            for ref in [r for r in self.keys if r not in refs]:
+                self.discard(ref)
+
+    def sorted_groups(self):
+        """Return all groups ordered by their key."""
+        with self.lock:
+            return sorted(
+                self.groups.values(),
+                key=lambda g: [natural_sort_key(str(k)) for k in g.key],
+            )
 
 
 class Store:
     """A storage class to get data from a sqlite database and write it back"""
 
-    def __init__(self, parent, project_path):
+    def __init__(self, parent, project_path, board_parts=None):
         self.logger = logging.getLogger(__name__)
         self.parent = parent
         self.project_path = project_path
@@ -27,8 +168,9 @@ class Store:
         self.dbfile = os.path.join(self.datadir, "project.db")
         self.order_by = "reference"
         self.order_dir = "ASC"
+        self._group_index = None
         self.setup()
-        self.update_from_board()
+        self.update_from_board(board_parts)
 
     def setup(self):
         """Check if folders and database exist, setup if not"""
@@ -66,7 +208,7 @@ class Store:
 
     def create_db(self):
         """Create the sqlite database tables."""
-        with contextlib.closing(sqlite3.connect(self.dbfile)) as con:
+        with contextlib.closing(connect(self.dbfile)) as con:
             with con as cur:
                 cur.execute(
                     "CREATE TABLE IF NOT EXISTS part_info ("
@@ -87,7 +229,7 @@ class Store:
 
     def read_all(self):
         """Read all parts from the database."""
-        with contextlib.closing(sqlite3.connect(self.dbfile)) as con:
+        with contextlib.closing(connect(self.dbfile)) as con:
             con.create_collation("naturalsort", natural_sort_collation)
             with con as cur:
                 return [
@@ -98,51 +240,90 @@ class Store:
                     ).fetchall()
                 ]
 
-    def read_parts_by_group_value_footprint(self):
-        """"""
-        with contextlib.closing(sqlite3.connect(self.dbfile)) as con:
-            with con as cur:
-                # Query all parts that are supposed to be in the BOM an have an mpn number, group the references together
-                #subquery = "SELECT value, reference, footprint, mpn FROM part_info WHERE bomcheck = '0' AND mpn != '' ORDER BY mpn, reference"
-                query = "SELECT GROUP_CONCAT(reference), value, footprint, mpn, manufacturer, \
-                GROUP_CONCAT(description), GROUP_CONCAT(bomcheck), GROUP_CONCAT(poscheck), GROUP_CONCAT(rotation), \
-                GROUP_CONCAT(side) FROM part_info GROUP BY value, footprint, mpn, manufacturer"
-                a = [list(part) for part in cur.execute(query).fetchall()]
+    @property
+    def group_index(self):
+        """The group index, built from the database on first use."""
+        if self._group_index is None:
+            with contextlib.closing(connect(self.dbfile)) as con:
+                with con as cur:
+                    parts = cur.execute("SELECT * FROM part_info").fetchall()
+            self._group_index = GroupIndex(parts)
+        return self._group_index
 
-                return a
+    def reindex_part(self, ref):
+        """Refresh a single part in the group index from the database."""
+        if self._group_index is None:
+            return
+        part = self.get_part(ref)
+        if part:
+            self._group_index.put(part)
+        else:
+            self._group_index.discard(ref)
+
+    def update_index(self, ref, column, value):
+        """Apply a single column change to the group index if it is built."""
+        if self._group_index is not None:
+            self._group_index.update(ref, column, value)
+
+    def read_parts_by_group_value_footprint(self):
+        """Read all parts grouped by value, footprint, mpn and manufacturer."""
+        return [group.as_row() for group in self.group_index.sorted_groups()]
 
     def read_bom_parts(self):
         """Read all parts that should be included in the BOM."""
-        with contextlib.closing(sqlite3.connect(self.dbfile)) as con:
-            with con as cur:
-                # Query all parts that are supposed to be in the BOM an have an mpn number, group the references together
-                subquery = "SELECT value, reference, footprint, mpn FROM part_info WHERE bomcheck = 1 AND mpn != '' ORDER BY mpn, reference"
-                query = f"SELECT value, GROUP_CONCAT(reference) AS refs, footprint, mpn  FROM ({subquery}) GROUP BY mpn"
-                a = [list(part) for part in cur.execute(query).fetchall()]
-                # Query all parts that are supposed to be in the BOM but have no mpn number
-                query = "SELECT value, reference, footprint, mpn FROM part_info WHERE bomcheck = 1 AND mpn = ''"
-                b = [list(part) for part in cur.execute(query).fetchall()]
-                return a + b
+        # parts with an mpn number are grouped together by it, parts without are listed one by one
+        by_mpn = {}
+        without_mpn = []
+        group_index = self.group_index
+        # this runs on the fabrication thread, the UI thread may change the index meanwhile
+        with group_index.lock:
+            for group in group_index.sorted_groups():
+                for ref in group.references:
+                    part = group.members[ref]
+                    if not int(part[BOMCHECK]):
+                        continue
+                    if not part[MPN]:
+                        without_mpn.append([part[VALUE], ref, part[FOOTPRINT], ""])
+                    elif part[MPN] in by_mpn:
+                        by_mpn[part[MPN]][1].append(ref)
+                    else:
+                        by_mpn[part[MPN]] = [part[VALUE], [ref], part[FOOTPRINT], part[MPN]]
+        bom = []
+        for mpn in sorted(by_mpn):
+            value, refs, footprint, _ = by_mpn[mpn]
+            bom.append([value, ",".join(sorted(refs, key=natural_sort_key)), footprint, mpn])
+        return bom + without_mpn
 
     def read_pos_parts(self):
         """Read all parts that should be included in the POS."""
-        with contextlib.closing(sqlite3.connect(self.dbfile)) as con:
+        with contextlib.closing(connect(self.dbfile)) as con:
             con.create_collation("naturalsort", natural_sort_collation)
             with con as cur:
                 # Query all parts that are supposed to be in the POS
                 query = "SELECT reference, value, footprint FROM part_info WHERE poscheck = 1 ORDER BY reference COLLATE naturalsort ASC"
                 return [list(part) for part in cur.execute(query).fetchall()]
 
+    def read_mpns(self):
+        """Read a reference to mpn mapping of all parts that have a mpn assigned."""
+        with contextlib.closing(connect(self.dbfile)) as con:
+            with con as cur:
+                return dict(
+                    cur.execute(
+                        "SELECT reference, mpn FROM part_info WHERE mpn != ''"
+                    ).fetchall()
+                )
+
     def create_part(self, part):
         """Create a part in the database."""
-        with contextlib.closing(sqlite3.connect(self.dbfile)) as con:
+        with contextlib.closing(connect(self.dbfile)) as con:
             with con as cur:
                 cur.execute("INSERT INTO part_info VALUES (?,?,?,?,'','',?,?,'','',0)", part)
                 cur.commit()
+        self.reindex_part(part[0])
 
     def update_part(self, part):
         """Update a part in the database, overwrite mpn if supplied."""
-        with contextlib.closing(sqlite3.connect(self.dbfile)) as con:
+        with contextlib.closing(connect(self.dbfile)) as con:
             with con as cur:
                 if len(part) == 6:
                     cur.execute(
@@ -157,10 +338,11 @@ class Store:
                     )
 
                 cur.commit()
+        self.reindex_part(part[0])
 
     def get_part(self, ref):
         """Get a part from the database by its reference."""
-        with contextlib.closing(sqlite3.connect(self.dbfile)) as con:
+        with contextlib.closing(connect(self.dbfile)) as con:
             with con as cur:
                 return cur.execute(
                     "SELECT * FROM part_info WHERE reference=?", (ref,)
@@ -168,14 +350,16 @@ class Store:
 
     def delete_part(self, ref):
         """Delete a part from the database by its reference."""
-        with contextlib.closing(sqlite3.connect(self.dbfile)) as con:
+        with contextlib.closing(connect(self.dbfile)) as con:
             with con as cur:
                 cur.execute("DELETE FROM part_info WHERE reference=?", (ref,))
                 cur.commit()
+        if self._group_index is not None:
+            self._group_index.discard(ref)
 
     # def set_stock(self, ref, stock):
         # """Set the stock value for a part in the database."""
-        # with contextlib.closing(sqlite3.connect(self.dbfile)) as con:
+        # with contextlib.closing(connect(self.dbfile)) as con:
             # with con as cur:
                 # cur.execute(
                     # f"UPDATE part_info SET stock = {int(stock)} WHERE reference = '{ref}'"
@@ -184,80 +368,87 @@ class Store:
 
     def set_bom(self, ref, state):
         """Change the BOM attribute for a part in the database."""
-        with contextlib.closing(sqlite3.connect(self.dbfile)) as con:
+        with contextlib.closing(connect(self.dbfile)) as con:
             with con as cur:
                 cur.execute(
                     f"UPDATE part_info SET bomcheck = {int(state)} WHERE reference = '{ref}'"
                 )
                 cur.commit()
+        self.update_index(ref, BOMCHECK, int(state))
 
     def set_pos(self, ref, state):
         """Change the BOM attribute for a part in the database."""
-        with contextlib.closing(sqlite3.connect(self.dbfile)) as con:
+        with contextlib.closing(connect(self.dbfile)) as con:
             with con as cur:
                 cur.execute(
                     f"UPDATE part_info SET poscheck = {int(state)} WHERE reference = '{ref}'"
                 )
                 cur.commit()
+        self.update_index(ref, POSCHECK, int(state))
 
     def set_lcsc(self, ref, value):
         """Change the BOM attribute for a part in the database."""
-        with contextlib.closing(sqlite3.connect(self.dbfile)) as con:
+        with contextlib.closing(connect(self.dbfile)) as con:
             with con as cur:
                 cur.execute(
                     f"UPDATE part_info SET mpn = '{value}' WHERE reference = '{ref}'"
                 )
                 cur.commit()
+        self.update_index(ref, MPN, value)
 
     def set_part_side(self, ref, value):
         """Change the BOM attribute for a part in the database."""
-        with contextlib.closing(sqlite3.connect(self.dbfile)) as con:
+        with contextlib.closing(connect(self.dbfile)) as con:
             with con as cur:
                 cur.execute(
                     f"UPDATE part_info SET side = '{value}' WHERE reference = '{ref}'"
                 )
                 cur.commit()
+        self.update_index(ref, SIDE, value)
 
     def set_manufacturer(self, ref, value):
         """Change the BOM attribute for a part in the database."""
-        with contextlib.closing(sqlite3.connect(self.dbfile)) as con:
+        with contextlib.closing(connect(self.dbfile)) as con:
             with con as cur:
                 cur.execute(
                     f"UPDATE part_info SET manufacturer = '{value}' WHERE reference = '{ref}'"
                 )
                 cur.commit()
+        self.update_index(ref, MANUFACTURER, value)
     
     def set_description(self, ref, value):
         """Change the BOM attribute for a part in the database."""
-        with contextlib.closing(sqlite3.connect(self.dbfile)) as con:
+        with contextlib.closing(connect(self.dbfile)) as con:
             with con as cur:
                 cur.execute(
                     f"UPDATE part_info SET description = '{value}' WHERE reference = '{ref}'"
                 )
                 cur.commit()
+        self.update_index(ref, DESCRIPTION, value)
 
     def set_stock_id(self, ref, value):
         """Change the BOM attribute for a part in the database."""
-        with contextlib.closing(sqlite3.connect(self.dbfile)) as con:
+        with contextlib.closing(connect(self.dbfile)) as con:
             with con as cur:
                 cur.execute(
                     f"UPDATE part_info SET stockid = {int(value)} WHERE reference = '{ref}'"
                 )
                 cur.commit()
+        self.update_index(ref, STOCKID, int(value))
 
     def get_stock_id(self, ref):
         """Get a part from the database by its reference."""
-        with contextlib.closing(sqlite3.connect(self.dbfile)) as con:
+        with contextlib.closing(connect(self.dbfile)) as con:
             with con as cur:
                 return cur.execute(
                     f"SELECT stockid FROM part_info WHERE reference = '{ref}'"
                 ).fetchone()[0]
 
-    def update_from_board(self):
-        """Read all footprints from the board and insert them into the database if they do not exist."""
-        board = GetBoard()
-        for fp in get_valid_footprints(board):
-            part = [
+    @staticmethod
+    def read_board():
+        """Read the part rows of all footprints from the board, this has to run on the UI thread."""
+        return [
+            [
                 fp.GetReference(),
                 fp.GetValue(),
                 str(fp.GetFPID().GetLibItemName()),
@@ -265,6 +456,20 @@ class Store:
                 int(not get_exclude_from_bom(fp)),
                 int(not get_exclude_from_pos(fp))
             ]
+            for fp in get_valid_footprints(GetBoard())
+        ]
+
+    @monitor.timed("store sync")
+    def update_from_board(self, board_parts=None):
+        """Insert or update the footprints of the board in the database.
+
+        The board is read here unless the rows of read_board() are passed in,
+        which lets the database work run on a worker thread.
+        """
+        if board_parts is None:
+            board_parts = self.read_board()
+        for part in board_parts:
+            part = list(part)
             dbpart = self.get_part(part[0])
             # if part is not in the database yet, create it
             if not dbpart:
@@ -306,17 +511,21 @@ class Store:
                     )
                     self.update_part(part)
         #self.import_legacy_assignments()
-        self.clean_database()
+        self.clean_database([part[0] for part in board_parts])
 
-    def clean_database(self):
+    def clean_database(self, references=None):
         """Delete all parts from the database that are no longer present on the board."""
-        refs = [f"'{fp.GetReference()}'" for fp in get_valid_footprints(GetBoard())]
-        with contextlib.closing(sqlite3.connect(self.dbfile)) as con:
+        if references is None:
+            references = [fp.GetReference() for fp in get_valid_footprints(GetBoard())]
+        refs = [f"'{ref}'" for ref in references]
+        with contextlib.closing(connect(self.dbfile)) as con:
             with con as cur:
                 cur.execute(
                     f"DELETE FROM part_info WHERE reference NOT IN ({','.join(refs)})"
                 )
                 cur.commit()
+        if self._group_index is not None:
+            self._group_index.retain({ref.strip("'") for ref in refs})
 
     def import_legacy_assignments(self):
         """Check if assignments of an old version are found and merge them into the database."""
@@ -4,7 +4,7 @@ import os
 from zipfile import ZipFile
 
 
-def unzip_parts(path):
+def unzip_parts(path, destination=None):
     # unzip (needs to go into download function finally)
     # Set the name of the original file
     db_zip_file = os.path.join(path, "parts.db.zip")
@@ -32,6 +32,6 @@ def unzip_parts(path):
             os.unlink(split_path)
 
     with ZipFile(db_zip_file, "r") as zf:
-        zf.extractall(path)
+        zf.extractall(destination or path)
 
     os.unlink(db_zip_file)
@@ -0,0 +1,88 @@
+import os
+import uuid
+
+import requests
+
+from .apiclient import client
+
+CHUNK_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    """Raised when an upload failed after all retries."""
+
+
+class MultipartBody:
+    """A multipart/form-data body that streams the file from disk.
+
+    The body is iterated in chunks, so the file never has to be loaded into
+    memory. The total length is known up front, which lets requests send a
+    Content-Length header instead of a chunked transfer encoding. Every
+    iteration reopens the file, so the same body can be sent again on retry.
+    """
+
+    def __init__(self, fields, file_field, path, progress=None):
+        self.boundary = uuid.uuid4().hex
+        self.path = path
+        self.progress = progress
+        lines = []
+        for name, value in fields.items():
+            lines.append(
+                f"--{self.boundary}\r\n"
+                f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+                f"{value}\r\n"
+            )
+        lines.append(
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{file_field}"; '
+            f'filename="{os.path.basename(path)}"\r\n'
+            "Content-Type: application/octet-stream\r\n\r\n"
+        )
+        self.head = "".join(lines).encode("utf-8")
+        self.tail = f"\r\n--{self.boundary}--\r\n".encode("utf-8")
+        self.length = len(self.head) + os.path.getsize(path) + len(self.tail)
+
+    @property
+    def content_type(self):
+        """The Content-Type header value for this body."""
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        sent = len(self.head)
+        yield self.head
+        with open(self.path, "rb") as f:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                sent += len(chunk)
+                if self.progress:
+                    self.progress(sent, self.length)
+                yield chunk
+        yield self.tail
+        if self.progress:
+            self.progress(self.length, self.length)
+
+
+def upload_file(url, path, fields=None, file_field="file", progress=None, retries=3):
+    """Upload a file as multipart/form-data.
+
+    The API client only sends it again if it did not reach the server or the
+    server answered 429 or 503, so a read timeout does not upload it twice.
+    """
+    body = MultipartBody(fields or {}, file_field, path, progress)
+    try:
+        rsp = client.post(
+            url,
+            data=body,
+            headers={"Content-Type": body.content_type},
+            timeout=(10, 300),
+            retries=retries,
+        )
+        rsp.raise_for_status()
+    except requests.RequestException as e:
+        raise UploadError(f"Upload of {os.path.basename(path)} failed: {e}")
+    return rsp
@@ -0,0 +1,135 @@
+import logging
+import os
+import struct
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from zipfile import ZIP_DEFLATED, ZipFile
+
+DEFAULT_COMPRESSION_LEVEL = 6
+
+# members and archives beyond these limits need zip64 records
+ZIP32_LIMIT = 0xFFFFFFFF
+ZIP32_MAX_MEMBERS = 0xFFFF
+
+LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+END_OF_CENTRAL_DIRECTORY = struct.Struct("<IHHHHIIH")
+
+
+class Member:
+    """A deflated archive member, ready to be written."""
+
+    def __init__(self, name, data, crc, size, date_time):
+        self.name = name
+        self.data = data
+        self.crc = crc
+        self.size = size
+        self.date_time = date_time
+
+    @property
+    def dos_time(self):
+        """Modification time in MS-DOS format."""
+        return self.date_time[3] << 11 | self.date_time[4] << 5 | self.date_time[5] // 2
+
+    @property
+    def dos_date(self):
+        """Modification date in MS-DOS format."""
+        return (self.date_time[0] - 1980) << 9 | self.date_time[1] << 5 | self.date_time[2]
+
+
+def deflate_file(path, name, level):
+    """Read and deflate a single file, zlib releases the GIL so this runs in parallel."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    date_time = time.localtime(os.path.getmtime(path))[:6]
+    if date_time[0] < 1980:
+        date_time = (1980, 1, 1, 0, 0, 0)
+    # negative wbits produce a raw deflate stream without zlib header, as zip expects
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    data = compressor.compress(raw) + compressor.flush()
+    return Member(name, data, zlib.crc32(raw), len(raw), date_time)
+
+
+def write_zip(path, files, level=DEFAULT_COMPRESSION_LEVEL, max_workers=None):
+    """Write files, a list of (path, archive name) pairs, into a deflated zip archive.
+
+    The members are compressed concurrently on a thread pool and the archive
+    is assembled from the precompressed data afterwards.
+    """
+    logger = logging.getLogger(__name__)
+    level = max(0, min(9, int(level)))
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        members = list(pool.map(lambda f: deflate_file(f[0], f[1], level), files))
+    total = sum(len(m.data) + LOCAL_HEADER.size + len(m.name.encode()) for m in members)
+    if (
+        len(members) > ZIP32_MAX_MEMBERS
+        or total > ZIP32_LIMIT
+        or any(m.size > ZIP32_LIMIT for m in members)
+    ):
+        logger.debug("Archive needs zip64 records, fall back to zipfile")
+        with ZipFile(path, "w", ZIP_DEFLATED, compresslevel=level) as zipfile:
+            for filepath, name in files:
+                zipfile.write(filepath, name)
+        return
+    central_directory = []
+    offset = 0
+    with open(path, "wb") as f:
+        for m in members:
+            name = m.name.encode("utf-8")
+            # bit 11 marks the file name as UTF-8
+            flags = 0x800 if not name.isascii() else 0
+            f.write(
+                LOCAL_HEADER.pack(
+                    0x04034B50,
+                    20,
+                    flags,
+                    8,
+                    m.dos_time,
+                    m.dos_date,
+                    m.crc,
+                    len(m.data),
+                    m.size,
+                    len(name),
+                    0,
+                )
+            )
+            f.write(name)
+            f.write(m.data)
+            central_directory.append(
+                CENTRAL_HEADER.pack(
+                    0x02014B50,
+                    20,
+                    20,
+                    flags,
+                    8,
+                    m.dos_time,
+                    m.dos_date,
+                    m.crc,
+                    len(m.data),
+                    m.size,
+                    len(name),
+                    0,
+                    0,
+                    0,
+                    0,
+                    0o644 << 16,
+                    offset,
+                )
+                + name
+            )
+            offset += LOCAL_HEADER.size + len(name) + len(m.data)
+        directory = b"".join(central_directory)
+        f.write(directory)
+        f.write(
+            END_OF_CENTRAL_DIRECTORY.pack(
+                0x06054B50,
+                0,
+                0,
+                len(members),
+                len(members),
+                len(directory),
+                offset,
+                0,
+            )
+        )